@@ -27,5 +27,9 @@ from .obd import OBD
 from .obdcmd import OBDCommand
 from .commands import COMMANDS
 from .utils import Unit
+from .elm327 import PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
 
-__all__ = ['__version__', 'OBD', 'OBDCommand', 'COMMANDS', 'Unit']
+__all__ = [
+    '__version__', 'OBD', 'OBDCommand', 'COMMANDS', 'Unit', 'PRIORITY_HIGH',
+    'PRIORITY_NORMAL', 'PRIORITY_LOW',
+]
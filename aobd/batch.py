@@ -0,0 +1,201 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Batch processing of archives of captures using multiple processes.
+
+The following files are processed
+
+- ELM327 debug logs (`*.log`) and capture files (`*.cap`) are parsed and
+  decoded with `aobd.logparse` module
+- HDF5 files (`*.h5`, `*.hdf`, `*.hdf5`) of `aobd-recorder` script
+  contain decoded values, which are read as they are; `h5py` is required
+
+A file is processed by a worker process of a process pool. The largest
+files are processed first, so the load of the workers is balanced.
+
+The columns of values of all files are merged into one column per name.
+The values are sorted by time. The values with the same time are in the
+order of the paths of their files, so the result does not depend on
+the number of workers and order of their completion::
+
+    columns = process(find_files('archive'))
+    columns['RPM'].time, columns['RPM'].value
+"""
+
+import concurrent.futures
+import logging
+import os
+
+from .commands import COMMANDS
+from .logparse import Column, parse
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_EXT = ('.log', '.cap')
+HDF_EXT = ('.h5', '.hdf', '.hdf5')
+
+# dataset with time of the records of aobd-recorder
+HDF_TIME = '_debug_/clock_time'
+
+# group with time and values of OBD commands of aobd-recorder
+HDF_OBD = 'obd'
+
+
+def find_files(path):
+    """
+    Find files to process in a directory and its subdirectories.
+
+    Sorted list of paths is returned. If path is a file, then list with
+    the path is returned.
+
+    :param path: Path of a directory or a file.
+    """
+    if not os.path.isdir(path):
+        return [path]
+
+    items = (
+        os.path.join(root, fn)
+        for root, _, files in os.walk(path) for fn in files
+    )
+    return sorted(
+        fn for fn in items if fn.endswith(CAPTURE_EXT + HDF_EXT)
+    )
+
+
+def process_file(path):
+    """
+    Parse and decode a file into columns of values.
+
+    Dictionary of name and column of values is returned.
+
+    :param path: Path of debug log, capture or HDF5 file.
+    """
+    if path.endswith(HDF_EXT):
+        return read_hdf(path)
+    return parse(path)
+
+
+def read_hdf(path):
+    """
+    Read columns of values from HDF5 file of `aobd-recorder` script.
+
+    The dataset names are converted into command names, i.e. `rpm` into
+    `RPM`. The time of the values is read from `_debug_/clock_time`
+    dataset. If it is missing, the time is not a number.
+
+    The values of OBD commands polled at their own rates are read with
+    their time from `time` and `value` datasets of `obd/<name>` groups.
+
+    :param path: Path of HDF5 file.
+    """
+    import h5py
+    import numpy as np
+
+    result = {}
+    with h5py.File(path, 'r') as f:
+        t = f[HDF_TIME][:] if HDF_TIME in f else None
+        for name, ds in f.items():
+            if not isinstance(ds, h5py.Dataset):
+                continue
+
+            values = ds[:]
+            if t is not None and len(t) == len(values):
+                times = t.astype(np.float64)
+            else:
+                times = np.full(len(values), np.nan)
+            name, unit = hdf_name(name)
+            result[name] = Column(times, values, unit)
+
+        for name, group in f.get(HDF_OBD, {}).items():
+            name, unit = hdf_name(name)
+            times = group['time'][:].astype(np.float64)
+            result[name] = Column(times, group['value'][:], unit)
+    return result
+
+
+def hdf_name(name):
+    """
+    Get command name and unit of HDF5 dataset name.
+    """
+    cmd_name = name.upper()
+    if cmd_name in COMMANDS:
+        return cmd_name, getattr(COMMANDS[cmd_name].decode, 'unit', None)
+    return name, None
+
+
+def process(paths, workers=None):
+    """
+    Process files with a pool of worker processes and merge the results.
+
+    Dictionary of name and column of values is returned. The files, which
+    cannot be processed, i.e. truncated or corrupted files, are skipped
+    and the errors are logged.
+
+    :param paths: Paths of the files.
+    :param workers: Number of worker processes, number of CPUs by default.
+    """
+    paths = list(paths)
+    order = sorted(paths, key=file_size, reverse=True)
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        tasks = {fn: executor.submit(process_file, fn) for fn in order}
+
+        results = []
+        for fn in paths:
+            try:
+                results.append(tasks[fn].result())
+            except Exception as ex:
+                logger.warning('cannot process {}: {!r}'.format(fn, ex))
+    return merge(results)
+
+
+def merge(results):
+    """
+    Merge columns of values of multiple files.
+
+    The values of a column are sorted by time with stable sort, so the
+    values with the same time are in the order of the results.
+
+    :param results: Collection of dictionaries of name and column.
+    """
+    import numpy as np
+
+    columns = {}
+    for r in results:
+        for name, c in r.items():
+            columns.setdefault(name, []).append(c)
+
+    merged = {}
+    for name, items in columns.items():
+        times = np.concatenate([c.time for c in items])
+        values = np.concatenate([c.value for c in items])
+        idx = np.argsort(times, kind='stable')
+        unit = next((c.unit for c in items if c.unit is not None), None)
+        merged[name] = Column(times[idx], values[idx], unit)
+    return merged
+
+
+def file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+# vim: sw=4:et:ai
@@ -0,0 +1,170 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Cache of responses to OBD commands bounded by age of the responses.
+
+The cache is enabled for an OBD connection with `cache` attribute::
+
+    dev.cache = ResponseCache(max_age=5)
+    dev.cache.set_max_age(COMMANDS.RPM, 0)  # always query RPM
+
+A query of a command returns cached response if it is not older than
+maximum age of the command, otherwise the vehicle is queried and the
+cache is refreshed.
+"""
+
+import collections
+import time
+
+# default maximum number of cached responses
+CACHE_SIZE = 256
+
+
+class ResponseCache:
+    """
+    Cache of responses to OBD commands.
+
+    The maximum age of responses is set globally or per command. The
+    responses of a command without maximum age are not cached.
+
+    The responses are evicted when they are older than maximum age of
+    their command or when there are more than `size` responses in the
+    cache, the oldest responses first.
+
+    :param max_age: Maximum age of responses in seconds, `None` to cache
+        only the commands with maximum age set per command.
+    :param size: Maximum number of cached responses.
+    :var hits: Number of queries answered with cached response.
+    :var misses: Number of queries sent to the vehicle.
+    """
+    def __init__(self, max_age=None, size=CACHE_SIZE):
+        self.max_age = max_age
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+
+        # command -> maximum age of its responses
+        self._max_age = {}
+        # command -> monotonic time and response, the oldest first
+        self._items = collections.OrderedDict()
+
+
+    def set_max_age(self, command, max_age):
+        """
+        Set maximum age of responses to OBD command.
+
+        :param command: OBD command.
+        :param max_age: Maximum age of responses in seconds, `None` to use
+            the global maximum age.
+        """
+        if max_age is None:
+            self._max_age.pop(command, None)
+        else:
+            self._max_age[command] = max_age
+
+
+    def get_max_age(self, command):
+        """
+        Get maximum age of responses to OBD command or `None` if the
+        responses are not cached.
+        """
+        return self._max_age.get(command, self.max_age)
+
+
+    def get(self, command, now=None):
+        """
+        Get cached response of OBD command or `None` if there is no fresh
+        response.
+
+        :param command: OBD command.
+        :param now: Current monotonic time in seconds.
+        """
+        now = time.monotonic() if now is None else now
+        item = self._items.get(command)
+        max_age = self.get_max_age(command)
+        if item is None or max_age is None or now - item[0] > max_age:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return item[1]
+
+
+    def put(self, command, response, now=None):
+        """
+        Put response of OBD command into the cache.
+
+        Null responses and responses of commands without maximum age are
+        not cached.
+
+        :param command: OBD command.
+        :param response: Response of the command.
+        :param now: Current monotonic time in seconds.
+        """
+        if response.is_null() or self.get_max_age(command) is None:
+            return
+
+        now = time.monotonic() if now is None else now
+        items = self._items
+        items.pop(command, None)
+        items[command] = now, response
+        self._evict(now)
+
+
+    def clear(self):
+        """
+        Remove all responses from the cache.
+        """
+        self._items.clear()
+
+
+    def __len__(self):
+        return len(self._items)
+
+
+    def _evict(self, now):
+        items = self._items
+        while len(items) > self.size:
+            items.popitem(last=False)
+
+        # the responses are ordered by time, so the scan for expired
+        # responses stops at the first response not older than the
+        # smallest maximum age
+        ages = list(self._max_age.values())
+        if self.max_age is not None:
+            ages.append(self.max_age)
+        if not ages:
+            items.clear()
+            return
+
+        min_age = min(ages)
+        expired = []
+        for cmd, (t, _) in items.items():
+            if now - t <= min_age:
+                break
+            max_age = self.get_max_age(cmd)
+            if max_age is None or now - t > max_age:
+                expired.append(cmd)
+
+        for cmd in expired:
+            del items[cmd]
+
+
+# vim: sw=4:et:ai
@@ -0,0 +1,140 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Capabilities of ELM327 devices.
+
+ELM327 clones claim versions they do not implement. Instead of relying on
+the version, the features used to speed up communication are probed
+
+spaces off
+    `ATS0` command removing spaces between bytes of responses.
+response count
+    Number of expected responses appended to OBD request, so the device
+    returns the data as soon as the responses arrive.
+multi-PID
+    Mode 01 requests of multiple PIDs on CAN vehicles.
+adaptive timing
+    `ATAT2` command, the most aggressive adaptive timing of waiting for
+    responses.
+
+The latency of the device, the median round trip of `0100` request, is
+measured as well.
+
+The device is probed once. The capabilities are saved in JSON file and
+identified by device path and by responses to `ATI` and `AT@1`
+commands, see `aobd.elm327.ELM327` class.
+"""
+
+import re
+
+from .store import JSONStore
+
+RE_VERSION_NUMBER = re.compile(r'(\d+)\.(\d+)')
+
+
+def version_number(version):
+    """
+    Convert version of ELM327 device into tuple of integers.
+
+    Tuple `(0, 0)` is returned for unknown version.
+
+    :param version: Version string, i.e. `1.4b`.
+    """
+    m = RE_VERSION_NUMBER.match(version or '')
+    return (int(m.group(1)), int(m.group(2))) if m else (0, 0)
+
+
+class Capabilities:
+    """
+    Capabilities of ELM327 device.
+
+    :var spaces_off: `ATS0` command is supported.
+    :var response_count: Response count suffix is supported.
+    :var multi_pid: Multi-PID requests are supported.
+    :var adaptive_timing: `ATAT2` command is supported.
+    :var latency: Median round trip of `0100` request in seconds or
+        `None`.
+    """
+    def __init__(
+            self, spaces_off=False, response_count=False, multi_pid=False,
+            adaptive_timing=False, latency=None,
+        ):
+        self.spaces_off = spaces_off
+        self.response_count = response_count
+        self.multi_pid = multi_pid
+        self.adaptive_timing = adaptive_timing
+        self.latency = latency
+
+
+    @classmethod
+    def from_version(cls, version):
+        """
+        Guess capabilities of device from its version.
+
+        Used when the device is not probed. `ATS0` command and response
+        count suffix are assumed since version 1.3. Multi-PID requests are
+        assumed. Adaptive timing is left at device default.
+
+        :param version: Version string, i.e. `1.4b`.
+        """
+        recent = version_number(version) >= (1, 3)
+        return cls(spaces_off=recent, response_count=recent, multi_pid=True)
+
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Create capabilities from dictionary loaded from JSON file.
+        """
+        return cls(**data)
+
+
+    def to_dict(self):
+        """
+        Convert capabilities into dictionary to be saved in JSON file.
+        """
+        return {
+            'spaces_off': self.spaces_off,
+            'response_count': self.response_count,
+            'multi_pid': self.multi_pid,
+            'adaptive_timing': self.adaptive_timing,
+            'latency': self.latency,
+        }
+
+
+    def __repr__(self):
+        items = ' '.join('{}={}'.format(k, v) for k, v in self.to_dict().items())
+        return '<Capabilities {}>'.format(items)
+
+
+
+class CapabilityStore(JSONStore):
+    """
+    JSON file with capabilities of ELM327 devices.
+
+    The capabilities are identified by device path and by responses to
+    `ATI` and `AT@1` commands, see `aobd.store.JSONStore` class.
+
+    :param path: Path of the JSON file.
+    """
+    item_class = Capabilities
+
+
+# vim: sw=4:et:ai
@@ -0,0 +1,346 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Binary capture format of data sent to and received from ELM327 device.
+
+The capture file starts with a header
+
+- magic bytes `AOBDCAP1`
+- wall clock time in nanoseconds at the start of the capture
+- monotonic clock time in nanoseconds at the start of the capture
+
+and is followed by the events. An event is a fixed-size record header -
+monotonic timestamp in nanoseconds, data length and direction of the
+data - followed by the raw data. The wall clock time of an event is
+`wall + ts - monotonic`.
+
+A time index is written when the capture is closed. It has an entry -
+timestamp and file offset of an event - for the first event in each
+`INDEX_INTERVAL` nanoseconds. The index is followed by a footer with
+file offset of the index, number of its entries and magic bytes
+`AOBDIDX1`. If a capture is not closed, i.e. on power loss, the index is
+rebuilt by the reader.
+
+All integers are little-endian.
+"""
+
+import array
+import bisect
+import collections
+import mmap
+import time
+import struct
+
+# direction of data
+SENT = 0
+RECEIVED = 1
+
+MAGIC = b'AOBDCAP1'
+INDEX_MAGIC = b'AOBDIDX1'
+
+HEADER = struct.Struct('<8sqq')
+RECORD = struct.Struct('<qIB3x')
+INDEX_ENTRY = struct.Struct('<qq')
+FOOTER = struct.Struct('<qq8s')
+
+# time between entries of the time index, 1s
+INDEX_INTERVAL = 1000000000
+
+
+def is_capture(path):
+    """
+    Check if a file is a capture file.
+    """
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class CaptureWriter:
+    """
+    Writer of capture file.
+
+    The writer can be attached to wire trace of a connection to record
+    all data sent to and received from a device::
+
+        dev = aobd.OBD('/dev/ttyUSB0')
+        dev.trace.capture = CaptureWriter(open('data.cap', 'wb'))
+
+    :param f: Binary file object.
+    :param wall: Wall clock time of the start of capture in nanoseconds.
+    :param monotonic: Monotonic clock time of the start of capture in
+        nanoseconds.
+    """
+    def __init__(self, f, wall=None, monotonic=None):
+        self._file = f
+        self._index = array.array('q')
+        self._next_index = None
+
+        wall = time.time_ns() if wall is None else wall
+        monotonic = time.monotonic_ns() if monotonic is None else monotonic
+        f.write(HEADER.pack(MAGIC, wall, monotonic))
+        self._offset = HEADER.size
+
+
+    def write(self, direction, ts, data):
+        """
+        Write event to the capture file.
+
+        :param direction: Direction of the data, `SENT` or `RECEIVED`.
+        :param ts: Monotonic clock timestamp in nanoseconds.
+        :param data: Data sent or received.
+        """
+        if self._next_index is None or ts >= self._next_index:
+            self._index.append(ts)
+            self._index.append(self._offset)
+            self._next_index = ts + INDEX_INTERVAL
+
+        n = len(data)
+        self._file.write(RECORD.pack(ts, n, direction))
+        self._file.write(data)
+        self._offset += RECORD.size + n
+
+
+    def finish(self):
+        """
+        Write time index of the capture.
+
+        No events can be written after the index.
+        """
+        f = self._file
+        f.write(self._index.tobytes())
+        f.write(FOOTER.pack(self._offset, len(self._index) // 2, INDEX_MAGIC))
+
+
+    def close(self):
+        """
+        Write time index and close the capture file.
+        """
+        self.finish()
+        self._file.close()
+
+
+
+class CaptureReader:
+    """
+    Reader of capture file.
+
+    The file is memory-mapped. The data of events is returned as memory
+    views of the file, which are valid until the reader is closed.
+
+    :param path: Path of capture file.
+    :var wall: Wall clock time of the start of capture in nanoseconds.
+    :var monotonic: Monotonic clock time of the start of capture in
+        nanoseconds.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        magic, self.wall, self.monotonic = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError('Not a capture file: {}'.format(path))
+
+        self._end, index = self._read_index()
+        self._times = index[::2]
+        self._offsets = index[1::2]
+
+
+    def __iter__(self):
+        return self.events()
+
+
+    def events(self, start=None, end=None):
+        """
+        Iterate over events of the capture.
+
+        An event is tuple of direction, monotonic timestamp and data.
+
+        :param start: Timestamp of the first event, inclusive.
+        :param end: Timestamp of the last event, exclusive.
+        """
+        pos = HEADER.size if start is None else self._find(start)
+        view = self._view
+        data = self._mmap
+        unpack = RECORD.unpack_from
+        size = RECORD.size
+        limit = self._end
+        while pos + size <= limit:
+            ts, n, direction = unpack(data, pos)
+            if end is not None and ts >= end:
+                break
+            pos += size
+            if start is None or ts >= start:
+                yield direction, ts, view[pos:pos + n]
+            pos += n
+
+
+    def wall_time(self, ts):
+        """
+        Convert monotonic timestamp of an event into wall clock time in
+        seconds.
+        """
+        return (self.wall + ts - self.monotonic) / 1e9
+
+
+    def close(self):
+        """
+        Close the capture file.
+
+        The memory views of the data of events have to be released
+        first.
+        """
+        self._view.release()
+        self._mmap.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    def _find(self, ts):
+        """
+        Find file offset of an event before timestamp using time index.
+        """
+        k = bisect.bisect_right(self._times, ts) - 1
+        return self._offsets[k] if k >= 0 else HEADER.size
+
+
+    def _read_index(self):
+        """
+        Read time index of capture file.
+
+        The index is rebuilt if the capture file was not closed.
+        """
+        data = self._mmap
+        n = len(data)
+        if n >= HEADER.size + FOOTER.size:
+            offset, count, magic = FOOTER.unpack_from(data, n - FOOTER.size)
+            size = count * INDEX_ENTRY.size
+            if magic == INDEX_MAGIC \
+                    and offset + size + FOOTER.size == n:
+                index = array.array('q')
+                index.frombytes(data[offset:offset + size])
+                return offset, index
+
+        return self._scan()
+
+
+    def _scan(self):
+        """
+        Build time index by scanning record headers.
+
+        Incomplete event at the end of the file is ignored.
+        """
+        data = self._mmap
+        n = len(data)
+        index = array.array('q')
+        next_index = None
+        pos = HEADER.size
+        while pos + RECORD.size <= n:
+            ts, size, _ = RECORD.unpack_from(data, pos)
+            end = pos + RECORD.size + size
+            if end > n:
+                break
+            if next_index is None or ts >= next_index:
+                index.append(ts)
+                index.append(pos)
+                next_index = ts + INDEX_INTERVAL
+            pos = end
+        return pos, index
+
+
+
+def exchanges(events):
+    """
+    Group events into requests and responses.
+
+    The data received after a request until the prompt is the response of
+    the request. The data received before any request is skipped.
+
+    The commands written at once, i.e. pipelined setup commands, are
+    split into separate requests. The device processes such a request
+    when the response of the previous one ends, so the end of the
+    previous response is the timestamp of the request.
+
+    Tuple of timestamp of a request, the request, timestamp of the end of
+    its response and the response data is returned for each request.
+
+    :param events: Iterable of events, i.e. capture reader.
+    """
+    queue = collections.deque()
+    request = None
+    response = bytearray()
+    t_request = t_response = None
+    for direction, ts, data in events:
+        if direction == SENT:
+            if request is not None:
+                yield t_request, request, t_response, bytes(response)
+            for t, r in queue:
+                yield t, r, t, b''
+
+            queue.clear()
+            queue.extend((ts, r) for r in split_requests(bytes(data)))
+            t_request, request = queue.popleft()
+            t_response = ts
+            response.clear()
+        elif request is not None:
+            # the data can contain responses of pipelined requests
+            data = bytes(data)
+            t_response = ts
+            while request is not None:
+                end = data.find(b'>') + 1
+                if not end:
+                    response.extend(data)
+                    break
+
+                response.extend(data[:end])
+                data = data[end:]
+                yield t_request, request, t_response, bytes(response)
+                response.clear()
+                if queue:
+                    _, request = queue.popleft()
+                    t_request = ts
+                else:
+                    request = None
+
+    if request is not None:
+        yield t_request, request, t_response, bytes(response)
+    for t, r in queue:
+        yield t, r, t, b''
+
+
+def split_requests(data):
+    """
+    Split data written to the device into requests.
+
+    The requests keep their terminating carriage return.
+
+    :param data: Data written to the device.
+    """
+    return data.splitlines(keepends=True) or [data]
+
+
+# vim: sw=4:et:ai
@@ -29,6 +29,32 @@ from .decoders import *
 
 logger = logging.getLogger(__name__)
 
+# declarative decoders of linear values, see `Linear`
+PERCENT          = Linear(0, 1, Unit.PERCENT, scale=100.0, divisor=255.0)
+PERCENT_CENTERED = Linear(0, 1, Unit.PERCENT, scale=100.0, divisor=128.0, offset=-100.0)
+TEMP             = Linear(0, 1, Unit.C, offset=-40)
+CATALYST_TEMP    = Linear(0, 2, Unit.C, divisor=10.0, offset=-40)
+CURRENT_CENTERED = Linear(2, 4, Unit.MA, divisor=256.0, offset=-128)
+SENSOR_VOLTAGE   = Linear(0, 1, Unit.VOLT, divisor=200.0)
+SENSOR_VOLTAGE_B = Linear(2, 4, Unit.VOLT, scale=8.0, divisor=65535)
+FUEL_PRESSURE    = Linear(0, 1, Unit.KPA, scale=3)
+PRESSURE         = Linear(0, 1, Unit.KPA)
+FUEL_PRES_VAC    = Linear(0, 2, Unit.KPA, scale=0.079)
+FUEL_PRES_DIRECT = Linear(0, 2, Unit.KPA, scale=10)
+ABS_EVAP_PRES    = Linear(0, 2, Unit.KPA, divisor=200.0)
+EVAP_PRES_ALT    = Linear(0, 2, Unit.PA, offset=-32767)
+RPM              = Linear(0, 2, Unit.RPM, divisor=4.0)
+SPEED            = Linear(0, 1, Unit.KPH)
+TIMING_ADVANCE   = Linear(0, 1, Unit.DEGREES, divisor=2.0, offset=-64)
+INJECT_TIMING    = Linear(0, 2, Unit.DEGREES, divisor=128.0, offset=-210)
+MAF              = Linear(0, 2, Unit.GPS, divisor=100.0)
+MAX_MAF          = Linear(0, 1, Unit.GPS, scale=10)
+COUNT            = Linear(0, 1, Unit.COUNT)
+SECONDS          = Linear(0, 2, Unit.SEC)
+MINUTES          = Linear(0, 2, Unit.MIN)
+DISTANCE         = Linear(0, 2, Unit.KM)
+FUEL_RATE        = Linear(0, 2, Unit.LPH, scale=0.05)
+
 # Define command tables
 # NOTE: the SENSOR NAME field will be used as the dict key for that sensor
 # NOTE: commands MUST be in PID order, one command per PID (for fast lookup using __mode1__[pid])
@@ -39,68 +65,68 @@ __mode1__ = [
     OBDCommand('STATUS'                     , 'Status since DTCs cleared'               , b'01', b'01', 4, status                ),
     OBDCommand('FREEZE_DTC'                 , 'Freeze DTC'                              , b'01', b'02', 2, noop                  ),
     OBDCommand('FUEL_STATUS'                , 'Fuel System Status'                      , b'01', b'03', 2, fuel_status           ),
-    OBDCommand('ENGINE_LOAD'                , 'Calculated Engine Load'                  , b'01', b'04', 1, percent               ),
-    OBDCommand('COOLANT_TEMP'               , 'Engine Coolant Temperature'              , b'01', b'05', 1, temp                  ),
-    OBDCommand('SHORT_FUEL_TRIM_1'          , 'Short Term Fuel Trim - Bank 1'           , b'01', b'06', 1, percent_centered      ),
-    OBDCommand('LONG_FUEL_TRIM_1'           , 'Long Term Fuel Trim - Bank 1'            , b'01', b'07', 1, percent_centered      ),
-    OBDCommand('SHORT_FUEL_TRIM_2'          , 'Short Term Fuel Trim - Bank 2'           , b'01', b'08', 1, percent_centered      ),
-    OBDCommand('LONG_FUEL_TRIM_2'           , 'Long Term Fuel Trim - Bank 2'            , b'01', b'09', 1, percent_centered      ),
-    OBDCommand('FUEL_PRESSURE'              , 'Fuel Pressure'                           , b'01', b'0A', 1, fuel_pressure         ),
-    OBDCommand('INTAKE_PRESSURE'            , 'Intake Manifold Pressure'                , b'01', b'0B', 1, pressure              ),
-    OBDCommand('RPM'                        , 'Engine RPM'                              , b'01', b'0C', 2, rpm                   ),
-    OBDCommand('SPEED'                      , 'Vehicle Speed'                           , b'01', b'0D', 1, speed                 ),
-    OBDCommand('TIMING_ADVANCE'             , 'Timing Advance'                          , b'01', b'0E', 1, timing_advance        ),
-    OBDCommand('INTAKE_TEMP'                , 'Intake Air Temp'                         , b'01', b'0F', 1, temp                  ),
-    OBDCommand('MAF'                        , 'Air Flow Rate (MAF)'                     , b'01', b'10', 2, maf                   ),
-    OBDCommand('THROTTLE_POS'               , 'Throttle Position'                       , b'01', b'11', 1, percent               ),
+    OBDCommand('ENGINE_LOAD'                , 'Calculated Engine Load'                  , b'01', b'04', 1, PERCENT               ),
+    OBDCommand('COOLANT_TEMP'               , 'Engine Coolant Temperature'              , b'01', b'05', 1, TEMP                  ),
+    OBDCommand('SHORT_FUEL_TRIM_1'          , 'Short Term Fuel Trim - Bank 1'           , b'01', b'06', 1, PERCENT_CENTERED      ),
+    OBDCommand('LONG_FUEL_TRIM_1'           , 'Long Term Fuel Trim - Bank 1'            , b'01', b'07', 1, PERCENT_CENTERED      ),
+    OBDCommand('SHORT_FUEL_TRIM_2'          , 'Short Term Fuel Trim - Bank 2'           , b'01', b'08', 1, PERCENT_CENTERED      ),
+    OBDCommand('LONG_FUEL_TRIM_2'           , 'Long Term Fuel Trim - Bank 2'            , b'01', b'09', 1, PERCENT_CENTERED      ),
+    OBDCommand('FUEL_PRESSURE'              , 'Fuel Pressure'                           , b'01', b'0A', 1, FUEL_PRESSURE         ),
+    OBDCommand('INTAKE_PRESSURE'            , 'Intake Manifold Pressure'                , b'01', b'0B', 1, PRESSURE              ),
+    OBDCommand('RPM'                        , 'Engine RPM'                              , b'01', b'0C', 2, RPM                   ),
+    OBDCommand('SPEED'                      , 'Vehicle Speed'                           , b'01', b'0D', 1, SPEED                 ),
+    OBDCommand('TIMING_ADVANCE'             , 'Timing Advance'                          , b'01', b'0E', 1, TIMING_ADVANCE        ),
+    OBDCommand('INTAKE_TEMP'                , 'Intake Air Temp'                         , b'01', b'0F', 1, TEMP                  ),
+    OBDCommand('MAF'                        , 'Air Flow Rate (MAF)'                     , b'01', b'10', 2, MAF                   ),
+    OBDCommand('THROTTLE_POS'               , 'Throttle Position'                       , b'01', b'11', 1, PERCENT               ),
     OBDCommand('AIR_STATUS'                 , 'Secondary Air Status'                    , b'01', b'12', 1, air_status            ),
     OBDCommand('O2_SENSORS'                 , 'O2 Sensors Present'                      , b'01', b'13', 1, noop                  ),
-    OBDCommand('O2_B1S1'                    , 'O2: Bank 1 - Sensor 1 Voltage'           , b'01', b'14', 2, sensor_voltage        ),
-    OBDCommand('O2_B1S2'                    , 'O2: Bank 1 - Sensor 2 Voltage'           , b'01', b'15', 2, sensor_voltage        ),
-    OBDCommand('O2_B1S3'                    , 'O2: Bank 1 - Sensor 3 Voltage'           , b'01', b'16', 2, sensor_voltage        ),
-    OBDCommand('O2_B1S4'                    , 'O2: Bank 1 - Sensor 4 Voltage'           , b'01', b'17', 2, sensor_voltage        ),
-    OBDCommand('O2_B2S1'                    , 'O2: Bank 2 - Sensor 1 Voltage'           , b'01', b'18', 2, sensor_voltage        ),
-    OBDCommand('O2_B2S2'                    , 'O2: Bank 2 - Sensor 2 Voltage'           , b'01', b'19', 2, sensor_voltage        ),
-    OBDCommand('O2_B2S3'                    , 'O2: Bank 2 - Sensor 3 Voltage'           , b'01', b'1A', 2, sensor_voltage        ),
-    OBDCommand('O2_B2S4'                    , 'O2: Bank 2 - Sensor 4 Voltage'           , b'01', b'1B', 2, sensor_voltage        ),
+    OBDCommand('O2_B1S1'                    , 'O2: Bank 1 - Sensor 1 Voltage'           , b'01', b'14', 2, SENSOR_VOLTAGE        ),
+    OBDCommand('O2_B1S2'                    , 'O2: Bank 1 - Sensor 2 Voltage'           , b'01', b'15', 2, SENSOR_VOLTAGE        ),
+    OBDCommand('O2_B1S3'                    , 'O2: Bank 1 - Sensor 3 Voltage'           , b'01', b'16', 2, SENSOR_VOLTAGE        ),
+    OBDCommand('O2_B1S4'                    , 'O2: Bank 1 - Sensor 4 Voltage'           , b'01', b'17', 2, SENSOR_VOLTAGE        ),
+    OBDCommand('O2_B2S1'                    , 'O2: Bank 2 - Sensor 1 Voltage'           , b'01', b'18', 2, SENSOR_VOLTAGE        ),
+    OBDCommand('O2_B2S2'                    , 'O2: Bank 2 - Sensor 2 Voltage'           , b'01', b'19', 2, SENSOR_VOLTAGE        ),
+    OBDCommand('O2_B2S3'                    , 'O2: Bank 2 - Sensor 3 Voltage'           , b'01', b'1A', 2, SENSOR_VOLTAGE        ),
+    OBDCommand('O2_B2S4'                    , 'O2: Bank 2 - Sensor 4 Voltage'           , b'01', b'1B', 2, SENSOR_VOLTAGE        ),
     OBDCommand('OBD_COMPLIANCE'             , 'OBD Standards Compliance'                , b'01', b'1C', 1, obd_compliance        ),
     OBDCommand('O2_SENSORS_ALT'             , 'O2 Sensors Present (alternate)'          , b'01', b'1D', 1, noop                  ),
     OBDCommand('AUX_INPUT_STATUS'           , 'Auxiliary input status'                  , b'01', b'1E', 1, noop                  ),
-    OBDCommand('RUN_TIME'                   , 'Engine Run Time'                         , b'01', b'1F', 2, seconds               ),
+    OBDCommand('RUN_TIME'                   , 'Engine Run Time'                         , b'01', b'1F', 2, SECONDS               ),
 
     #                  sensor name                          description                   mode  cmd bytes       decoder
     OBDCommand('PIDS_B'                     , 'Supported PIDs [21-40]'                  , b'01', b'20', 4, pid                   ),
-    OBDCommand('DISTANCE_W_MIL'             , 'Distance Traveled with MIL on'           , b'01', b'21', 2, distance              ),
-    OBDCommand('FUEL_RAIL_PRESSURE_VAC'     , 'Fuel Rail Pressure (relative to vacuum)' , b'01', b'22', 2, fuel_pres_vac         ),
-    OBDCommand('FUEL_RAIL_PRESSURE_DIRECT'  , 'Fuel Rail Pressure (direct inject)'      , b'01', b'23', 2, fuel_pres_direct      ),
-    OBDCommand('O2_S1_WR_VOLTAGE'           , '02 Sensor 1 WR Lambda Voltage'           , b'01', b'24', 4, sensor_voltage_big    ),
-    OBDCommand('O2_S2_WR_VOLTAGE'           , '02 Sensor 2 WR Lambda Voltage'           , b'01', b'25', 4, sensor_voltage_big    ),
-    OBDCommand('O2_S3_WR_VOLTAGE'           , '02 Sensor 3 WR Lambda Voltage'           , b'01', b'26', 4, sensor_voltage_big    ),
-    OBDCommand('O2_S4_WR_VOLTAGE'           , '02 Sensor 4 WR Lambda Voltage'           , b'01', b'27', 4, sensor_voltage_big    ),
-    OBDCommand('O2_S5_WR_VOLTAGE'           , '02 Sensor 5 WR Lambda Voltage'           , b'01', b'28', 4, sensor_voltage_big    ),
-    OBDCommand('O2_S6_WR_VOLTAGE'           , '02 Sensor 6 WR Lambda Voltage'           , b'01', b'29', 4, sensor_voltage_big    ),
-    OBDCommand('O2_S7_WR_VOLTAGE'           , '02 Sensor 7 WR Lambda Voltage'           , b'01', b'2A', 4, sensor_voltage_big    ),
-    OBDCommand('O2_S8_WR_VOLTAGE'           , '02 Sensor 8 WR Lambda Voltage'           , b'01', b'2B', 4, sensor_voltage_big    ),
-    OBDCommand('COMMANDED_EGR'              , 'Commanded EGR'                           , b'01', b'2C', 1, percent               ),
-    OBDCommand('EGR_ERROR'                  , 'EGR Error'                               , b'01', b'2D', 1, percent_centered      ),
-    OBDCommand('EVAPORATIVE_PURGE'          , 'Commanded Evaporative Purge'             , b'01', b'2E', 1, percent               ),
-    OBDCommand('FUEL_LEVEL'                 , 'Fuel Level Input'                        , b'01', b'2F', 1, percent               ),
-    OBDCommand('WARMUPS_SINCE_DTC_CLEAR'    , 'Number of warm-ups since codes cleared'  , b'01', b'30', 1, count                 ),
-    OBDCommand('DISTANCE_SINCE_DTC_CLEAR'   , 'Distance traveled since codes cleared'   , b'01', b'31', 2, distance              ),
+    OBDCommand('DISTANCE_W_MIL'             , 'Distance Traveled with MIL on'           , b'01', b'21', 2, DISTANCE              ),
+    OBDCommand('FUEL_RAIL_PRESSURE_VAC'     , 'Fuel Rail Pressure (relative to vacuum)' , b'01', b'22', 2, FUEL_PRES_VAC         ),
+    OBDCommand('FUEL_RAIL_PRESSURE_DIRECT'  , 'Fuel Rail Pressure (direct inject)'      , b'01', b'23', 2, FUEL_PRES_DIRECT      ),
+    OBDCommand('O2_S1_WR_VOLTAGE'           , '02 Sensor 1 WR Lambda Voltage'           , b'01', b'24', 4, SENSOR_VOLTAGE_B      ),
+    OBDCommand('O2_S2_WR_VOLTAGE'           , '02 Sensor 2 WR Lambda Voltage'           , b'01', b'25', 4, SENSOR_VOLTAGE_B      ),
+    OBDCommand('O2_S3_WR_VOLTAGE'           , '02 Sensor 3 WR Lambda Voltage'           , b'01', b'26', 4, SENSOR_VOLTAGE_B      ),
+    OBDCommand('O2_S4_WR_VOLTAGE'           , '02 Sensor 4 WR Lambda Voltage'           , b'01', b'27', 4, SENSOR_VOLTAGE_B      ),
+    OBDCommand('O2_S5_WR_VOLTAGE'           , '02 Sensor 5 WR Lambda Voltage'           , b'01', b'28', 4, SENSOR_VOLTAGE_B      ),
+    OBDCommand('O2_S6_WR_VOLTAGE'           , '02 Sensor 6 WR Lambda Voltage'           , b'01', b'29', 4, SENSOR_VOLTAGE_B      ),
+    OBDCommand('O2_S7_WR_VOLTAGE'           , '02 Sensor 7 WR Lambda Voltage'           , b'01', b'2A', 4, SENSOR_VOLTAGE_B      ),
+    OBDCommand('O2_S8_WR_VOLTAGE'           , '02 Sensor 8 WR Lambda Voltage'           , b'01', b'2B', 4, SENSOR_VOLTAGE_B      ),
+    OBDCommand('COMMANDED_EGR'              , 'Commanded EGR'                           , b'01', b'2C', 1, PERCENT               ),
+    OBDCommand('EGR_ERROR'                  , 'EGR Error'                               , b'01', b'2D', 1, PERCENT_CENTERED      ),
+    OBDCommand('EVAPORATIVE_PURGE'          , 'Commanded Evaporative Purge'             , b'01', b'2E', 1, PERCENT               ),
+    OBDCommand('FUEL_LEVEL'                 , 'Fuel Level Input'                        , b'01', b'2F', 1, PERCENT               ),
+    OBDCommand('WARMUPS_SINCE_DTC_CLEAR'    , 'Number of warm-ups since codes cleared'  , b'01', b'30', 1, COUNT                 ),
+    OBDCommand('DISTANCE_SINCE_DTC_CLEAR'   , 'Distance traveled since codes cleared'   , b'01', b'31', 2, DISTANCE              ),
     OBDCommand('EVAP_VAPOR_PRESSURE'        , 'Evaporative system vapor pressure'       , b'01', b'32', 2, evap_pressure         ),
-    OBDCommand('BAROMETRIC_PRESSURE'        , 'Barometric Pressure'                     , b'01', b'33', 1, pressure              ),
-    OBDCommand('O2_S1_WR_CURRENT'           , '02 Sensor 1 WR Lambda Current'           , b'01', b'34', 4, current_centered      ),
-    OBDCommand('O2_S2_WR_CURRENT'           , '02 Sensor 2 WR Lambda Current'           , b'01', b'35', 4, current_centered      ),
-    OBDCommand('O2_S3_WR_CURRENT'           , '02 Sensor 3 WR Lambda Current'           , b'01', b'36', 4, current_centered      ),
-    OBDCommand('O2_S4_WR_CURRENT'           , '02 Sensor 4 WR Lambda Current'           , b'01', b'37', 4, current_centered      ),
-    OBDCommand('O2_S5_WR_CURRENT'           , '02 Sensor 5 WR Lambda Current'           , b'01', b'38', 4, current_centered      ),
-    OBDCommand('O2_S6_WR_CURRENT'           , '02 Sensor 6 WR Lambda Current'           , b'01', b'39', 4, current_centered      ),
-    OBDCommand('O2_S7_WR_CURRENT'           , '02 Sensor 7 WR Lambda Current'           , b'01', b'3A', 4, current_centered      ),
-    OBDCommand('O2_S8_WR_CURRENT'           , '02 Sensor 8 WR Lambda Current'           , b'01', b'3B', 4, current_centered      ),
-    OBDCommand('CATALYST_TEMP_B1S1'         , 'Catalyst Temperature: Bank 1 - Sensor 1' , b'01', b'3C', 2, catalyst_temp         ),
-    OBDCommand('CATALYST_TEMP_B2S1'         , 'Catalyst Temperature: Bank 2 - Sensor 1' , b'01', b'3D', 2, catalyst_temp         ),
-    OBDCommand('CATALYST_TEMP_B1S2'         , 'Catalyst Temperature: Bank 1 - Sensor 2' , b'01', b'3E', 2, catalyst_temp         ),
-    OBDCommand('CATALYST_TEMP_B2S2'         , 'Catalyst Temperature: Bank 2 - Sensor 2' , b'01', b'3F', 2, catalyst_temp         ),
+    OBDCommand('BAROMETRIC_PRESSURE'        , 'Barometric Pressure'                     , b'01', b'33', 1, PRESSURE              ),
+    OBDCommand('O2_S1_WR_CURRENT'           , '02 Sensor 1 WR Lambda Current'           , b'01', b'34', 4, CURRENT_CENTERED      ),
+    OBDCommand('O2_S2_WR_CURRENT'           , '02 Sensor 2 WR Lambda Current'           , b'01', b'35', 4, CURRENT_CENTERED      ),
+    OBDCommand('O2_S3_WR_CURRENT'           , '02 Sensor 3 WR Lambda Current'           , b'01', b'36', 4, CURRENT_CENTERED      ),
+    OBDCommand('O2_S4_WR_CURRENT'           , '02 Sensor 4 WR Lambda Current'           , b'01', b'37', 4, CURRENT_CENTERED      ),
+    OBDCommand('O2_S5_WR_CURRENT'           , '02 Sensor 5 WR Lambda Current'           , b'01', b'38', 4, CURRENT_CENTERED      ),
+    OBDCommand('O2_S6_WR_CURRENT'           , '02 Sensor 6 WR Lambda Current'           , b'01', b'39', 4, CURRENT_CENTERED      ),
+    OBDCommand('O2_S7_WR_CURRENT'           , '02 Sensor 7 WR Lambda Current'           , b'01', b'3A', 4, CURRENT_CENTERED      ),
+    OBDCommand('O2_S8_WR_CURRENT'           , '02 Sensor 8 WR Lambda Current'           , b'01', b'3B', 4, CURRENT_CENTERED      ),
+    OBDCommand('CATALYST_TEMP_B1S1'         , 'Catalyst Temperature: Bank 1 - Sensor 1' , b'01', b'3C', 2, CATALYST_TEMP         ),
+    OBDCommand('CATALYST_TEMP_B2S1'         , 'Catalyst Temperature: Bank 2 - Sensor 1' , b'01', b'3D', 2, CATALYST_TEMP         ),
+    OBDCommand('CATALYST_TEMP_B1S2'         , 'Catalyst Temperature: Bank 1 - Sensor 2' , b'01', b'3E', 2, CATALYST_TEMP         ),
+    OBDCommand('CATALYST_TEMP_B2S2'         , 'Catalyst Temperature: Bank 2 - Sensor 2' , b'01', b'3F', 2, CATALYST_TEMP         ),
 
     #                  sensor name                          description                   mode  cmd bytes       decoder
     OBDCommand('PIDS_C'                     , 'Supported PIDs [41-60]'                  , b'01', b'40', 4, pid                   ),
@@ -108,32 +134,32 @@ __mode1__ = [
     OBDCommand('CONTROL_MODULE_VOLTAGE'     , 'Control module voltage'                  , b'01', b'42', 2, todo                  ),
     OBDCommand('ABSOLUTE_LOAD'              , 'Absolute load value'                     , b'01', b'43', 2, todo                  ),
     OBDCommand('COMMAND_EQUIV_RATIO'        , 'Command equivalence ratio'               , b'01', b'44', 2, todo                  ),
-    OBDCommand('RELATIVE_THROTTLE_POS'      , 'Relative throttle position'              , b'01', b'45', 1, percent               ),
-    OBDCommand('AMBIENT_AIR_TEMP'           , 'Ambient air temperature'                 , b'01', b'46', 1, temp                  ),
-    OBDCommand('THROTTLE_POS_B'             , 'Absolute throttle position B'            , b'01', b'47', 1, percent               ),
-    OBDCommand('THROTTLE_POS_C'             , 'Absolute throttle position C'            , b'01', b'48', 1, percent               ),
-    OBDCommand('ACCELERATOR_POS_D'          , 'Accelerator pedal position D'            , b'01', b'49', 1, percent               ),
-    OBDCommand('ACCELERATOR_POS_E'          , 'Accelerator pedal position E'            , b'01', b'4A', 1, percent               ),
-    OBDCommand('ACCELERATOR_POS_F'          , 'Accelerator pedal position F'            , b'01', b'4B', 1, percent               ),
-    OBDCommand('THROTTLE_ACTUATOR'          , 'Commanded throttle actuator'             , b'01', b'4C', 1, percent               ),
-    OBDCommand('RUN_TIME_MIL'               , 'Time run with MIL on'                    , b'01', b'4D', 2, minutes               ),
-    OBDCommand('TIME_SINCE_DTC_CLEARED'     , 'Time since trouble codes cleared'        , b'01', b'4E', 2, minutes               ),
+    OBDCommand('RELATIVE_THROTTLE_POS'      , 'Relative throttle position'              , b'01', b'45', 1, PERCENT               ),
+    OBDCommand('AMBIENT_AIR_TEMP'           , 'Ambient air temperature'                 , b'01', b'46', 1, TEMP                  ),
+    OBDCommand('THROTTLE_POS_B'             , 'Absolute throttle position B'            , b'01', b'47', 1, PERCENT               ),
+    OBDCommand('THROTTLE_POS_C'             , 'Absolute throttle position C'            , b'01', b'48', 1, PERCENT               ),
+    OBDCommand('ACCELERATOR_POS_D'          , 'Accelerator pedal position D'            , b'01', b'49', 1, PERCENT               ),
+    OBDCommand('ACCELERATOR_POS_E'          , 'Accelerator pedal position E'            , b'01', b'4A', 1, PERCENT               ),
+    OBDCommand('ACCELERATOR_POS_F'          , 'Accelerator pedal position F'            , b'01', b'4B', 1, PERCENT               ),
+    OBDCommand('THROTTLE_ACTUATOR'          , 'Commanded throttle actuator'             , b'01', b'4C', 1, PERCENT               ),
+    OBDCommand('RUN_TIME_MIL'               , 'Time run with MIL on'                    , b'01', b'4D', 2, MINUTES               ),
+    OBDCommand('TIME_SINCE_DTC_CLEARED'     , 'Time since trouble codes cleared'        , b'01', b'4E', 2, MINUTES               ),
     OBDCommand('MAX_VALUES'                 , 'Various Max values'                      , b'01', b'4F', 4, noop                  ), # todo: decode this
-    OBDCommand('MAX_MAF'                    , 'Maximum value for mass air flow sensor'  , b'01', b'50', 4, max_maf               ),
+    OBDCommand('MAX_MAF'                    , 'Maximum value for mass air flow sensor'  , b'01', b'50', 4, MAX_MAF               ),
     OBDCommand('FUEL_TYPE'                  , 'Fuel Type'                               , b'01', b'51', 1, fuel_type             ),
-    OBDCommand('ETHANOL_PERCENT'            , 'Ethanol Fuel Percent'                    , b'01', b'52', 1, percent               ),
-    OBDCommand('EVAP_VAPOR_PRESSURE_ABS'    , 'Absolute Evap system Vapor Pressure'     , b'01', b'53', 2, abs_evap_pressure     ),
-    OBDCommand('EVAP_VAPOR_PRESSURE_ALT'    , 'Evap system vapor pressure'              , b'01', b'54', 2, evap_pressure_alt     ),
-    OBDCommand('SHORT_O2_TRIM_B1'           , 'Short term secondary O2 trim - Bank 1'   , b'01', b'55', 2, percent_centered      ), # todo: decode seconds value for banks 3 and 4
-    OBDCommand('LONG_O2_TRIM_B1'            , 'Long term secondary O2 trim - Bank 1'    , b'01', b'56', 2, percent_centered      ),
-    OBDCommand('SHORT_O2_TRIM_B2'           , 'Short term secondary O2 trim - Bank 2'   , b'01', b'57', 2, percent_centered      ),
-    OBDCommand('LONG_O2_TRIM_B2'            , 'Long term secondary O2 trim - Bank 2'    , b'01', b'58', 2, percent_centered      ),
-    OBDCommand('FUEL_RAIL_PRESSURE_ABS'     , 'Fuel rail pressure (absolute)'           , b'01', b'59', 2, fuel_pres_direct      ),
-    OBDCommand('RELATIVE_ACCEL_POS'         , 'Relative accelerator pedal position'     , b'01', b'5A', 1, percent               ),
-    OBDCommand('HYBRID_BATTERY_REMAINING'   , 'Hybrid battery pack remaining life'      , b'01', b'5B', 1, percent               ),
-    OBDCommand('OIL_TEMP'                   , 'Engine oil temperature'                  , b'01', b'5C', 1, temp                  ),
-    OBDCommand('FUEL_INJECT_TIMING'         , 'Fuel injection timing'                   , b'01', b'5D', 2, inject_timing         ),
-    OBDCommand('FUEL_RATE'                  , 'Engine fuel rate'                        , b'01', b'5E', 2, fuel_rate             ),
+    OBDCommand('ETHANOL_PERCENT'            , 'Ethanol Fuel Percent'                    , b'01', b'52', 1, PERCENT               ),
+    OBDCommand('EVAP_VAPOR_PRESSURE_ABS'    , 'Absolute Evap system Vapor Pressure'     , b'01', b'53', 2, ABS_EVAP_PRES         ),
+    OBDCommand('EVAP_VAPOR_PRESSURE_ALT'    , 'Evap system vapor pressure'              , b'01', b'54', 2, EVAP_PRES_ALT         ),
+    OBDCommand('SHORT_O2_TRIM_B1'           , 'Short term secondary O2 trim - Bank 1'   , b'01', b'55', 2, PERCENT_CENTERED      ), # todo: decode seconds value for banks 3 and 4
+    OBDCommand('LONG_O2_TRIM_B1'            , 'Long term secondary O2 trim - Bank 1'    , b'01', b'56', 2, PERCENT_CENTERED      ),
+    OBDCommand('SHORT_O2_TRIM_B2'           , 'Short term secondary O2 trim - Bank 2'   , b'01', b'57', 2, PERCENT_CENTERED      ),
+    OBDCommand('LONG_O2_TRIM_B2'            , 'Long term secondary O2 trim - Bank 2'    , b'01', b'58', 2, PERCENT_CENTERED      ),
+    OBDCommand('FUEL_RAIL_PRESSURE_ABS'     , 'Fuel rail pressure (absolute)'           , b'01', b'59', 2, FUEL_PRES_DIRECT      ),
+    OBDCommand('RELATIVE_ACCEL_POS'         , 'Relative accelerator pedal position'     , b'01', b'5A', 1, PERCENT               ),
+    OBDCommand('HYBRID_BATTERY_REMAINING'   , 'Hybrid battery pack remaining life'      , b'01', b'5B', 1, PERCENT               ),
+    OBDCommand('OIL_TEMP'                   , 'Engine oil temperature'                  , b'01', b'5C', 1, TEMP                  ),
+    OBDCommand('FUEL_INJECT_TIMING'         , 'Fuel injection timing'                   , b'01', b'5D', 2, INJECT_TIMING         ),
+    OBDCommand('FUEL_RATE'                  , 'Engine fuel rate'                        , b'01', b'5E', 2, FUEL_RATE             ),
     OBDCommand('EMISSION_REQ'               , 'Designed emission requirements'          , b'01', b'5F', 1, noop                  ),
 ]
 
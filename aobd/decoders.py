@@ -29,34 +29,82 @@
 #                                                                      #
 ########################################################################
 
+import binascii
+import functools
 import logging
-import math
 from .utils import *
 from .codes import *
 
 '''
 All decoders take the form:
 
-def <name>(_hex):
+def <name>(data):
     ...
     return (<value>, <unit>)
 
+The `data` argument is bytes (or memory view) of the response.
+
+For compatibility with python-OBD, the decoders accept hex string as
+well, see `hex_compat`.
 '''
 
 logger = logging.getLogger(__name__)
 
+from_bytes = functools.partial(int.from_bytes, byteorder='big')
+
+
+def hex_compat(decoder):
+    """
+    Allow bytes decoder to be called with hex string.
+
+    This is compatibility shim for decoders API of python-OBD.
+    """
+    @functools.wraps(decoder)
+    def wrapper(data):
+        if isinstance(data, str):
+            data = unhex_bytes(data)
+        return decoder(data)
+    return wrapper
+
+
+def hex_decoder(decoder):
+    """
+    Adapt python-OBD hex string decoder to decode bytes.
+
+    Use it for custom decoders of the form::
+
+        def <name>(_hex):
+            ...
+            return (<value>, <unit>)
+
+    """
+    @functools.wraps(decoder)
+    def wrapper(data):
+        return decoder(binascii.hexlify(data).decode().upper())
+    return wrapper
+
+
+def hex_str(data):
+    """
+    Convert bytes to upper case hex string.
+    """
+    if isinstance(data, str):
+        return data
+    return binascii.hexlify(data).decode().upper()
+
 
 # todo
-def todo(_hex):
-    return (_hex, Unit.NONE)
+def todo(data):
+    return (hex_str(data), Unit.NONE)
 
-# hex in, hex out
-def noop(_hex):
-    return (_hex, Unit.NONE)
+# hex out
+def noop(data):
+    return (hex_str(data), Unit.NONE)
 
-# hex in, bitstring out
-def pid(_hex):
-    v = bitstring(_hex, len(_hex) * 4)
+# bitstring out
+@hex_compat
+def pid(data):
+    v = format(from_bytes(data), '0{}b'.format(len(data) * 8))
     return (v, Unit.NONE)
 
 '''
@@ -64,251 +112,447 @@ Sensor decoders
 Return Value object with value and units
 '''
 
-def count(_hex):
-    v = unhex(_hex)
+@hex_compat
+def count(data):
+    v = from_bytes(data)
     return (v, Unit.COUNT)
 
 # 0 to 100 %
-def percent(_hex):
-    v = unhex(_hex[0:2])
+@hex_compat
+def percent(data):
+    v = data[0]
     v = v * 100.0 / 255.0
     return (v, Unit.PERCENT)
 
 # -100 to 100 %
-def percent_centered(_hex):
-    v = unhex(_hex[0:2])
+@hex_compat
+def percent_centered(data):
+    v = data[0]
     v = (v - 128) * 100.0 / 128.0
     return (v, Unit.PERCENT)
 
 # -40 to 215 C
-def temp(_hex):
-    v = unhex(_hex)
+@hex_compat
+def temp(data):
+    v = from_bytes(data)
     v = v - 40
     return (v, Unit.C)
 
 # -40 to 6513.5 C
-def catalyst_temp(_hex):
-    v = unhex(_hex)
+@hex_compat
+def catalyst_temp(data):
+    v = from_bytes(data)
     v = (v / 10.0) - 40
     return (v, Unit.C)
 
 # -128 to 128 mA
-def current_centered(_hex):
-    v = unhex(_hex[4:8])
+@hex_compat
+def current_centered(data):
+    v = from_bytes(data[2:4])
     v = (v / 256.0) - 128
     return (v, Unit.MA)
 
 # 0 to 1.275 volts
-def sensor_voltage(_hex):
-    v = unhex(_hex[0:2])
+@hex_compat
+def sensor_voltage(data):
+    v = data[0]
     v = v / 200.0
     return (v, Unit.VOLT)
 
 # 0 to 8 volts
-def sensor_voltage_big(_hex):
-    v = unhex(_hex[4:8])
+@hex_compat
+def sensor_voltage_big(data):
+    v = from_bytes(data[2:4])
     v = (v * 8.0) / 65535
     return (v, Unit.VOLT)
 
 # 0 to 765 kPa
-def fuel_pressure(_hex):
-    v = unhex(_hex)
+@hex_compat
+def fuel_pressure(data):
+    v = from_bytes(data)
     v = v * 3
     return (v, Unit.KPA)
 
 # 0 to 255 kPa
-def pressure(_hex):
-    v = unhex(_hex)
+@hex_compat
+def pressure(data):
+    v = from_bytes(data)
     return (v, Unit.KPA)
 
 # 0 to 5177 kPa
-def fuel_pres_vac(_hex):
-    v = unhex(_hex)
+@hex_compat
+def fuel_pres_vac(data):
+    v = from_bytes(data)
     v = v * 0.079
     return (v, Unit.KPA)
 
 # 0 to 655,350 kPa
-def fuel_pres_direct(_hex):
-    v = unhex(_hex)
+@hex_compat
+def fuel_pres_direct(data):
+    v = from_bytes(data)
     v = v * 10
     return (v, Unit.KPA)
 
 # -8192 to 8192 Pa
-def evap_pressure(_hex):
+@hex_compat
+def evap_pressure(data):
     # decode the twos complement
-    a = twos_comp(unhex(_hex[0:2]), 8)
-    b = twos_comp(unhex(_hex[2:4]), 8)
+    a = twos_comp(data[0], 8)
+    b = twos_comp(data[1], 8)
     v = ((a * 256.0) + b) / 4.0
     return (v, Unit.PA)
 
 # 0 to 327.675 kPa
-def abs_evap_pressure(_hex):
-    v = unhex(_hex)
+@hex_compat
+def abs_evap_pressure(data):
+    v = from_bytes(data)
     v = v / 200.0
     return (v, Unit.KPA)
 
 # -32767 to 32768 Pa
-def evap_pressure_alt(_hex):
-    v = unhex(_hex)
+@hex_compat
+def evap_pressure_alt(data):
+    v = from_bytes(data)
     v = v - 32767
     return (v, Unit.PA)
 
 # 0 to 16,383.75 RPM
-def rpm(_hex):
-    v = unhex(_hex)
+@hex_compat
+def rpm(data):
+    v = from_bytes(data)
     v = v / 4.0
     return (v, Unit.RPM)
 
 # 0 to 255 KPH
-def speed(_hex):
-    v = unhex(_hex)
+@hex_compat
+def speed(data):
+    v = from_bytes(data)
     return (v, Unit.KPH)
 
 # -64 to 63.5 degrees
-def timing_advance(_hex):
-    v = unhex(_hex)
+@hex_compat
+def timing_advance(data):
+    v = from_bytes(data)
     v = (v - 128) / 2.0
     return (v, Unit.DEGREES)
 
 # -210 to 301 degrees
-def inject_timing(_hex):
-    v = unhex(_hex)
+@hex_compat
+def inject_timing(data):
+    v = from_bytes(data)
     v = (v - 26880) / 128.0
     return (v, Unit.DEGREES)
 
 # 0 to 655.35 grams/sec
-def maf(_hex):
-    v = unhex(_hex)
+@hex_compat
+def maf(data):
+    v = from_bytes(data)
     v = v / 100.0
     return (v, Unit.GPS)
 
 # 0 to 2550 grams/sec
-def max_maf(_hex):
-    v = unhex(_hex[0:2])
+@hex_compat
+def max_maf(data):
+    v = data[0]
     v = v * 10
     return (v, Unit.GPS)
 
 # 0 to 65535 seconds
-def seconds(_hex):
-    v = unhex(_hex)
+@hex_compat
+def seconds(data):
+    v = from_bytes(data)
     return (v, Unit.SEC)
 
 # 0 to 65535 minutes
-def minutes(_hex):
-    v = unhex(_hex)
+@hex_compat
+def minutes(data):
+    v = from_bytes(data)
     return (v, Unit.MIN)
 
 # 0 to 65535 km
-def distance(_hex):
-    v = unhex(_hex)
+@hex_compat
+def distance(data):
+    v = from_bytes(data)
     return (v, Unit.KM)
 
 # 0 to 3212 Liters/hour
-def fuel_rate(_hex):
-    v = unhex(_hex)
+@hex_compat
+def fuel_rate(data):
+    v = from_bytes(data)
     v = v * 0.05
     return (v, Unit.LPH)
 
 
-'''
-Special decoders
-Return objects, lists, etc
-'''
-
+class Linear:
+    """
+    Declarative decoder of a linear value.
+
+    The value is a linear function of integer stored in a range of bytes
+    of the response::
+
+        value = raw * scale / divisor + offset
+
+    The divisor allows to express scales like `100 / 255` exactly as the
+    decoder functions do.
+
+    The values of 1 and 2 bytes integers are precomputed into lookup
+    tables of 256 and 65536 entries. The tables are built on first use.
+
+    For example, engine RPM is decoded with::
+
+        Linear(0, 2, Unit.RPM, divisor=4.0)
+
+    :var start: Index of first byte of the integer.
+    :var end: Index of the byte after the last byte of the integer.
+    :var unit: Unit of the value.
+    :var scale: Multiplier of the integer.
+    :var divisor: Divisor of the integer.
+    :var offset: Offset of the value.
+    :var signed: Integer is two's complement signed integer if true.
+    """
+    def __init__(
+            self, start, end, unit, scale=1, divisor=1, offset=0,
+            signed=False
+        ):
+        self.start = start
+        self.end = end
+        self.size = end - start
+        self.unit = unit
+        self.scale = scale
+        self.divisor = divisor
+        self.offset = offset
+        self.signed = signed
+        self._lut = None
 
 
-def status(_hex):
-    bits = bitstring(_hex, 32)
+    def __call__(self, data):
+        lut = self._lut
+        if lut is None:
+            lut = self._lut = self._table()
+
+        # short data, i.e. truncated response, is decoded as the bytes
+        # available
+        if lut and len(data) >= self.end:
+            s = self.start
+            i = data[s] if self.size == 1 else data[s] << 8 | data[s + 1]
+            return (lut[i], self.unit)
+        else:
+            return (self.value(self.raw(data)), self.unit)
+
+
+    def raw(self, data):
+        """
+        Get integer from the data of a response.
+        """
+        data = data[self.start:self.end]
+        return int.from_bytes(data, 'big', signed=self.signed)
+
+
+    def value(self, raw):
+        """
+        Convert integer into the value.
+        """
+        v = raw * self.scale
+        if self.divisor != 1:
+            v = v / self.divisor
+        if self.offset:
+            v = v + self.offset
+        return v
+
+
+    def decode_batch(self, payloads):
+        """
+        Decode values of collection of responses data.
+
+        List of values is returned.
+        """
+        return [self(p)[0] for p in payloads]
+
+
+    def decode_array(self, data):
+        """
+        Decode values of 2-D array of responses data.
+
+        NumPy array of values is returned.
+
+        :param data: 2-D uint8 array, a row per response.
+        """
+        import numpy as np
+
+        data = np.asarray(data, dtype=np.uint8)
+        v = data[:, self.start].astype(np.int64)
+        for i in range(self.start + 1, self.end):
+            v = (v << 8) | data[:, i]
+
+        if self.signed:
+            n = 1 << (8 * self.size)
+            v = np.where(v >= n // 2, v - n, v)
+
+        # the order of operations is the same as in `value` method
+        v = v * float(self.scale)
+        if self.divisor != 1:
+            v = v / self.divisor
+        if self.offset:
+            v = v + self.offset
+        return v
+
+
+    def _table(self):
+        if self.size > 2:
+            return ()
+
+        n = 1 << (8 * self.size)
+        items = range(n)
+        if self.signed:
+            items = (i - n if i >= n // 2 else i for i in items)
+        return [self.value(i) for i in items]
+
+
+    def __repr__(self):
+        return 'Linear({}, {}, {!r}, scale={}, divisor={}, offset={}, ' \
+            'signed={})'.format(
+                self.start, self.end, self.unit, self.scale, self.divisor,
+                self.offset, self.signed
+            )
+
+
+def decode_array(cmd, data, offsets=None):
+    """
+    Decode data of multiple responses to an OBD command.
+
+    The data of responses is either 2-D uint8 array with a row per
+    response, or 1-D uint8 buffer of concatenated responses of variable
+    length and array of `n + 1` offsets of the responses in the buffer.
+
+    The declarative decoders, see `Linear`, are vectorized and float
+    array is returned. Other decoders, i.e. `status` or `dtc`, are called
+    for each response and array of objects is returned.
+
+    Tuple of array of values and unit is returned.
+
+    :param cmd: OBD command.
+    :param data: 2-D array of responses data or buffer of responses data.
+    :param offsets: Offsets of responses data in the buffer.
+    """
+    import numpy as np
+
+    decoder = cmd.decode
+    data = np.asarray(data, dtype=np.uint8)
+    if offsets is not None:
+        offsets = np.asarray(offsets, dtype=np.intp)
+
+    if isinstance(decoder, Linear):
+        if offsets is not None:
+            if np.any(offsets[1:] - offsets[:-1] < decoder.end):
+                raise ValueError('Response data too short for {}'.format(cmd))
+            idx = offsets[:-1, None] + np.arange(decoder.end)
+            data = data[idx]
+        return decoder.decode_array(data), decoder.unit
+
+    if offsets is None:
+        items = (bytes(row) for row in data)
+    else:
+        items = (
+            data[s:e].tobytes() for s, e in zip(offsets[:-1], offsets[1:])
+        )
+    if cmd.bytes: # zero bytes means flexible response
+        items = (v[:cmd.bytes] for v in items)
 
-    output = Status()
-    output.MIL           = bitToBool(bits[0])
-    output.DTC_count     = unbin(bits[1:8])
-    output.ignition_type = IGNITION_TYPE[unbin(bits[12])]
+    values = [decoder(v) for v in items]
+    result = np.empty(len(values), dtype=object)
+    for i, (v, _) in enumerate(values):
+        result[i] = v
+    unit = values[0][1] if values else Unit.NONE
+    return result, unit
 
-    output.tests.append(Test("Misfire", \
-                             bitToBool(bits[15]), \
-                             bitToBool(bits[11])))
 
-    output.tests.append(Test("Fuel System", \
-                             bitToBool(bits[14]), \
-                             bitToBool(bits[10])))
+'''
+Special decoders
+Return objects, lists, etc
+'''
 
-    output.tests.append(Test("Components", \
-                             bitToBool(bits[13]), \
-                             bitToBool(bits[9])))
 
+def bit(data, n):
+    """
+    Get n-th bit of data, counting from the most significant bit of the
+    first byte.
+    """
+    return bool(data[n // 8] & (0x80 >> (n % 8)))
 
-    # different tests for different ignition types 
-    if(output.ignition_type == IGNITION_TYPE[0]): # spark
-        for i in range(8):
-            if SPARK_TESTS[i] is not None:
 
-                t = Test(SPARK_TESTS[i], \
-                         bitToBool(bits[(2 * 8) + i]), \
-                         bitToBool(bits[(3 * 8) + i]))
+@hex_compat
+def status(data):
+    output = Status()
+    output.MIL           = bit(data, 0)
+    output.DTC_count     = data[0] & 0x7F
+    output.ignition_type = IGNITION_TYPE[bit(data, 12)]
 
-                output.tests.append(t)
+    output.tests.append(Test("Misfire", bit(data, 15), bit(data, 11)))
+    output.tests.append(Test("Fuel System", bit(data, 14), bit(data, 10)))
+    output.tests.append(Test("Components", bit(data, 13), bit(data, 9)))
 
-    elif(output.ignition_type == IGNITION_TYPE[1]): # compression
-        for i in range(8):
-            if COMPRESSION_TESTS[i] is not None:
+    # different tests for different ignition types
+    if output.ignition_type == IGNITION_TYPE[0]: # spark
+        tests = SPARK_TESTS
+    else: # compression
+        tests = COMPRESSION_TESTS
 
-                t = Test(COMPRESSION_TESTS[i], \
-                         bitToBool(bits[(2 * 8) + i]), \
-                         bitToBool(bits[(3 * 8) + i]))
-                
-                output.tests.append(t)
+    for i in range(8):
+        if tests[i] is not None:
+            t = Test(tests[i], bit(data, 2 * 8 + i), bit(data, 3 * 8 + i))
+            output.tests.append(t)
 
     return (output, Unit.NONE)
 
 
 
-def fuel_status(_hex):
-    v = unhex(_hex[0:2]) # todo, support second fuel system
+@hex_compat
+def fuel_status(data):
+    v = data[0] # todo, support second fuel system
 
     if v <= 0:
-        logger.debug("Invalid fuel status response (v <= 0)", True)
+        logger.debug("Invalid fuel status response (v <= 0)")
         return (None, Unit.NONE)
 
-    i = math.log(v, 2) # only a single bit should be on
-
-    if i % 1 != 0:
-        logger.debug("Invalid fuel status response (multiple bits set)", True)
+    # only a single bit should be on
+    if v & (v - 1):
+        logger.debug("Invalid fuel status response (multiple bits set)")
         return (None, Unit.NONE)
 
-    i = int(i)
+    i = v.bit_length() - 1
 
     if i >= len(FUEL_STATUS):
-        logger.debug("Invalid fuel status response (no table entry)", True)
+        logger.debug("Invalid fuel status response (no table entry)")
         return (None, Unit.NONE)
 
     return (FUEL_STATUS[i], Unit.NONE)
 
 
-def air_status(_hex):
-    v = unhex(_hex)
+@hex_compat
+def air_status(data):
+    v = from_bytes(data)
 
     if v <= 0:
-        logger.debug("Invalid air status response (v <= 0)", True)
+        logger.debug("Invalid air status response (v <= 0)")
         return (None, Unit.NONE)
 
-    i = math.log(v, 2) # only a single bit should be on
-
-    if i % 1 != 0:
-        logger.debug("Invalid air status response (multiple bits set)", True)
+    # only a single bit should be on
+    if v & (v - 1):
+        logger.debug("Invalid air status response (multiple bits set)")
         return (None, Unit.NONE)
 
-    i = int(i)
+    i = v.bit_length() - 1
 
     if i >= len(AIR_STATUS):
-        logger.debug("Invalid air status response (no table entry)", True)
+        logger.debug("Invalid air status response (no table entry)")
         return (None, Unit.NONE)
 
     return (AIR_STATUS[i], Unit.NONE)
 
 
-def obd_compliance(_hex):
-    i = unhex(_hex)
+@hex_compat
+def obd_compliance(data):
+    i = from_bytes(data)
 
     v = "Error: Unknown OBD compliance response"
 
@@ -318,8 +562,9 @@ def obd_compliance(_hex):
     return (v, Unit.NONE) 
 
 
-def fuel_type(_hex):
-    i = unhex(_hex)
+@hex_compat
+def fuel_type(data):
+    i = from_bytes(data)
 
     v = "Error: Unknown fuel type response"
 
@@ -329,39 +574,36 @@ def fuel_type(_hex):
     return (v, Unit.NONE)
 
 
-# converts 2 bytes of hex into a DTC code
-def single_dtc(_hex):
+# converts 2 bytes into a DTC code
+def single_dtc(data):
+    if isinstance(data, str):
+        data = unhex_bytes(data) if len(data) == 4 else b''
 
-    if len(_hex) != 4:
+    if len(data) != 2:
         return None
 
-    if _hex == "0000":
+    a, b = data
+    if a == b == 0:
         return None
 
-    bits = bitstring(_hex[0], 4)
-
-    dtc = ""
-    dtc += ['P', 'C', 'B', 'U'][unbin(bits[0:2])]
-    dtc += str(unbin(bits[2:4]))
-    dtc += _hex[1:4]
-
-    return dtc
+    return '{}{}{:X}{:02X}'.format('PCBU'[a >> 6], (a >> 4) & 0x03, a & 0x0F, b)
 
 # converts a frame of 2-byte DTCs into a list of DTCs
-# example input = "010480034123"
-#                  [  ][  ][  ]
-def dtc(_hex):
+# example input = b'\x01\x04\x80\x03\x41\x23'
+#                   [      ][      ][      ]
+def dtc(data):
+    if isinstance(data, str):
+        # incomplete codes are dropped
+        data = unhex_bytes(data[:len(data) // 2 * 2])
+
     codes = []
-    for n in range(0, len(_hex), 4):
-        dtc = single_dtc(_hex[n:n+4])
+    for n in range(0, len(data) - 1, 2):
+        dtc = single_dtc(data[n:n + 2])
 
         if dtc is not None:
 
             # pull a description if we have one
-            desc = "Unknown error code"
-            if dtc in DTC:
-                desc = DTC[dtc]
-
+            desc = DTC.get(dtc, "Unknown error code")
             codes.append( (dtc, desc) )
 
     return (codes, Unit.NONE)
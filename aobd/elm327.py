@@ -23,12 +23,22 @@
 #
 
 import asyncio
+import collections
+import contextlib
 import functools
+import heapq
+import itertools
 import logging
 import re
-import serial
+import statistics
 import time
+from .capability import Capabilities, CapabilityStore
 from .protocols import *
+from .protocols.protocol_can import CANProtocol
+from .profile import Profile
+from .stats import Timing
+from .trace import WireTrace, SENT, RECEIVED
+from .transport import create_transport, READ_SIZE
 from .utils import numBitsSet
 
 logger = logging.getLogger(__name__)
@@ -36,6 +46,31 @@ logger = logging.getLogger(__name__)
 # 30s to read data from serial device until prompt
 TIMEOUT = 30
 
+# time to wait for response of device when probing its state
+PROBE_TIMEOUT = 1
+
+# time to wait for reset command to be written on close
+CLOSE_TIMEOUT = 1
+
+# number of requests to measure latency of device
+PROBE_COUNT = 3
+
+# maximum number of expected responses, which can be appended to a request
+MAX_RESPONSES = 0xF
+
+# size of receive buffer
+BUFFER_SIZE = 64 * 1024
+
+PROMPT = ord('>')
+
+# priority classes of queued requests, lower value is sent first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# responses of ELM327 device, which cannot connect to the vehicle
+BUS_ERRORS = (b'UNABLE TO CONNECT', b'BUS INIT', b'BUS ERROR', b'CAN ERROR')
+
 # get rid of
 #
 # - 0x00 (ELM spec page 9)
@@ -43,7 +78,7 @@ TIMEOUT = 30
 #
 RE_CLEAN = re.compile(b'[\x00>]')
 RE_SPLIT = re.compile(b'[\r\n]')
-RE_VERSION = re.compile('v(\d+.\d+[a-z]?)')
+RE_VERSION = re.compile(rb'v(\d+\.\d+[a-z]?)')
 
 clean_data = functools.partial(RE_CLEAN.sub, b'')
 split_data = RE_SPLIT.split
@@ -51,7 +86,8 @@ split_data = RE_SPLIT.split
 class ELM327:
     """
         Provides interface for the vehicles primary ECU.
-        After instantiation with a portname (/dev/ttyUSB0, etc...),
+        After instantiation with a device (/dev/ttyUSB0,
+        tcp://192.168.0.10:35000, transport instance, etc...),
         the following functions become available:
 
             query()
@@ -75,49 +111,167 @@ class ELM327:
         #"C" : None, # user defined 2
     }
 
-    def __init__(self, portname, baudrate, loop=None):
-        """Initializes port by resetting device and gettings supported PIDs. """
+    def __init__(
+            self, device, baudrate, loop=None, trace_path=None,
+            capability_path=None,
+        ):
+        """
+        Open transport of ELM327 device.
+
+        The data sent to and received from the device is recorded with
+        wire trace, see `trace` attribute.
+
+        The features used to speed up communication are enabled depending
+        on capabilities of the device, see `capabilities` attribute and
+        `aobd.capability` module. If path of capabilities file is set,
+        then the device is probed on first connection and its
+        capabilities are saved. Otherwise, the capabilities are guessed
+        from version of the device.
+
+        :param device: Serial device path, TCP address or transport.
+        :param baudrate: Baud rate of serial device.
+        :param loop: Asyncio event loop.
+        :param trace_path: Path of the file the wire trace is saved to on
+            error.
+        :param capability_path: Path of capabilities file.
+        """
 
         self.__connected   = False
-        self.__port        = None
+        self.__transport   = None
         self.__protocol    = None
         self.__primary_ecu = None # message.tx_id
         self._version = None
+        self._protocol_id = None
+        self.profiled = False
+
+        # number of response frames expected for each request and
+        # encoded requests
+        self._responses = {}
+        self._requests = {}
+        self._n_ecus = None
+
+        # capabilities of the device, the key identifying the device in
+        # capabilities file and true if the device is to be probed
+        self.capabilities = Capabilities()
+        self._device_name = device if isinstance(device, str) else None
+        self._capability_store = None if capability_path is None \
+            else CapabilityStore(capability_path)
+        self._capability_key = None
+        self._probe = False
+
+        # scheduler of requests; heap of queued requests, queued requests
+        # with their priority and response future, and the request being
+        # processed by the device
+        self._queue = []
+        self._waiting = {}
+        self._current = None
+        self._counter = itertools.count()
+
+        # the queued requests are not sent while AT commands are sent to
+        # the device, see `_exclusive` method
+        self._lock = asyncio.Lock()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._held = False
+
+        # ------------- open transport -------------
 
-        # ------------- open port -------------
+        self._loop = asyncio.get_event_loop() if loop is None else loop
+        self.trace = WireTrace(path=trace_path)
+        self._buffer = ResponseBuffer(self._loop, trace=self.trace)
 
-        logger.debug('opening serial port {}'.format(portname))
+        transport = create_transport(device, baudrate)
+        transport.open(self._buffer, self._loop)
+        self.__transport = transport
 
-        self.__port = serial.Serial(
-            portname,
-            baudrate=baudrate,
-            parity=serial.PARITY_NONE,
-            stopbits=1,
-            bytesize=8,
-            timeout=0,
-        )
 
-        self._loop = asyncio.get_event_loop() if loop is None else loop
-        self._queue = asyncio.Queue()
-        self._loop.add_reader(self.__port.fileno(), self._read_data)
-        logger.debug(
-            'started to watch serial port file descriptior {}'
-            .format(self.__port.fileno())
-        )
+    async def connect(self, profile=None, fast=False):
+        """
+        Set up the device and detect the vehicle protocol.
+
+        If fast connection is enabled, then the device is set up with as
+        few round trips as possible, see `_fast_setup` method. On any
+        anomaly, the device is reset and set up with the full sequence of
+        commands.
 
+        If session profile of the vehicle is given and it was created with
+        the same version of the device, then the protocol, the primary ECU
+        and the number of ECUs are taken from the profile and the protocol
+        detection is skipped. The `profiled` attribute is set to true in
+        such case.
 
-    async def connect(self):
+        The queued requests are cancelled. The wire trace is saved on
+        failure.
+
+        :param profile: Session profile of the vehicle.
+        :param fast: Enable fast connection.
+        """
+        try:
+            await self._connect(profile, fast)
+        except Exception as ex:
+            self.trace.error('connection failed: {}'.format(ex))
+            raise
+
+
+    async def _connect(self, profile=None, fast=False):
+        self.__connected = False
+        self.profiled = False
+        self._cancel()
+        self._requests.clear()
+        self._responses.clear()
+
+        kept = None
+        if fast:
+            try:
+                kept = await self._fast_setup(profile)
+            except OBDError as ex:
+                logger.warning('fast connection failed: {}'.format(ex))
+                fast = False
+        if not fast:
+            await self._setup()
+
+        if profile is not None and profile.version == self._version:
+            # ------------------ ATSP<n> (protocol of profile) ------------------
+            p = profile.protocol
+            if kept == p:
+                ok = True
+                logger.info('protocol {} kept'.format(p))
+            else:
+                r = await self._send(b'ATSP' + p.encode())
+                ok = p in self._SUPPORTED_PROTOCOLS and self.__isok(r)
+            if ok:
+                self._set_protocol(p)
+                self.__primary_ecu = profile.primary_ecu
+                self._n_ecus = profile.n_ecus
+                self.profiled = True
+            else:
+                logger.warning('cannot set protocol {} of profile'.format(p))
+
+        if not self.profiled:
+            await self._detect_protocol()
+
+        if self._probe:
+            await self._probe_capabilities()
+
+        logger.info('connection successful')
+        self.__connected = True
+
+
+    async def _setup(self):
+        """
+        Reset and set up the device with full sequence of commands.
+        """
         # ---------------------------- ATZ (reset) ----------------------------
         # reset device, read the response (if any) and try to detect
         # version of the device
         r = await self._send(b'ATZ')
-        self._version = self._parse_version(r)
-        if self._version:
-            logger.info('version detected: {}'.format(self._version))
-            if self._version >= '1.3':
-                r = await self._send(b'ATS0')
-                if not self.__isok(r, expectEcho=True):
-                    raise OBDError('ATS0 did not return OK')
+        self._set_version(self._parse_version(r))
+        await self._load_capabilities(r)
+        if self.capabilities.spaces_off:
+            r = await self._send(b'ATS0')
+            if not self.__isok(r, expectEcho=True):
+                # spaces are accepted by the protocol parsers
+                logger.warning('ATS0 did not return OK')
 
         # -------------------------- ATE0 (echo OFF) --------------------------
         r = await self._send(b'ATE0')
@@ -134,6 +288,169 @@ class ELM327:
         if not self.__isok(r):
             raise OBDError("ATL0 did not return 'OK'")
 
+        # ---------------------- ATAT2 (adaptive timing) ----------------------
+        if self.capabilities.adaptive_timing:
+            r = await self._send(b'ATAT2')
+            if not self.__isok(r):
+                logger.warning('ATAT2 did not return OK')
+
+
+    async def _fast_setup(self, profile=None):
+        """
+        Set up the device with as few round trips as possible.
+
+        The state of the device is probed with `ATI` command. The device
+        echoing the commands is in its default state, i.e. after power on,
+        and it is not reset. The device with echo off was set up by
+        previous connection. It is not reset if there is session profile of
+        the vehicle, so the vehicle bus session is kept if the device uses
+        the protocol of the profile. Otherwise, the device is reset with
+        `ATWS` warm start, which is faster than `ATZ` reset.
+
+        The settings are sent with single write and the echo off setting
+        is skipped if echo is off already.
+
+        Protocol number of the device is returned if the device was not
+        reset and it uses the protocol of the profile, otherwise `None` is
+        returned. `OBDError` is raised on any anomaly.
+
+        :param profile: Session profile of the vehicle.
+        """
+        r = ati = await self._send(b'ATI', PROBE_TIMEOUT)
+        version = self._parse_version(r)
+        if version is None:
+            raise OBDError('ATI did not return version')
+
+        echo = b'ATI' in r
+        keep = not echo and profile is not None and profile.version == version
+        if not echo and not keep:
+            r = await self._send(b'ATWS', PROBE_TIMEOUT)
+            version = self._parse_version(r)
+            if version is None:
+                raise OBDError('ATWS did not return version')
+            echo = True
+        self._set_version(version)
+        await self._load_capabilities(ati)
+
+        cmds = [b'ATE0'] if echo else []
+        if self.capabilities.spaces_off:
+            cmds.append(b'ATS0')
+        cmds.extend((b'ATH1', b'ATL0'))
+        if self.capabilities.adaptive_timing:
+            cmds.append(b'ATAT2')
+        settings = len(cmds)
+        if keep:
+            cmds.append(b'ATDPN')
+
+        responses = await self._pipeline(cmds)
+        for cmd, r in zip(cmds[:settings], responses):
+            if not r or r[-1] != b'OK':
+                raise OBDError('{} did not return OK'.format(cmd.decode()))
+
+        if keep and responses[-1]:
+            p = responses[-1][-1].decode(errors='replace')
+            p = p[1:] if len(p) > 1 and p.startswith('A') else p
+            if p == profile.protocol:
+                return p
+        return None
+
+
+    def _set_version(self, version):
+        """
+        Set version of the device and guess its capabilities.
+        """
+        self._version = version
+        if version:
+            logger.info('version detected: {}'.format(version))
+        self.capabilities = Capabilities.from_version(version)
+
+
+    async def _load_capabilities(self, ati):
+        """
+        Load capabilities of the device from capabilities file.
+
+        The device is identified by its path and the responses to `ATI`
+        and `AT@1` commands. If the device is not found in the file, then
+        it is probed when the vehicle protocol is known.
+
+        :param ati: Response lines of `ATI` or `ATZ` command.
+        """
+        if self._capability_store is None or self._device_name is None:
+            return
+
+        r = await self._send(b'AT@1', PROBE_TIMEOUT)
+        ati = next((s for s in ati if RE_VERSION.search(s)), b'')
+        key = '{}|{}|{}'.format(
+            self._device_name, ati.decode(errors='replace'),
+            r[-1].decode(errors='replace') if r else ''
+        )
+        self._capability_key = key
+
+        caps = self._capability_store.get(key)
+        self._probe = caps is None
+        if caps is not None:
+            logger.info('device capabilities: {}'.format(caps))
+            self.capabilities = caps
+
+
+    async def probe(self):
+        """
+        Probe capabilities of the device.
+
+        The device has to be set up and the vehicle protocol has to be
+        detected. The supported device settings, i.e. spaces off and
+        adaptive timing, are left enabled. The queued requests wait for
+        each probing command.
+        """
+        caps = Capabilities()
+        r = await self._send(b'ATS0', PROBE_TIMEOUT)
+        caps.spaces_off = bool(r) and r[-1] == b'OK'
+        r = await self._send(b'ATAT2', PROBE_TIMEOUT)
+        caps.adaptive_timing = bool(r) and r[-1] == b'OK'
+
+        times = []
+        for _ in range(PROBE_COUNT):
+            start = time.monotonic()
+            await self._send(b'0100')
+            times.append(time.monotonic() - start)
+        caps.latency = statistics.median(times)
+
+        n = self._n_ecus
+        if n and n <= MAX_RESPONSES:
+            r = await self._send(b'0100%X' % n)
+            caps.response_count = self._has_response(b'0100', r)
+
+        if isinstance(self.__protocol, CANProtocol):
+            r = await self._send(b'010020')
+            caps.multi_pid = self._has_response(b'0100', r)
+        return caps
+
+
+    async def _probe_capabilities(self):
+        """
+        Probe capabilities of the device and save them in capabilities
+        file.
+        """
+        self.capabilities = caps = await self.probe()
+        self._probe = False
+        logger.info('device capabilities probed: {}'.format(caps))
+        try:
+            self._capability_store.save(self._capability_key, caps)
+        except OSError as ex:
+            logger.warning('cannot save device capabilities: {}'.format(ex))
+
+
+    def _has_response(self, cmd, lines):
+        """
+        Check if the primary ECU responded to OBD command.
+        """
+        return any(
+            m.tx_id == self.__primary_ecu and is_response(cmd, m)
+            for m in self.__protocol(lines)
+        )
+
+
+    async def _detect_protocol(self):
         # ---------------------- ATSPA8 (protocol AUTO) -----------------------
         r = await self._send(b'ATSPA8')
         if not self.__isok(r):
@@ -147,7 +464,7 @@ class ELM327:
         if not r:
             raise OBDError('No data from "protocol by number" command')
 
-        p = r[0]
+        p = r[0].decode()
 
         # suppress any "automatic" prefix
         p = p[1:] if len(p) > 1 and p.startswith('A') else p[:-1]
@@ -156,7 +473,7 @@ class ELM327:
             raise OBDError('Unknown protocol: {}'.format(p))
 
         # instantiate the correct protocol handler
-        self.__protocol = self._SUPPORTED_PROTOCOLS[p]()
+        self._set_protocol(p)
 
         # Now that a protocol has been selected, we can figure out
         # which ECU is the primary.
@@ -165,24 +482,33 @@ class ELM327:
         if self.__primary_ecu is None:
             raise OBDError('Failed to choose primary ECU')
 
-        logger.info('connection successful')
-        self.__connected = True
+        self._n_ecus = len(m)
+        self._learn_responses(b'0100', m)
+        logger.info('number of ECUs responding: {}'.format(self._n_ecus))
+
+
+    def _set_protocol(self, p):
+        """
+        Create protocol handler of protocol number.
+        """
+        self._protocol_id = p
+        self.__protocol = self._SUPPORTED_PROTOCOLS[p]()
 
 
     def _parse_version(self, data):
         items = (RE_VERSION.findall(s) for s in data)
         items = (v for v in items if v)
         version = next(items, None)
-        return version[0] if version else None
+        return version[0].decode() if version else None
 
 
     def __isok(self, lines, expectEcho=False):
         if not lines:
             return False
         if expectEcho:
-            return len(lines) == 2 and lines[1] == 'OK'
+            return len(lines) == 2 and lines[1] == b'OK'
         else:
-            return len(lines) == 1 and lines[0] == 'OK'
+            return len(lines) == 1 and lines[0] == b'OK'
 
 
     def __find_primary_ecu(self, messages):
@@ -191,56 +517,79 @@ class ELM327:
             (in response to the 0100 PID listing command)
             choose the ID of the primary ECU
         """
+        return find_primary_ecu(self.__protocol, messages)
 
-        if len(messages) == 0:
-            return None
-        elif len(messages) == 1:
-            return messages[0].tx_id
-        else:
-            # first, try filtering for the standard ECU IDs
-            test = lambda m: m.tx_id == self.__protocol.PRIMARY_ECU
-
-            if bool([m for m in messages if test(m)]):
-                return self.__protocol.PRIMARY_ECU
-            else:
-                # last resort solution, choose ECU
-                # with the most PIDs supported
-                best = 0
-                tx_id = None
 
-                for message in messages:
-                    bits = sum([numBitsSet(b) for b in message.data_bytes])
+    @property
+    def connected(self):
+        return self.__connected and (self.__transport is not None) \
+            and self._buffer.error is None
 
-                    if bits > best:
-                        best = bits
-                        tx_id = message.tx_id
 
-                return tx_id
+    @property
+    def protocol(self):
+        """
+        Protocol handler detected on connection or `None`.
+        """
+        return self.__protocol
 
 
     @property
-    def connected(self):
-        return self.__connected and (self.__port is not None)
+    def multi_pid(self):
+        """
+        True if multi-PID requests can be sent to the vehicle.
+        """
+        return isinstance(self.__protocol, CANProtocol) \
+            and self.capabilities.multi_pid
+
+
+    def profile(self):
+        """
+        Create session profile of connected vehicle.
+
+        The profile contains version of the device, the protocol number,
+        the primary ECU and the number of ECUs.
+        """
+        return Profile(
+            self._version, self._protocol_id, self.__primary_ecu,
+            self._n_ecus
+        )
 
 
     def close(self):
         """
-        Close serial port and set `ELM327` instance to unconnected state.
+        Close transport and set `ELM327` instance to unconnected state.
+
+        The device is reset with `ATZ` command if connected. If the
+        command cannot be written at once, then the transport is closed
+        when the command is written, but after `CLOSE_TIMEOUT` at the
+        latest.
         """
+        transport = self.__transport
         try:
+            self._cancel()
+            written = None
             if self.connected:
-                self.__write(b'ATZ')
-                self.__port.close()
+                written = self.__write(b'ATZ\r')
+            if transport is None:
+                pass
+            elif written is None or written.done():
+                transport.close()
+            else:
+                handle = self._loop.call_later(CLOSE_TIMEOUT, transport.close)
+                written.add_done_callback(
+                    functools.partial(close_written, transport, handle)
+                )
         finally:
             self.__connected = False
-            self.__port = None
+            self.__transport = None
             self.__protocol = None
             self.__primary_ecu = None
 
         logger.info('port closed')
 
 
-    async def query(self, cmd):
+    async def query(self, cmd, priority=PRIORITY_NORMAL):
         """
             send() function used to service all OBDCommands
 
@@ -249,6 +598,33 @@ class ELM327:
 
             Returns the Message object from the primary ECU, or None,
             if no appropriate response was recieved.
+
+            :param cmd: OBD command request.
+            :param priority: Priority class of the request.
+        """
+        lines = await self.submit(cmd, priority)
+        return self.parse(cmd, lines)
+
+
+    def submit(self, cmd, priority=PRIORITY_NORMAL):
+        """
+        Queue request of OBD command and get awaitable of the response.
+
+        The requests are sent to the device one at a time. The request is
+        written immediately if the device is idle. Otherwise, it waits in
+        the queue for the requests of higher priority and the requests of
+        the same priority queued before it.
+
+        Identical requests are coalesced. If the same request is queued
+        or processed by the device already, then the awaitable shares its
+        response.
+
+        The response lines are available when the awaitable is done, use
+        `parse` method to get message from the lines. The timestamps of
+        the request are available with `timing` attribute of the lines.
+
+        :param cmd: OBD command request.
+        :param priority: Priority class of the request.
         """
         if not self.connected:
             raise OBDError('Device not connected')
@@ -256,67 +632,533 @@ class ELM327:
         if b'AT' in cmd.upper():
             raise OBDError('AT command not allowed')
 
-        lines = await self._send(cmd)
+        current = self._current
+        if current is not None and current[0] == cmd:
+            task = current[1]
+        else:
+            task = self._enqueue(cmd, priority)
+            self._next()
+
+        # cancellation of one waiter shall not cancel the request
+        return asyncio.shield(task)
+
+
+    def _enqueue(self, cmd, priority):
+        """
+        Put request into the queue and return its response future.
+
+        Queued request is moved up the queue if requested again with
+        higher priority. Stale entries of the heap are skipped by
+        `_next` method.
+        """
+        item = self._waiting.get(cmd)
+        if item is None:
+            task = self._loop.create_future()
+        elif priority < item[0]:
+            task = item[1]
+        else:
+            return item[1]
+
+        self._waiting[cmd] = priority, task
+        heapq.heappush(self._queue, (priority, next(self._counter), cmd))
+        return task
+
+
+    def _next(self):
+        """
+        Send next queued request if the device is idle.
+        """
+        if self._current is not None or self._held:
+            return
+
+        while self._queue:
+            priority, _, cmd = heapq.heappop(self._queue)
+            item = self._waiting.get(cmd)
+            if item is not None and item[0] == priority:
+                break
+        else:
+            return
+
+        del self._waiting[cmd]
+        task = item[1]
+        transfer = asyncio.ensure_future(self._transfer(self._request(cmd)))
+        transfer.add_done_callback(self._done)
+        self._current = cmd, task, transfer
+        self._idle.clear()
+
+
+    def _done(self, transfer):
+        """
+        Set response of the processed request and send next one.
+        """
+        _, task, _ = self._current
+        self._current = None
+        self._idle.set()
+
+        if task.done():
+            pass
+        elif transfer.cancelled():
+            task.set_exception(OBDError('request cancelled'))
+        elif transfer.exception() is not None:
+            task.set_exception(transfer.exception())
+        else:
+            task.set_result(transfer.result())
+
+        self._next()
+
+
+    def _cancel(self):
+        """
+        Cancel queued requests and the request processed by the device.
+
+        The responses of the requests fail with `OBDError`, so their
+        callers, i.e. background polling of commands, can handle the
+        cancellation like other errors of the device.
+        """
+        waiting = self._waiting.values()
+        self._queue.clear()
+        self._waiting = {}
+        for _, task in waiting:
+            task.set_exception(OBDError('request cancelled'))
+
+        if self._current is not None:
+            _, task, transfer = self._current
+            if not task.done():
+                task.set_exception(OBDError('request cancelled'))
+            transfer.cancel()
+
 
+    def parse(self, cmd, lines):
+        """
+        Parse response lines of OBD command.
+
+        Returns the Message object from the primary ECU, or None, if no
+        appropriate response was recieved. A message, which does not match
+        mode and PID of the command, is discarded.
+        """
         # parses string into list of messages
         messages = self.__protocol(lines)
 
         # select the first message with the ECU ID we're looking for
         # TODO: use ELM header settings to query ECU by address directly
+        result = None
         for message in messages:
             if message.tx_id == self.__primary_ecu:
-                return message
+                if is_response(cmd, message):
+                    result = message
+                    break
 
-        return None # no suitable response was returned
+                logger.warning(
+                    'response {:02X} {} does not match request {}'.format(
+                        message.mode, message.pid, cmd
+                    )
+                )
+                break
 
+        self._learn_responses(cmd, messages, result is not None)
+        return result # none if no suitable response was returned
 
-    def __write(self, cmd):
+
+    def _request(self, cmd):
         """
-            "low-level" function to write a string to the port
+        Get encoded request for OBD command.
+
+        The requests are encoded once and cached.
         """
-        cmd += b'\r\n' # terminate
-        logger.debug('sending: ' + repr(cmd))
-        self.__port.flushInput() # dump everything in the input buffer
-        self.__port.write(cmd) # turn the string into bytes and write
-        self.__port.flush() # wait for the output buffer to finish transmitting
-        logger.debug('data sent')
+        request = self._requests.get(cmd)
+        if request is None:
+            request = self._requests[cmd] = self._encode(cmd)
+        return request
 
 
-    def _read_data(self):
-        data = self.__port.read(1024)
-        self._queue.put_nowait(data)
+    def _encode(self, cmd):
+        """
+        Create request for OBD command.
 
+        If number of responses to the command is known, then it is
+        appended to the command, so ELM327 returns the data as soon as
+        all responses arrive instead of waiting for its timeout.
 
-    async def _read_until(self, stop):
-        data = bytearray()
-        try:
-            while True:
-                v = await asyncio.wait_for(self._queue.get(), timeout=TIMEOUT)
+        The number of responses is learned from the previous responses to
+        the command. Single PID mode 01 requests are expected to be
+        answered by each ECU responding to the `0100` probe. The number is
+        not appended while it is learned again, see `_learn_responses`.
+        """
+        n = None
+        if self.capabilities.response_count:
+            n = self._responses.get(cmd)
+            if n is None and len(cmd) == 4 and cmd.startswith(b'01'):
+                n = self._n_ecus
 
-                if logger.isEnabledFor(logging.DEBUG):
-                    logger.debug('received: {}'.format(v))
+        if n and n <= MAX_RESPONSES:
+            cmd += b'%X' % n
+        return cmd + b'\r'
 
-                data.extend(v)
-                if stop in v:
-                    break
+
+    def _learn_responses(self, cmd, messages, found=True):
+        """
+        Remember number of frames received in response to the command.
+
+        The device returns at most the number of frames appended to a
+        request, so the number is not learned from the responses to such
+        requests. If response of the primary ECU is missing, then the
+        number is forgotten and the next request is sent without it, so
+        the number is learned again.
+
+        Empty responses, i.e. `NO DATA`, are ignored.
+
+        :param cmd: OBD command request.
+        :param messages: Messages of the response.
+        :param found: False if response of the primary ECU is missing.
+        """
+        request = self._requests.get(cmd)
+        if request is not None and len(request) > len(cmd) + 1:
+            if not found:
+                logger.debug(
+                    'response to {} missing, number of responses'
+                    ' forgotten'.format(cmd)
+                )
+                self._responses[cmd] = 0
+                self._requests.pop(cmd, None)
+            return
+
+        n = sum(len(m.frames) for m in messages)
+        if n and self._responses.get(cmd) != n:
+            self._responses[cmd] = n
+            self._requests.pop(cmd, None)
+
+
+    def __write(self, data):
+        """
+        Write data to the device without blocking the event loop.
+
+        Future is returned, which is done when all data is written.
+        """
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('sending: {}'.format(data))
+        self.trace.record(SENT, data)
+        self.__transport.reset() # dump everything in the input buffer
+        return self.__transport.write(data)
+
+
+    async def _read_response(self, timeout=TIMEOUT):
+        """
+        Read response of ELM327 device terminated with the prompt.
+
+        Data received so far is returned if the prompt is not received
+        within the timeout.
+
+        :param timeout: Time to wait for the prompt in seconds.
+        """
+        try:
+            task = self._buffer.wait()
+            return await asyncio.wait_for(task, timeout=timeout)
         except asyncio.TimeoutError:
-            logger.warning('{} never received'.format(stop))
-        return data
+            logger.warning('prompt never received')
+            self.trace.error('prompt never received')
+            return self._buffer.pending()
+
+
+    @contextlib.asynccontextmanager
+    async def _exclusive(self):
+        """
+        Get exclusive access to the device for AT commands.
+
+        The request processed by the device is finished first and the
+        queued requests are not sent until the exclusive access ends, so
+        the response buffer is not reset under them.
+        """
+        async with self._lock:
+            self._held = True
+            try:
+                await self._idle.wait()
+                yield
+            finally:
+                self._held = False
+                self._next()
 
 
-    async def _send(self, cmd):
-        self.__write(cmd)
+    async def _send(self, cmd, timeout=TIMEOUT):
+        async with self._exclusive():
+            return await self._transfer(cmd + b'\r', timeout)
 
-        data = await self._read_until(b'>')
-        data = clean_data(data)
-        data = split_data(data)
 
-        lines = (s.strip() for s in data)
-        lines = [s.decode() for s in lines if s]
+    async def _pipeline(self, cmds, timeout=PROBE_TIMEOUT):
+        """
+        Send commands with single write and receive their responses.
+
+        The device processes the commands one after another as they are
+        received, so all the commands take single round trip.
+
+        List of response lines of each command is returned.
+
+        :param cmds: Commands without terminating carriage return.
+        :param timeout: Time to wait for each response in seconds.
+        """
+        async with self._exclusive():
+            await self._start(b''.join(c + b'\r' for c in cmds))
+            responses = []
+            for _ in cmds:
+                data = await self._read_response(timeout)
+                responses.append(to_lines(data))
+            return responses
+
+
+    def _transfer(self, request, timeout=TIMEOUT):
+        """
+        Write request and get coroutine receiving its response.
+        """
+        timing = Timing(request)
+        written = self._start(request)
+        if written.done():
+            timing.written = time.monotonic_ns()
+        return self._receive(written, timing, timeout)
+
+
+    def _start(self, request):
+        """
+        Start writing request and return future of written request.
+
+        The data received before the request is discarded.
+        """
+        self._buffer.reset()
+        return self.__write(request)
+
+
+    async def _receive(self, written, timing, timeout=TIMEOUT):
+        await written
+        if timing.written is None:
+            timing.written = time.monotonic_ns()
+
+        data = await self._read_response(timeout)
+        timing.prompt = time.monotonic_ns()
+        timing.first_byte = self._buffer.first_byte
+
+        lines = Lines(to_lines(data))
+        lines.timing = timing
         return lines
 
 
 
+class Lines(list):
+    """
+    Lines of ELM327 response.
+
+    :var timing: Timestamps of the request and the response.
+    """
+    __slots__ = ('timing',)
+
+
+
+def to_lines(data):
+    """
+    Split response data of ELM327 device into non-empty lines.
+    """
+    lines = (s.strip() for s in split_data(clean_data(data)))
+    return [s for s in lines if s]
+
+
+def close_written(transport, handle, written):
+    """
+    Close transport when reset command is written on close of ELM327
+    device.
+    """
+    handle.cancel()
+    if not written.cancelled() and written.exception() is not None:
+        logger.warning('cannot reset device: {}'.format(written.exception()))
+    transport.close()
+
+
+def is_bus_error(lines):
+    """
+    Check if response lines of OBD command contain error of connection to
+    the vehicle, i.e. the vehicle does not use the protocol set.
+    """
+    return any(e in s for s in lines for e in BUS_ERRORS)
+
+
+def is_response(cmd, message):
+    """
+    Check if message is response to OBD command.
+
+    The mode of the response is the mode of the request plus 0x40. The
+    first PID of the response is the first PID of the request.
+    """
+    if message.mode != int(cmd[:2], 16) + 0x40:
+        return False
+    return len(cmd) < 4 or message.pid == int(cmd[2:4], 16)
+
+
+
+def find_primary_ecu(protocol, messages):
+    """
+    Choose ID of the primary ECU from responses to `0100` request.
+
+    The standard ID of the primary ECU of the protocol is preferred. If
+    it is not found, then the ECU supporting the most PIDs is chosen.
+    `None` is returned if there are no messages.
+
+    :param protocol: Protocol handler.
+    :param messages: Messages of the response.
+    """
+    if len(messages) == 0:
+        return None
+    elif len(messages) == 1:
+        return messages[0].tx_id
+    elif any(m.tx_id == protocol.PRIMARY_ECU for m in messages):
+        return protocol.PRIMARY_ECU
+    else:
+        # last resort solution, choose ECU with the most PIDs supported
+        bits = lambda m: sum(numBitsSet(b) for b in m.data_bytes)
+        best = max(messages, key=bits)
+        return best.tx_id if bits(best) else None
+
+
+
+class ResponseBuffer:
+    """
+    Receive buffer for ELM327 responses.
+
+    The data is read into a preallocated buffer, which is scanned for the
+    prompt incrementally, so each byte is scanned once. A waiting
+    coroutine is woken up once per complete response and receives memory
+    view of the response data without the prompt.
+
+    The memory view of a response stays valid - the buffer is never
+    overwritten. When it fills up, a new buffer is allocated and the
+    unprocessed data is moved into it.
+
+    :param loop: Asyncio event loop.
+    :param size: Initial size of the buffer.
+    :param trace: Wire trace recording received data.
+    """
+    def __init__(self, loop, size=BUFFER_SIZE, trace=None):
+        self._loop = loop
+        self._trace = trace
+        self._data = bytearray(size)
+        self._view = memoryview(self._data)
+        self._start = 0 # start of current response
+        self._scan = 0  # data before this position scanned for the prompt
+        self._end = 0   # end of received data
+        self._waiters = collections.deque()
+
+        # time of first byte of current response
+        self.first_byte = None
+
+        # error set when connection to the device is lost
+        self.error = None
+
+
+    def get_buffer(self, sizehint):
+        """
+        Get memory view of free space in the buffer for incoming data.
+
+        :param sizehint: Minimum size of the free space.
+        """
+        sizehint = max(sizehint, READ_SIZE)
+        if len(self._data) - self._end < sizehint:
+            self._compact(sizehint)
+        return self._view[self._end:]
+
+
+    def buffer_updated(self, nbytes):
+        """
+        Process data written into the buffer.
+
+        :param nbytes: Number of bytes written into the buffer.
+        """
+        if self._start == self._end:
+            self.first_byte = time.monotonic_ns()
+        end = self._end + nbytes
+        if self._trace is not None:
+            self._trace.record(RECEIVED, bytes(self._view[self._end:end]))
+        self._end = end
+        self._process()
+
+
+    def wait(self):
+        """
+        Get future for the next response.
+        """
+        task = self._loop.create_future()
+        if self.error is not None:
+            task.set_exception(self.error)
+            return task
+        self._waiters.append(task)
+        self._process()
+        return task
+
+
+    def connection_lost(self, exc):
+        """
+        Fail the coroutines waiting for responses on lost connection.
+
+        The waiting for responses fails with `OBDError` from now on.
+
+        :param exc: Read error or `None` on end of file.
+        """
+        msg = 'connection lost' if exc is None \
+            else 'connection lost: {}'.format(exc)
+        self.error = OBDError(msg)
+        if self._trace is not None:
+            self._trace.error(msg)
+        while self._waiters:
+            task = self._waiters.popleft()
+            if not task.done():
+                task.set_exception(self.error)
+
+
+    def pending(self):
+        """
+        Consume and return data received after the last response.
+        """
+        data = self._view[self._start:self._end]
+        self.reset()
+        return data
+
+
+    def reset(self):
+        """
+        Discard data received after the last response and cancel waiting
+        for responses.
+        """
+        self._start = self._scan = self._end
+        self.first_byte = None
+        while self._waiters:
+            self._waiters.popleft().cancel()
+
+
+    def _process(self):
+        waiters = self._waiters
+        while waiters:
+            pos = self._data.find(PROMPT, self._scan, self._end)
+            if pos == -1:
+                self._scan = self._end
+                break
+
+            data = self._view[self._start:pos]
+            self._start = self._scan = pos + 1
+
+            task = waiters.popleft()
+            if not task.done():
+                task.set_result(data)
+
+
+    def _compact(self, sizehint):
+        n = self._end - self._start
+        size = max(len(self._data), 2 * (n + sizehint))
+
+        data = bytearray(size)
+        data[:n] = self._view[self._start:self._end]
+
+        self._data = data
+        self._view = memoryview(data)
+        self._scan -= self._start
+        self._start = 0
+        self._end = n
+
+
+
 class OBDError(Exception):
     pass
 
@@ -0,0 +1,324 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Offline parser of ELM327 debug logs and capture files.
+
+The debug log is written by `aobd.elm327` and `aobd.transport` loggers
+with format::
+
+    host:2015-12-27 16:41:20,098:DEBUG:aobd.elm327:1401...:sending: b'0100\\r'
+
+The log is streamed line by line. A line is split on colons at fixed
+positions, the timestamp is parsed from its fixed-width fields and the
+data is unescaped with `codecs.escape_decode`. There is no regular
+expression matching or generic date parsing per line.
+
+The data sent and received is grouped into requests and responses,
+which are parsed with the protocol parser detected with `ATDPN` or
+`ATSP<n>` command in the log. The data of the responses is collected per OBD command and
+decoded at the end with vectorized decoders, see
+`aobd.decoders.decode_array`. The result is a column of timestamps and
+a column of values per command::
+
+    columns = parse('data/read-rpm-throttle-pos-speed.log')
+    columns['RPM'].time   # POSIX time of responses
+    columns['RPM'].value  # decoded values
+
+NumPy is required.
+"""
+
+import array
+import codecs
+import collections
+import datetime
+import logging
+
+from .capture import CaptureReader, SENT, RECEIVED, exchanges, is_capture
+from .commands import COMMANDS
+from .decoders import decode_array
+from .elm327 import ELM327, clean_data, split_data, find_primary_ecu, \
+    is_response
+from .obd import split_message
+
+logger = logging.getLogger(__name__)
+
+escape_decode = codecs.escape_decode
+
+Column = collections.namedtuple('Column', 'time value unit')
+Column.__doc__ = """
+Timestamps and values of responses to an OBD command.
+
+:var time: POSIX time of responses.
+:var value: Decoded values.
+:var unit: Unit of the values.
+"""
+
+
+def read_log(f):
+    """
+    Iterate over events of ELM327 debug log.
+
+    An event is tuple of direction, POSIX time and data. The time of a log
+    line is interpreted in local time zone.
+
+    :param f: Text file object.
+    """
+    hours = {}
+    for line in f:
+        # host, date and hour, minute, second, level, logger, thread and
+        # message
+        items = line.split(':', 7)
+        if len(items) != 8:
+            continue
+
+        msg = items[7]
+        if msg.startswith('sending: b'):
+            direction = SENT
+            value = msg[10:]
+        elif msg.startswith('received: b'):
+            direction = RECEIVED
+            value = msg[11:]
+        else:
+            continue
+
+        hour = items[1]
+        base = hours.get(hour)
+        try:
+            if base is None:
+                base = hours[hour] = datetime.datetime.strptime(
+                    hour, '%Y-%m-%d %H'
+                ).timestamp()
+            seconds = items[3]
+            t = base + int(items[2]) * 60 + int(seconds[:2]) \
+                + int(seconds[3:]) / 10 ** (len(seconds) - 3)
+        except ValueError:
+            continue
+
+        # data between quotes
+        value = value.rstrip()
+        yield direction, t, escape_decode(value[1:-1])[0]
+
+
+def read_capture(path):
+    """
+    Iterate over events of capture file.
+
+    An event is tuple of direction, POSIX time and data.
+
+    :param path: Path of capture file.
+    """
+    with CaptureReader(path) as reader:
+        wall_time = reader.wall_time
+        for direction, ts, data in reader:
+            yield direction, wall_time(ts), data.tobytes()
+            data.release()
+
+
+def read_events(path):
+    """
+    Iterate over events of ELM327 debug log or capture file.
+
+    :param path: Path of debug log or capture file.
+    """
+    if is_capture(path):
+        yield from read_capture(path)
+    else:
+        with open(path, errors='replace') as f:
+            yield from read_log(f)
+
+
+def parse(path, protocol=None):
+    """
+    Parse ELM327 debug log or capture file into columns of values.
+
+    Dictionary of command name and column of its values is returned.
+
+    :param path: Path of debug log or capture file.
+    :param protocol: Protocol handler, detected from the log by default.
+    """
+    decoder = LogDecoder(protocol)
+    for _, request, t, response in exchanges(read_events(path)):
+        decoder.feed(t, request, response)
+    return decoder.columns()
+
+
+
+class LogDecoder:
+    """
+    Decoder of requests and responses of ELM327 device into columns of
+    values.
+
+    The protocol is detected with response to `ATDPN` command or with
+    `ATSP<n>` command setting the protocol, i.e. when connecting with
+    session profile. The responses received before the protocol is known
+    are kept until it is detected. The primary ECU is chosen with response to `0100` request.
+
+    :param protocol: Protocol handler, detected by default.
+    """
+    def __init__(self, protocol=None):
+        self.protocol = protocol
+        self.primary_ecu = None
+        self._auto = protocol is None
+        self._pending = []
+
+        # command -> timestamps, responses data and offsets of the data
+        self._data = {}
+
+
+    def feed(self, t, request, response):
+        """
+        Process request and its response.
+
+        :param t: Time of the response.
+        :param request: Request data.
+        :param response: Response data.
+        """
+        request = request.strip().upper()
+        lines = (s.strip() for s in split_data(clean_data(response)))
+        lines = [s for s in lines if s]
+
+        if request.startswith(b'AT'):
+            self._at(request, lines)
+        elif self.protocol is None:
+            self._pending.append((t, request, lines))
+        else:
+            self._obd(t, request, lines)
+
+
+    def columns(self):
+        """
+        Decode collected responses and get columns of values.
+
+        Dictionary of command name and column of its values is returned.
+        """
+        import numpy as np
+
+        result = {}
+        for cmd, (times, data, offsets) in self._data.items():
+            values, unit = decode_array(cmd, np.frombuffer(data, np.uint8), offsets)
+            result[cmd.name] = Column(np.array(times), values, unit)
+        return result
+
+
+    def _at(self, request, lines):
+        if request == b'ATDPN' and lines:
+            p = lines[0].decode(errors='replace')
+            self._set_protocol(p[1:] if p.startswith('A') else p)
+
+        elif request.startswith(b'ATSP') and b'OK' in lines:
+            # automatic search, the protocol is detected with `ATDPN`
+            p = request[4:].decode(errors='replace')
+            if p and p != '0' and not p.startswith('A'):
+                self._set_protocol(p)
+
+        elif request in (b'ATZ', b'ATWS', b'ATD'):
+            # device reset, new connection
+            self.primary_ecu = None
+            if self._auto:
+                self.protocol = None
+                self._pending.clear()
+
+
+    def _set_protocol(self, p):
+        """
+        Set protocol handler, if detected from the log, and process the
+        responses received before.
+
+        :param p: Protocol number.
+        """
+        if not self._auto:
+            return
+
+        cls = ELM327._SUPPORTED_PROTOCOLS.get(p)
+        if cls is None:
+            logger.warning('unknown protocol: {}'.format(p))
+            return
+
+        self.protocol = cls()
+        pending = self._pending
+        self._pending = []
+        for item in pending:
+            self._obd(*item)
+
+
+    def _obd(self, t, request, lines):
+        # odd number of digits, the last one is number of expected
+        # responses
+        if len(request) % 2 and len(request) > 2:
+            request = request[:-1]
+        try:
+            mode = int(request[:2], 16)
+            pids = bytes.fromhex(request[2:].decode())
+        except ValueError:
+            return
+
+        messages = self.protocol(lines)
+        if self.primary_ecu is None and request == b'0100':
+            self.primary_ecu = find_primary_ecu(self.protocol, messages)
+
+        msg = self._select(request, messages)
+        if msg is None:
+            return
+
+        if mode == 1 and len(pids) > 1:
+            batch = [(1, p) for p in pids]
+            batch = tuple(COMMANDS[k] for k in batch if k in COMMANDS)
+            items = zip(batch, split_message(batch, msg))
+        else:
+            key = mode, pids[0] if pids else 0
+            items = [(COMMANDS[key], msg)] if key in COMMANDS else []
+
+        for cmd, m in items:
+            if m is not None:
+                self._add(cmd, t, m.data_bytes)
+
+
+    def _select(self, request, messages):
+        """
+        Select response message of the primary ECU.
+
+        If the primary ECU is not known, then the first response message
+        is selected.
+        """
+        primary = self.primary_ecu
+        items = (m for m in messages if is_response(request, m))
+        if primary is not None:
+            items = (m for m in items if m.tx_id == primary)
+        return next(items, None)
+
+
+    def _add(self, cmd, t, data):
+        if cmd.bytes:
+            if len(data) < cmd.bytes:
+                return
+            data = data[:cmd.bytes]
+
+        item = self._data.get(cmd)
+        if item is None:
+            item = self._data[cmd] = (
+                array.array('d'), bytearray(), array.array('q', [0])
+            )
+        times, buff, offsets = item
+        times.append(t)
+        buff.extend(data)
+        offsets.append(len(buff))
+
+
+# vim: sw=4:et:ai
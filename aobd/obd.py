@@ -22,20 +22,34 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
-import collections
+import asyncio
+import collections.abc
 import functools
+import itertools
 import logging
 import time
 
 from .__version__ import __version__
-from .elm327 import ELM327, OBDError
+from .elm327 import ELM327, OBDError, PRIORITY_NORMAL, PRIORITY_LOW, \
+    is_bus_error
 from .commands import COMMANDS
 from .obdcmd import OBDCommand
+from .profile import ProfileStore, STATIC_PIDS
+from .protocols.protocol import Message
+from .stats import Stats
 from .utils import Response
+from .watch import Watcher
 
 
 logger = logging.getLogger(__name__)
 
+# maximum number of PIDs in single mode 01 request (ISO 15765-4)
+MAX_PIDS = 6
+
+# number of attempts to verify session profile and delay between them
+VERIFY_ATTEMPTS = 3
+VERIFY_DELAY = 1
+
 
 def dispatch(func):
     """
@@ -54,33 +68,270 @@ def dispatch(func):
 class OBD:
     """
         Class representing an OBD-II connection with it's assorted commands/sensors
+
+        The latency of each stage of a query is recorded, see `stats`
+        attribute. The timestamps of each query can be also passed to
+        a callback.
+
+        The data sent to and received from the vehicle is recorded with
+        wire trace, see `trace` attribute. The trace is saved in a file on
+        error if its path is set.
+
+        If path of session profiles file is set, then the profile of the
+        vehicle is saved after connection, see `aobd.profile`. On
+        reconnection, the protocol and the supported commands are taken
+        from the profile, and the profile is verified in background. If the
+        vehicle does not match the profile, then the profile is removed
+        and the vehicle is discovered again.
+
+        :param device: Serial device path, TCP address or transport.
+        :param baudrate: Baud rate of serial device.
+        :param on_timing: Callback receiving timestamps of each query.
+        :param trace_path: Path of the file the wire trace is saved to on
+            error.
+        :param cache: Cache of responses, see `aobd.cache.ResponseCache`.
+        :param profile_path: Path of session profiles file.
+        :param fast_connect: Set up ELM327 device with as few round trips
+            as possible, see `aobd.elm327.ELM327.connect`.
+        :param capability_path: Path of file with capabilities of ELM327
+            devices, see `aobd.capability`.
+        :var stats: Latency statistics of queries.
+        :var on_timing: Callback receiving timestamps of each query.
+        :var trace: Wire trace of the connection.
+        :var cache: Cache of responses or `None` if disabled.
+        :var profile: Session profile of the vehicle or `None`.
     """
 
-    def __init__(self, device, baudrate=38400):
+    def __init__(
+            self, device, baudrate=38400, on_timing=None, trace_path=None,
+            cache=None, profile_path=None, fast_connect=False,
+            capability_path=None,
+        ):
         self._commands = tuple()
-        self.port = ELM327(device, baudrate)
+        self._device = device if isinstance(device, str) else None
+        self._profiles = None if profile_path is None \
+            else ProfileStore(profile_path)
+        self._verify_task = None
+        self._fast_connect = fast_connect
+        self.profile = None
+        self.port = ELM327(
+            device, baudrate, trace_path=trace_path,
+            capability_path=capability_path,
+        )
+        self.trace = self.port.trace
+        self.stats = Stats()
+        self.on_timing = on_timing
+        self.cache = cache
+        self._watcher = Watcher(self)
 
 
     async def connect(self):
+        profile = None
+        if self._profiles is not None and self._device is not None:
+            profile = self._profiles.get(self._device)
+
+        await self.port.connect(profile, self._fast_connect)
+        if self.port.profiled:
+            logger.info('vehicle profile found: {}'.format(profile))
+            self.profile = profile
+            self._set_commands(profile.pids)
+            self._verify_task = asyncio.ensure_future(self._verify(profile))
+            self._verify_task.add_done_callback(verify_done)
+        else:
+            await self._discover()
+
+
+    async def _discover(self):
+        """
+        Discover supported commands and save profile of the vehicle.
+        """
+        pids = await self._load_commands()
+        if self._profiles is None or self._device is None:
+            return
+
+        profile = self.port.profile()
+        profile.pids = pids
+        for name in STATIC_PIDS:
+            cmd = COMMANDS[name]
+            if self.supports(cmd):
+                r = await self.query(cmd)
+                if not r.is_null():
+                    profile.static[name] = r.message.data_bytes.hex()
+
+        self.profile = profile
+        try:
+            self._profiles.save(self._device, profile)
+        except OSError as ex:
+            logger.warning('cannot save vehicle profile: {}'.format(ex))
+
+
+    async def _verify(self, profile):
+        """
+        Verify profile of the vehicle.
+
+        The supported PIDs are queried and compared with the profile. If
+        the vehicle does not match the profile or the device cannot
+        connect to the vehicle with the protocol of the profile, then the
+        profile is removed and the vehicle is discovered again.
+
+        The query is repeated on error or if there is no response, i.e.
+        `NO DATA`. The profile is kept if the vehicle cannot be queried.
+        """
+        cmd = COMMANDS.PIDS_A
+        request = cmd.get_command()
+        for i in range(VERIFY_ATTEMPTS):
+            if i:
+                await asyncio.sleep(VERIFY_DELAY)
+            try:
+                lines = await self.port.submit(request, PRIORITY_LOW)
+            except OBDError as ex:
+                logger.warning('cannot verify vehicle profile: {}'.format(ex))
+                continue
+
+            msg = self.port.parse(request, lines)
+            if msg is not None:
+                matched = cmd(msg).value == profile.pids.get(cmd.name)
+                break
+            elif is_bus_error(lines):
+                matched = False
+                break
+            logger.warning('cannot verify vehicle profile: no response')
+        else:
+            logger.warning('vehicle profile not verified, keeping it')
+            return
+
+        if matched:
+            logger.info('vehicle profile verified')
+            return
+
+        logger.warning('vehicle does not match profile, reconnecting')
+        self.profile = None
+        self._profiles.remove(self._device)
         await self.port.connect()
-        await self._load_commands()
+        await self._discover()
 
 
     @dispatch
-    def query(self, cmd):
+    def query(self, cmd, priority=PRIORITY_NORMAL):
+        """
+        Query vehicle for OBD command or collection of OBD commands.
+
+        The queries of concurrent callers are queued and sent to the
+        vehicle one at a time. Queries of higher priority, i.e.
+        `PRIORITY_HIGH` for interactive reading of trouble codes, are sent
+        before queries of lower priority, i.e. `PRIORITY_LOW` for
+        background data logging.
+
+        If cache of responses is enabled, then a command is answered with
+        its cached response if the response is fresh. Queries of
+        collection of commands are always sent to the vehicle and
+        refresh the cache.
+
+        The static PIDs, i.e. fuel type, are answered with data of session
+        profile of the vehicle, if the profile is used.
+
+        :param cmd: OBD command or collection of OBD commands.
+        :param priority: Priority class of the query.
+        """
         raise NotImplementedError('Not implemented for {}'.format(type(cmd)))
 
 
     @query.register(OBDCommand)
-    async def _query(self, cmd):
-        logger.debug('sending command: {}'.format(cmd))
-        msg = await self.port.query(cmd.get_command())
-        return Response() if msg is None else cmd(msg)
+    async def _query(self, cmd, priority=PRIORITY_NORMAL):
+        profile = self.profile
+        if profile is not None and cmd.name in profile.static:
+            return static_response(cmd, profile)
+
+        cache = self.cache
+        if cache is not None:
+            r = cache.get(cmd)
+            if r is not None:
+                return r
+
+        request = cmd.get_command()
+        lines = await self.port.submit(request, priority)
+        msg = self.port.parse(request, lines)
+        parsed = time.monotonic_ns()
+
+        r = Response() if msg is None else cmd(msg)
+        self._record((cmd,), lines, parsed)
+        if cache is not None:
+            cache.put(cmd, r)
+        return r
+
+
+    @query.register(collections.abc.Iterable)
+    def _query(self, cmd, priority=PRIORITY_NORMAL):
+        """
+        Query vehicle for collection of commands.
+
+        Asynchronous iterator of responses is returned. On CAN vehicles,
+        the mode 01 commands are packed into multi-PID requests if the
+        device supports them.
+        """
+        return OBDIterator(
+            self.port, cmd, priority, self._record, self.cache
+        )
+
+
+    def watch(self, cmd, rate=1, callback=None):
+        """
+        Subscribe to responses of OBD command polled in background.
+
+        All subscriptions of the connection share single background task.
+        A command is polled once at the highest rate requested by its
+        subscribers. The latest response is available with `latest`
+        method.
+
+        Subscription is returned, call its `cancel` method to stop
+        receiving the responses.
+
+        :param cmd: OBD command.
+        :param rate: Requested number of responses per second.
+        :param callback: Function called with each response.
+        """
+        return self._watcher.add(cmd, rate, callback)
 
 
-    @query.register(collections.Iterable)
-    def _query(self, cmd):
-        return OBDIterator(self.port, cmd)
+    def stream(self, cmd, rate=1):
+        """
+        Get asynchronous iterator of responses to OBD command or
+        collection of OBD commands polled in background::
+
+            async for response in dev.stream([COMMANDS.RPM, COMMANDS.SPEED]):
+                print(response.command, response.value)
+
+        The commands are polled like with `watch` method. The oldest
+        responses are dropped if the consumer cannot keep up. The
+        subscriptions end when the stream is closed, i.e. with `async
+        with` statement, or no longer used.
+
+        :param cmd: OBD command or collection of OBD commands.
+        :param rate: Requested number of responses of each command per
+            second.
+        """
+        commands = (cmd,) if isinstance(cmd, OBDCommand) else tuple(cmd)
+        return self._watcher.stream(commands, rate)
+
+
+    def latest(self, cmd):
+        """
+        Get latest response of watched OBD command or `None`.
+
+        The call does not block and does not send any request to the
+        vehicle.
+        """
+        return self._watcher.latest(cmd)
+
+
+    def rates(self):
+        """
+        Get target and achieved polling rates of watched OBD commands.
+
+        Dictionary of command and its polling rate is returned, see
+        `aobd.scheduler.Rate` class.
+        """
+        return self._watcher.rates()
 
 
     def close(self):
@@ -88,6 +339,10 @@ class OBD:
         Close ELM327 port and set OBD instance to unconnected state.
         """
         logger.info('closing obd-ii port')
+        self._watcher.close()
+        if self._verify_task is not None:
+            self._verify_task.cancel()
+            self._verify_task = None
         try:
             if self.connected:
                 self.port.close()
@@ -112,21 +367,45 @@ class OBD:
         return self._commands
 
 
+    def _record(self, commands, lines, parsed):
+        """
+        Record timestamps of a query.
+
+        :param commands: Commands of the query.
+        :param lines: Response lines with timestamps of the request.
+        :param parsed: Time of parsing of the response.
+        """
+        timing = getattr(lines, 'timing', None)
+        if timing is None:
+            return
+
+        timing = timing.copy()
+        timing.commands = commands
+        timing.parsed = parsed
+        timing.decoded = time.monotonic_ns()
+        self.stats.record(timing)
+        if self.on_timing is not None:
+            self.on_timing(timing)
+
+
     async def _load_commands(self):
         """
         Query vehicle OBD port for supported commands.
 
         Check if each PID available, set its support status and create
         collection of supported command objects.
+
+        Dictionary of PID command name and its value, the string of bits,
+        is returned.
         """
         logger.debug('querying for supported PID commands...')
 
         # Mode 1 PID 0 is assumed to always be supported
         pid_cmds = COMMANDS.pid_commands()
-        responses = []
+        pids = {}
         for p in pid_cmds:
             r = await self.query(p)
-            responses.append((p, r.value)) # if no response, then fail hard
+            pids[p.name] = r.value # if no response, then fail hard
             logger.debug('pid response: {}'.format(r.value))
 
             # r.value is string of 32 bits,
@@ -137,10 +416,22 @@ class OBD:
             if r.value[-1] == '0':
                 break
 
+        self._set_commands(pids)
+        return pids
+
+
+    def _set_commands(self, pids):
+        """
+        Set support status of commands and create collection of supported
+        command objects.
+
+        :param pids: Dictionary of PID command name and its value.
+        """
+        pid_cmds = COMMANDS.pid_commands()
         items = (
             (p.get_mode_int(), p.get_pid_int() + i + 1)
-            for p, v in responses
-            for i, s in enumerate(v) if s == '1'
+            for p in pid_cmds if p.name in pids
+            for i, s in enumerate(pids[p.name]) if s == '1'
         )
         items = (
             COMMANDS[mode, pid] for mode, pid in items
@@ -158,22 +449,174 @@ class OBD:
 
 
 class OBDIterator:
-    def __init__(self, port, commands):
-        self.port = port
-        self.commands = iter(commands)
+    """
+    Asynchronous iterator of responses to collection of OBD commands.
 
+    The requests are pipelined. The next request is written as soon as
+    the response of the current one is received, then the current
+    response is parsed and decoded while the next request is processed
+    by the vehicle.
 
-    async def __aiter__(self):
+    The responses are put into cache of responses if it is given.
+    """
+    def __init__(
+            self, port, commands, priority=PRIORITY_NORMAL, record=None,
+            cache=None,
+        ):
+        self.port = port
+        self.priority = priority
+        self.record = record
+        self.cache = cache
+        if port.multi_pid:
+            self.batches = pack_commands(commands)
+        else:
+            self.batches = ((c,) for c in commands)
+        self.responses = collections.deque()
+        self._pending = None
+
+
+    def __aiter__(self):
         return self
 
 
     async def __anext__(self):
-        cmd = next(self.commands, None)
-        if not cmd:
-            raise StopAsyncIteration()
+        if not self.responses:
+            if self._pending is None:
+                self._pending = self._submit(next(self.batches, None))
+            if self._pending is None:
+                raise StopAsyncIteration()
+
+            batch, request, task = self._pending
+            lines = await task
+
+            # response received, send next request before parsing it
+            self._pending = self._submit(next(self.batches, None))
+
+            msg = self.port.parse(request, lines)
+            parsed = time.monotonic_ns()
+            responses = self._decode(batch, msg)
+            self.responses.extend(responses)
+            if self.cache is not None:
+                for c, r in zip(batch, responses):
+                    self.cache.put(c, r)
+            if self.record is not None:
+                self.record(batch, lines, parsed)
+        return self.responses.popleft()
+
+
+    def _submit(self, batch):
+        if batch is None:
+            return None
+
+        if len(batch) == 1:
+            request = batch[0].get_command()
+        else:
+            request = b'01' + b''.join(c.pid for c in batch)
+        task = asyncio.ensure_future(self.port.submit(request, self.priority))
+        return batch, request, task
+
+
+    def _decode(self, batch, msg):
+        if len(batch) == 1:
+            messages = [msg]
+        elif msg is None:
+            messages = [None] * len(batch)
+        else:
+            messages = split_message(batch, msg)
+        return [
+            Response() if m is None else c(m)
+            for c, m in zip(batch, messages)
+        ]
+
+
+
+def verify_done(task):
+    """
+    Log error of verification of session profile.
+    """
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(
+            'verification of vehicle profile failed',
+            exc_info=task.exception()
+        )
+
+
+def static_response(cmd, profile):
+    """
+    Create response of static PID command from data saved in session
+    profile.
+    """
+    m = Message([], profile.primary_ecu)
+    m.mode = cmd.get_mode_int() + 0x40
+    m.pid = cmd.get_pid_int()
+    m.data_bytes = bytes.fromhex(profile.static[cmd.name])
+    return cmd(m)
+
+
+def can_pack(cmd):
+    """
+    Check if command can be sent within multi-PID request.
+    """
+    return cmd.mode == b'01' and len(cmd.pid) == 2 and cmd.bytes > 0
+
+
+def pack_commands(commands):
+    """
+    Pack consecutive mode 01 commands into tuples of up to `MAX_PIDS`
+    commands.
 
-        msg = await self.port.query(cmd.get_command())
-        return Response() if msg is None else cmd(msg)
+    Other commands are returned as single element tuples. The order of
+    commands is preserved.
+    """
+    items = itertools.groupby(commands, can_pack)
+    for packable, cmds in items:
+        if packable:
+            cmds = iter(cmds)
+            batch = tuple(itertools.islice(cmds, MAX_PIDS))
+            while batch:
+                yield batch
+                batch = tuple(itertools.islice(cmds, MAX_PIDS))
+        else:
+            yield from ((c,) for c in cmds)
+
+
+def split_message(commands, message):
+    """
+    Split response message of multi-PID request into message per command.
+
+    The data of the response is split using number of bytes of each
+    command. `None` is returned for a command, which has no data in the
+    response message.
+
+    :param commands: Commands sent within multi-PID request.
+    :param message: Response message.
+    """
+    pids = {c.get_pid_int(): c for c in commands}
+    data = message.data_bytes
+    found = {}
+
+    pid = message.pid
+    start = 0
+    while pid in pids:
+        cmd = pids[pid]
+        end = start + cmd.bytes
+        if end > len(data):
+            logger.warning('multi-PID response too short for {}'.format(cmd))
+            break
+
+        m = Message(message.frames, message.tx_id)
+        m.mode = message.mode
+        m.pid = pid
+        m.data_bytes = data[start:end]
+        found[cmd] = m
+
+        # next PID follows the data of current PID
+        if end >= len(data):
+            break
+        pid = data[end]
+        start = end + 1
+
+    return [found.get(c) for c in commands]
 
 
 # vim: sw=4:et:ai
@@ -22,8 +22,6 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
-import binascii
-import re
 from .utils import *
 
 
@@ -62,19 +60,13 @@ class OBDCommand:
         # create the response object with the raw data recieved
         # and reference to original command
         r = Response(self, message)
-        
-        # combine the bytes back into a hex string
-        # TODO: rewrite decoders to handle raw byte arrays
+
         data = message.data_bytes
         if self.bytes: # zero bytes means flexible response
             data = data[:self.bytes]
-        data = binascii.hexlify(data).decode().upper()
 
         # decoded value into the response object
-        d = self.decode(data)
-        r.value = d[0]
-        r.unit  = d[1]
-
+        r.value, r.unit = self.decode(data)
         return r
 
     def __str__(self):
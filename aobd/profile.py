@@ -0,0 +1,117 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Session profiles of vehicles for fast reconnection.
+
+A profile is saved after connection to a vehicle. It contains the
+information found on connection
+
+- version of ELM327 device
+- vehicle protocol number, ID of the primary ECU and number of ECUs
+  responding to OBD requests
+- supported PIDs bitmaps, i.e. responses to `PIDS_A`, `PIDS_B` and
+  `PIDS_C` commands
+- data of static PIDs, i.e. fuel type and OBD standards compliance
+
+The profiles are saved in JSON file. A profile is found with device
+path and version of ELM327 device, and identifies the vehicle connected
+to the device last time. On reconnection, the protocol is set directly
+and the discovery of the protocol and of the supported commands is
+skipped, and the static PIDs are answered with the data of the
+profile. The profile is verified in background, see `aobd.obd.OBD`
+class.
+"""
+
+from .store import JSONStore
+
+# static PIDs saved in a profile
+STATIC_PIDS = ('FUEL_TYPE', 'OBD_COMPLIANCE')
+
+
+class Profile:
+    """
+    Session profile of a vehicle connected to ELM327 device.
+
+    :var version: Version of ELM327 device.
+    :var protocol: Vehicle protocol number, i.e. `6`.
+    :var primary_ecu: ID of the primary ECU.
+    :var n_ecus: Number of ECUs responding to OBD requests.
+    :var pids: Supported PIDs bitmaps, i.e. `PIDS_A` command name and
+        string of bits.
+    :var static: Data of static PIDs, i.e. `FUEL_TYPE` command name and
+        hex string of its response data.
+    """
+    def __init__(
+            self, version, protocol, primary_ecu, n_ecus, pids=None,
+            static=None,
+        ):
+        self.version = version
+        self.protocol = protocol
+        self.primary_ecu = primary_ecu
+        self.n_ecus = n_ecus
+        self.pids = {} if pids is None else pids
+        self.static = {} if static is None else static
+
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Create profile from dictionary loaded from JSON file.
+        """
+        return cls(
+            data['version'], data['protocol'], data['primary_ecu'],
+            data['n_ecus'], data.get('pids'), data.get('static'),
+        )
+
+
+    def to_dict(self):
+        """
+        Convert profile into dictionary to be saved in JSON file.
+        """
+        return {
+            'version': self.version,
+            'protocol': self.protocol,
+            'primary_ecu': self.primary_ecu,
+            'n_ecus': self.n_ecus,
+            'pids': self.pids,
+            'static': self.static,
+        }
+
+
+    def __repr__(self):
+        return '<Profile protocol={} ecu={} pids={}>'.format(
+            self.protocol, self.primary_ecu, len(self.pids)
+        )
+
+
+
+class ProfileStore(JSONStore):
+    """
+    JSON file with session profiles of vehicles.
+
+    A profile is identified by device path, see `aobd.store.JSONStore`
+    class.
+
+    :param path: Path of the JSON file.
+    """
+    item_class = Profile
+
+
+# vim: sw=4:et:ai
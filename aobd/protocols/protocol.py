@@ -29,7 +29,7 @@
 #                                                                      #
 ########################################################################
 
-from aobd.utils import isHex
+import binascii
 
 
 """
@@ -56,7 +56,9 @@ class Message(object):
     def __init__(self, frames, tx_id):
         self.frames     = frames
         self.tx_id      = tx_id
-        self.data_bytes = []
+        self.mode       = None # response mode, i.e. 0x41
+        self.pid        = None # first PID of the response (if any)
+        self.data_bytes = b''
 
     def __eq__(self, other):
         if isinstance(other, Message):
@@ -73,7 +75,7 @@ class Message(object):
 """
 
 Protocol objects are stateless factories for Frames and Messages.
-They are __called__ with the raw string response, and return a
+They are __called__ with the lines of raw bytes response, and return a
 list of Messages.
 
 """
@@ -85,19 +87,28 @@ class Protocol(object):
     def __init__(self, baud=38400):
         self.baud = baud
 
+        # prefix of a line to align frame header to full bytes
+        self.line_prefix = b''
 
-    def __call__(self, lines):
-
-        # ditch spaces
-        lines = [line.replace(' ', '') for line in lines]
 
-        # ditch frames without valid hex (trashes "NO DATA", etc...)
-        lines = filter(isHex, lines)
+    def __call__(self, lines):
+        prefix = self.line_prefix
+        unhexlify = binascii.unhexlify
 
         frames = []
         for line in lines:
+            # ditch spaces
+            if b' ' in line:
+                line = line.replace(b' ', b'')
+
+            # ditch frames without valid hex (trashes "NO DATA", etc...)
+            try:
+                raw = unhexlify(prefix + line if prefix else line)
+            except (binascii.Error, ValueError):
+                continue
+
             # subclass function to parse the lines into Frames
-            frame = self.create_frame(line)
+            frame = self.create_frame(raw)
 
             # drop frames that couldn't be parsed
             if frame is not None:
@@ -127,7 +138,7 @@ class Protocol(object):
         """
             override in subclass for each protocol
 
-            Function recieves a list of byte values for a frame.
+            Function recieves bytes of a frame.
 
             Function should return a Frame instance. If fatal errors were
             found, this function should return None (the Frame is dropped).
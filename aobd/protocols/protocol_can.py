@@ -29,7 +29,6 @@
 #                                                                      #
 ########################################################################
 
-import binascii
 import logging
 
 from aobd.utils import contiguous
@@ -37,6 +36,9 @@ from .protocol import *
 
 logger = logging.getLogger(__name__)
 
+# modes of responses without PID byte
+MODES_WITHOUT_PID = (0x44,)
+
 
 class CANProtocol(Protocol):
 
@@ -51,36 +53,40 @@ class CANProtocol(Protocol):
         Protocol.__init__(self, baud)
         self.id_bits = id_bits
 
-    def create_frame(self, raw):
+        # pad 11-bit CAN headers out to 16 bits, ELM prints 3 hex digits
+        # for them
+        self.header_size = 2 if id_bits == 11 else 4
+        if id_bits == 11:
+            self.line_prefix = b'0'
 
-        # pad 11-bit CAN headers out to 32 bits for consistency,
-        # since ELM already does this for 29-bit CAN headers
-        if self.id_bits == 11:
-            raw = "00000" + raw
+    def create_frame(self, raw):
 
         frame = Frame(raw)
-        raw_bytes = binascii.unhexlify(raw)
+        raw_bytes = memoryview(raw)
+        if len(raw_bytes) <= self.header_size:
+            logger.debug('Dropped frame for being too short')
+            return None
 
         # read header information
         if self.id_bits == 11:
             # Ex.
-            #       [   ]
-            # 00 00 07 E8 06 41 00 BE 7F B8 13
+            # [   ]
+            # 07 E8 06 41 00 BE 7F B8 13
 
-            frame.priority = raw_bytes[2] & 0x0F  # always 7
-            frame.addr_mode = raw_bytes[3] & 0xF0  # 0xD0 = functional, 0xE0 = physical
+            frame.priority = raw_bytes[0] & 0x0F  # always 7
+            frame.addr_mode = raw_bytes[1] & 0xF0  # 0xD0 = functional, 0xE0 = physical
 
             if frame.addr_mode == 0xD0:
                 #untested("11-bit functional request from tester")
-                frame.rx_id = raw_bytes[3] & 0x0F  # usually (always?) 0x0F for broadcast
+                frame.rx_id = raw_bytes[1] & 0x0F  # usually (always?) 0x0F for broadcast
                 frame.tx_id = 0xF1  # made-up to mimic all other protocols
-            elif raw_bytes[3] & 0x08:
+            elif raw_bytes[1] & 0x08:
                 frame.rx_id = 0xF1  # made-up to mimic all other protocols
-                frame.tx_id = raw_bytes[3] & 0x07
+                frame.tx_id = raw_bytes[1] & 0x07
             else:
                 #untested("11-bit message header from tester (functional or physical)")
                 frame.tx_id = 0xF1  # made-up to mimic all other protocols
-                frame.rx_id = raw_bytes[3] & 0x07
+                frame.rx_id = raw_bytes[1] & 0x07
 
         else: # self.id_bits == 29:
             frame.priority  = raw_bytes[0]  # usually (always?) 0x18
@@ -89,10 +95,10 @@ class CANProtocol(Protocol):
             frame.tx_id     = raw_bytes[3]  # 0xF1 = tester ID
 
         # Ex.
-        #             [      Frame       ]
-        # 00 00 07 E8 06 41 00 BE 7F B8 13
+        #       [      Frame       ]
+        # 07 E8 06 41 00 BE 7F B8 13
 
-        frame.data_bytes = raw_bytes[4:]
+        frame.data_bytes = raw_bytes[self.header_size:]
 
 
         # read PCI byte (always first byte in the data section)
@@ -129,7 +135,7 @@ class CANProtocol(Protocol):
                 return None
 
             # extract data, ignore PCI byte and anything after the marked length
-            message.data_bytes = frame.data_bytes[1:1 + frame.data_len]
+            data = frame.data_bytes[1:1 + frame.data_len]
 
         else:
             # sort FF and CF into their own lists
@@ -182,27 +188,42 @@ class CANProtocol(Protocol):
                 return None
 
 
-            # on the first frame, skip PCI byte AND length code
-            message.data_bytes += ff[0].data_bytes[2:]
+            # on the first frame, skip PCI byte AND length code, then
+            # load/accumulate the data from each CF frame (now that they're
+            # in order) and chop off the PCI byte
+            data = [ff[0].data_bytes[2:]]
+            data.extend(f.data_bytes[1:] for f in cf)
 
-            # now that they're in order, load/accumulate the data from each CF frame
-            for f in cf:
-                message.data_bytes += f.data_bytes[1:] # chop off the PCI byte
+            # chop off the padding of the last consecutive frame
+            data = memoryview(b''.join(data))[:ff[0].data_len]
 
+        if len(data) == 0:
+            logger.warning('Received message without mode byte')
+            return None
 
         # chop off the Mode/PID bytes based on the mode number
-        mode = message.data_bytes[0]
-        if mode == 0x43:
+        mode = data[0]
+        message.mode = mode
+        if mode in MODES_WITHOUT_PID:
+            # responses carrying mode byte only, i.e. clear DTC response
+            message.data_bytes = bytes(data[1:])
+
+        elif len(data) < 2:
+            logger.warning('Received message without PID byte')
+            return None
+
+        elif mode == 0x43:
 
             # fetch the DTC count, and use it as a length code
-            num_dtc_bytes = message.data_bytes[1] * 2
+            num_dtc_bytes = data[1] * 2
 
             # skip the PID byte and the DTC count,
-            message.data_bytes = message.data_bytes[2:][:num_dtc_bytes]
+            message.data_bytes = bytes(data[2:2 + num_dtc_bytes])
 
         else:
             # handles cases when there is both a Mode and PID byte
-            message.data_bytes = message.data_bytes[2:]
+            message.pid = data[1]
+            message.data_bytes = bytes(data[2:])
 
         return message
 
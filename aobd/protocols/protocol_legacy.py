@@ -29,7 +29,6 @@
 #                                                                      #
 ########################################################################
 
-import binascii
 import logging
 
 from aobd.utils import contiguous
@@ -47,7 +46,7 @@ class LegacyProtocol(Protocol):
     def create_frame(self, raw):
 
         frame = Frame(raw)
-        raw_bytes = binascii.unhexlify(raw)
+        raw_bytes = memoryview(raw)
 
         if len(raw_bytes) < 6:
             logger.debug("Dropped frame for being too short")
@@ -78,6 +77,7 @@ class LegacyProtocol(Protocol):
 
         # len(frames) will always be >= 1 (see the caller, protocol.py)
         mode = frames[0].data_bytes[0]
+        message.mode = mode
         
         # test that all frames are responses to the same Mode (SID)
         if len(frames) > 1:
@@ -98,10 +98,10 @@ class LegacyProtocol(Protocol):
             # 48 6B 10 43 03 04 00 00 00 00 ck
             #             [     Data      ]
 
-            for f in frames:
-                message.data_bytes += f.data_bytes[1:]
+            message.data_bytes = b''.join(f.data_bytes[1:] for f in frames)
 
         else:
+            message.pid = frames[0].data_bytes[1]
             if len(frames) == 1:
                 # return data, excluding the mode/pid bytes
 
@@ -110,7 +110,7 @@ class LegacyProtocol(Protocol):
                 # 48 6B 10 41 00 BE 7F B8 13 ck
                 #                [  Data   ]
 
-                message.data_bytes = frames[0].data_bytes[2:]
+                message.data_bytes = bytes(frames[0].data_bytes[2:])
 
             else: # len(frames) > 1:
                 # generic multiline requests carry an order byte
@@ -132,8 +132,8 @@ class LegacyProtocol(Protocol):
                     return None
 
                 # now that they're in order, accumulate the data from each frame
-                for f in frames:
-                    message.data_bytes += f.data_bytes[3:] # loose the mode/pid/seq bytes
+                # loose the mode/pid/seq bytes
+                message.data_bytes = b''.join(f.data_bytes[3:] for f in frames)
 
         return message
 
@@ -0,0 +1,195 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Scheduler of polling of OBD commands at different rates.
+
+The polls of a command are scheduled at ticks of monotonic clock, which
+are multiples of the polling interval of the command since the origin
+of the scheduler. The ticks do not depend on the time the polls are
+made, so the polling rate does not drift. The ticks of all commands
+share the origin, so the commands with rates being multiples of each
+other are due at the same time and are sent within one multi-PID request
+on CAN vehicles.
+
+When the vehicle cannot keep up with the requested rates, the missed
+ticks are skipped instead of polling a command many times to catch up.
+All commands due are polled together, the most overdue first, so each
+command is polled at the highest rate the vehicle allows, but not
+faster than requested. The achieved rates and the numbers of missed
+ticks are reported with `rates` method.
+"""
+
+import collections
+import math
+import time
+
+# number of the latest polls used to calculate achieved rate
+RATE_WINDOW = 32
+
+Rate = collections.namedtuple('Rate', 'target achieved missed')
+Rate.__doc__ = """
+Polling rate of OBD command.
+
+:var target: Requested number of polls per second.
+:var achieved: Achieved number of polls per second, `None` if not known
+    yet.
+:var missed: Number of skipped ticks.
+"""
+
+
+class Scheduler:
+    """
+    Scheduler of polling of OBD commands at different rates.
+
+    :param origin: Monotonic time of the first tick in seconds.
+    """
+    def __init__(self, origin=None):
+        self.origin = time.monotonic() if origin is None else origin
+
+        # command -> polling interval, time of the next tick, times of the
+        # latest polls, number of missed ticks
+        self._interval = {}
+        self._due = {}
+        self._polls = {}
+        self._missed = {}
+
+
+    def add(self, command, rate, now=None):
+        """
+        Add OBD command or change its polling rate.
+
+        New command is due at once.
+
+        :param command: OBD command.
+        :param rate: Requested number of polls per second.
+        :param now: Current monotonic time in seconds.
+        """
+        if rate <= 0:
+            raise ValueError('Rate has to be positive: {}'.format(rate))
+
+        now = time.monotonic() if now is None else now
+        interval = 1 / rate
+        self._interval[command] = interval
+        if command in self._due:
+            self._due[command] = min(
+                self._due[command], self._tick(interval, now)
+            )
+        else:
+            self._due[command] = now
+            self._polls[command] = collections.deque(maxlen=RATE_WINDOW)
+            self._missed[command] = 0
+
+
+    def remove(self, command):
+        """
+        Remove OBD command from the scheduler.
+        """
+        self._interval.pop(command, None)
+        self._due.pop(command, None)
+        self._polls.pop(command, None)
+        self._missed.pop(command, None)
+
+
+    def clear(self):
+        """
+        Remove all OBD commands from the scheduler.
+        """
+        self._interval.clear()
+        self._due.clear()
+        self._polls.clear()
+        self._missed.clear()
+
+
+    def due(self, now=None):
+        """
+        Get OBD commands due to be polled and schedule their next polls.
+
+        The most overdue commands are returned first.
+
+        :param now: Current monotonic time in seconds.
+        """
+        now = time.monotonic() if now is None else now
+        items = sorted(
+            (t, k, cmd) for k, (cmd, t) in enumerate(self._due.items())
+            if t <= now
+        )
+        for t, _, cmd in items:
+            interval = self._interval[cmd]
+            t = self._tick(interval, t)
+            if t <= now:
+                # vehicle cannot keep up, skip the missed ticks
+                n = self._tick(interval, now)
+                self._missed[cmd] += round((n - t) / interval)
+                t = n
+            self._due[cmd] = t
+            self._polls[cmd].append(now)
+        return [cmd for _, _, cmd in items]
+
+
+    def next_time(self):
+        """
+        Get monotonic time of the next tick or `None` if there are no
+        commands.
+        """
+        return min(self._due.values(), default=None)
+
+
+    def rates(self):
+        """
+        Get polling rates of OBD commands.
+
+        Dictionary of command and its polling rate is returned, see
+        `Rate` class.
+        """
+        return {
+            cmd: Rate(1 / interval, achieved(self._polls[cmd]), self._missed[cmd])
+            for cmd, interval in self._interval.items()
+        }
+
+
+    def __contains__(self, command):
+        return command in self._interval
+
+
+    def __len__(self):
+        return len(self._interval)
+
+
+    def _tick(self, interval, now):
+        """
+        Get time of the first tick after the current time.
+        """
+        # current time at a tick is not after the tick despite rounding
+        # errors
+        k = math.floor((now - self.origin) / interval + 1e-9) + 1
+        return self.origin + k * interval
+
+
+
+def achieved(polls):
+    """
+    Calculate achieved rate from times of polls.
+    """
+    if len(polls) < 2 or polls[-1] == polls[0]:
+        return None
+    return (len(polls) - 1) / (polls[-1] - polls[0])
+
+
+# vim: sw=4:et:ai
@@ -0,0 +1,45 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+ELM327 device and vehicle simulator.
+
+The simulator is used with in-memory transport::
+
+    sim = Simulator(protocol='7', ecus=[ECU(), ECU(pids={0x05, 0x0D})])
+    dev = aobd.OBD(MemoryTransport(sim))
+
+or served over pseudo terminal::
+
+    device = PtyDevice(Simulator())
+    dev = aobd.OBD(device.name)
+
+The recorded responses of ELM327 device are replayed in the same way::
+
+    device = PtyDevice(Replay.from_file('data.log', speed=100))
+"""
+
+from .ecu import ECU
+from .elm327 import Simulator, PtyDevice
+from .replay import Replay
+from .vehicle import Vehicle
+
+__all__ = ['ECU', 'Simulator', 'PtyDevice', 'Replay', 'Vehicle']
+
+# vim: sw=4:et:ai
@@ -0,0 +1,140 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Simulated ECU answering OBD requests.
+"""
+
+from ..commands import COMMANDS
+from .vehicle import Vehicle
+
+# maximum number of PIDs in single mode 01 request
+MAX_PIDS = 6
+
+# all mode 01 PIDs except the PIDs of supported PIDs bitmaps
+MODE1_PIDS = frozenset(
+    p for p in range(0x100) if (1, p) in COMMANDS and p % 0x20
+)
+
+
+def encode_dtc(code):
+    """
+    Encode trouble code, i.e. `P0104`, into two bytes.
+    """
+    a = 'PCBU'.index(code[0]) << 6 | int(code[1], 16) << 4 | int(code[2], 16)
+    return bytes((a, int(code[3:5], 16)))
+
+
+def pid_bitmap(pids, base):
+    """
+    Create bitmap of supported PIDs in range `base + 1` to `base + 0x20`.
+
+    The last bit is set if any PID above the range is supported.
+    """
+    value = 0
+    for i in range(0x1F):
+        if base + 1 + i in pids:
+            value |= 1 << (31 - i)
+    if any(p > base + 0x20 for p in pids):
+        value |= 1
+    return value.to_bytes(4, 'big')
+
+
+class ECU:
+    """
+    Simulated ECU.
+
+    The ECU answers mode 01 requests, including multi-PID requests, with
+    data of vehicle signal model. It answers mode 03 and 07 requests with
+    its trouble codes, which are cleared with mode 04 request. Vehicle
+    identification number is returned for mode 09 PID 02 request.
+
+    :param vehicle: Vehicle signal model.
+    :param pids: Supported mode 01 PIDs, all by default.
+    :param dtcs: Trouble codes, i.e. `P0104`.
+    :param vin: Vehicle identification number.
+    """
+    def __init__(self, vehicle=None, pids=None, dtcs=(), vin='1AOBD00SIMULATOR1'):
+        self.vehicle = Vehicle() if vehicle is None else vehicle
+        self.pids = MODE1_PIDS if pids is None else frozenset(pids)
+        self.dtcs = list(dtcs)
+        self.vin = vin
+
+
+    def __call__(self, request):
+        """
+        Get response payload for request payload.
+
+        Mode and PIDs of request are passed, i.e. `b'\\x01\\x0c'`. Response
+        payload, i.e. `b'\\x41\\x0c\\x1a\\xf8'`, is returned or `None` if
+        the ECU does not answer the request.
+
+        :param request: Request payload.
+        """
+        mode = request[0]
+        if mode == 0x01:
+            return self._mode1(request[1:])
+        elif mode in (0x03, 0x07):
+            data = b''.join(encode_dtc(c) for c in self.dtcs)
+            return bytes((mode + 0x40, len(self.dtcs))) + data
+        elif mode == 0x04:
+            self.dtcs.clear()
+            return b'\x44'
+        elif mode == 0x09 and request[1:] == b'\x00':
+            return b'\x49\x00\x40\x00\x00\x00'
+        elif mode == 0x09 and request[1:] == b'\x02':
+            return b'\x49\x02\x01' + self.vin.encode()
+        return None
+
+
+    def supports(self, pid):
+        """
+        Check if mode 01 PID is supported.
+        """
+        if pid % 0x20 == 0:
+            return pid == 0 or any(p > pid for p in self.pids)
+        return pid in self.pids
+
+
+    def data(self, pid):
+        """
+        Get data of mode 01 PID.
+        """
+        if pid % 0x20 == 0:
+            return pid_bitmap(self.pids, pid)
+
+        data = self.vehicle.data(pid)
+        if pid == 0x01:
+            # MIL and number of trouble codes
+            n = min(len(self.dtcs), 0x7F)
+            data = bytes((0x80 | n if n else 0,)) + data[1:]
+        return data
+
+
+    def _mode1(self, pids):
+        if not pids or len(pids) > MAX_PIDS:
+            return None
+
+        data = b''.join(
+            bytes((p,)) + self.data(p) for p in pids if self.supports(p)
+        )
+        return b'\x41' + data if data else None
+
+
+# vim: sw=4:et:ai
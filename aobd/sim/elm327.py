@@ -0,0 +1,399 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Simulated ELM327 device.
+"""
+
+import asyncio
+import binascii
+import inspect
+import logging
+import os
+import pty
+import tty
+
+from .ecu import ECU
+
+logger = logging.getLogger(__name__)
+
+PROTOCOLS = {
+    '1': 'SAE J1850 PWM',
+    '2': 'SAE J1850 VPW',
+    '3': 'ISO 9141-2',
+    '4': 'ISO 14230-4 (KWP 5BAUD)',
+    '5': 'ISO 14230-4 (KWP FAST)',
+    '6': 'ISO 15765-4 (CAN 11/500)',
+    '7': 'ISO 15765-4 (CAN 29/500)',
+    '8': 'ISO 15765-4 (CAN 11/250)',
+    '9': 'ISO 15765-4 (CAN 29/250)',
+}
+CAN_11BIT = {'6', '8'}
+CAN_29BIT = {'7', '9'}
+KWP = {'4', '5'}
+
+# AT commands accepted without any effect
+AT_IGNORED = (
+    b'AL', b'AR', b'AT', b'CAF', b'CFC', b'CRA', b'CM', b'CF', b'D1', b'D0',
+    b'FC', b'IB', b'M', b'NL', b'PC', b'SH', b'ST', b'SW', b'V',
+)
+
+
+def can_frames(payload):
+    """
+    Split response payload into ISO-TP frames.
+
+    The frames are padded to 8 bytes.
+    """
+    n = len(payload)
+    if n <= 7:
+        frames = [bytes((n,)) + payload]
+    else:
+        frames = [bytes((0x10 | n >> 8, n & 0xFF)) + payload[:6]]
+        frames.extend(
+            bytes((0x20 | (i + 1) & 0x0F,)) + payload[k:k + 7]
+            for i, k in enumerate(range(6, n, 7))
+        )
+    return [f.ljust(8, b'\x00') for f in frames]
+
+
+def legacy_frames(payload):
+    """
+    Split response payload into frames of legacy protocols.
+
+    The trouble codes are sent in frames of three codes. Other payloads
+    longer than single frame are sent in frames with order byte.
+    """
+    mode = payload[0]
+    if mode in (0x43, 0x47):
+        data = payload[2:]
+        chunks = [data[k:k + 6] for k in range(0, len(data), 6)] or [b'']
+        return [bytes((mode,)) + c.ljust(6, b'\x00') for c in chunks]
+    elif len(payload) <= 7:
+        return [payload]
+    else:
+        head, data = payload[:2], payload[2:]
+        data = data.rjust(-(-len(data) // 4) * 4, b'\x00')
+        return [
+            head + bytes((i + 1,)) + data[k:k + 4]
+            for i, k in enumerate(range(0, len(data), 4))
+        ]
+
+
+class Simulator:
+    """
+    Simulated ELM327 device with ECUs of a vehicle.
+
+    The simulator is a request handler of in-memory transport. It can be
+    also served over pseudo terminal with `PtyDevice` class.
+
+    The simulator answers AT commands used to setup ELM327 device, i.e.
+    echo, headers, linefeeds, spaces and protocol selection. The vehicle
+    protocol is detected on first OBD request if automatic protocol
+    search is enabled. Otherwise the selected protocol has to be the
+    vehicle protocol.
+
+    :param protocol: Vehicle protocol number, i.e. `6` for CAN 11-bit,
+        500 kbaud.
+    :param ecus: ECUs of the vehicle, single ECU by default.
+    :param latency: Latency of a response in seconds.
+    :param version: Version of simulated ELM327 device.
+    """
+    # AT commands setting the flags
+    _FLAGS = {b'E': 'echo', b'H': 'headers', b'L': 'linefeeds', b'S': 'spaces'}
+
+    def __init__(self, protocol='6', ecus=None, latency=0, version='1.4'):
+        if protocol not in PROTOCOLS:
+            raise ValueError('Unsupported protocol: {}'.format(protocol))
+
+        self.protocol = protocol
+        self.ecus = [ECU()] if ecus is None else ecus
+        self.latency = latency
+        self.version = version
+
+        # protocol set with ATSP command
+        self._protocol = '0'
+        self._auto = True
+        self.reset()
+
+
+    def reset(self):
+        """
+        Reset settings of the device.
+        """
+        self.echo = True
+        self.headers = False
+        self.linefeeds = False
+        self.spaces = True
+        self._detected = False
+
+
+    def __call__(self, request):
+        """
+        Process request and return response data ending with the prompt.
+
+        Awaitable of the response data is returned if latency of
+        responses is set.
+
+        :param request: Request without terminating carriage return.
+        """
+        response = self.process(request)
+        if self.latency:
+            return self._delay(response)
+        return response
+
+
+    def process(self, request):
+        """
+        Process request and return response data ending with the prompt.
+
+        :param request: Request without terminating carriage return.
+        """
+        echo = request + b'\r' if self.echo else b''
+        cmd = request.strip().replace(b' ', b'').upper()
+        if cmd.startswith(b'AT'):
+            lines = self._at(cmd[2:])
+        elif cmd:
+            lines = self._obd(cmd)
+        else:
+            lines = []
+
+        eol = b'\r\n' if self.linefeeds else b'\r'
+        lines.append(b'')
+        return echo + eol.join(lines) + eol + b'>'
+
+
+    async def _delay(self, response):
+        await asyncio.sleep(self.latency)
+        return response
+
+
+    def _at(self, cmd):
+        value = cmd[-1:]
+        if cmd in (b'Z', b'WS'):
+            self.reset()
+            return [b'', b'', self._version()] if cmd == b'Z' \
+                else [self._version()]
+        elif cmd == b'I':
+            return [self._version()]
+        elif cmd == b'@1':
+            return [b'OBDII to RS232 Interpreter']
+        elif cmd == b'RV':
+            return [b'14.2V']
+        elif cmd == b'DPN':
+            p = self.protocol if self._detected else self._protocol
+            return [(b'A' if self._auto else b'') + p.encode()]
+        elif cmd == b'DP':
+            p = self.protocol if self._detected else self._protocol
+            name = PROTOCOLS.get(p, 'AUTO')
+            return [('AUTO, ' + name if self._auto else name).encode()]
+        elif cmd[:2] in (b'SP', b'TP'):
+            return self._set_protocol(cmd[2:].decode())
+        elif cmd[:1] in b'EHLS' and len(cmd) == 2 and value in b'01':
+            setattr(self, self._FLAGS[cmd[:1]], value == b'1')
+            return [b'OK']
+        elif cmd == b'D':
+            self.reset()
+            return [b'OK']
+        elif cmd.startswith(AT_IGNORED):
+            return [b'OK']
+        return [b'?']
+
+
+    def _set_protocol(self, value):
+        auto = value.startswith('A')
+        p = value[1:] if auto else value
+        if p != '0' and p not in PROTOCOLS:
+            return [b'?']
+
+        self._protocol = p
+        self._auto = auto or p == '0'
+        self._detected = False
+        return [b'OK']
+
+
+    def _obd(self, cmd):
+        # odd number of digits, the last one is number of expected
+        # responses
+        if len(cmd) % 2 and len(cmd) > 2:
+            cmd = cmd[:-1]
+        try:
+            request = binascii.unhexlify(cmd)
+        except (binascii.Error, ValueError):
+            return [b'?']
+
+        lines = []
+        if not self._detected:
+            if not self._auto and self._protocol != self.protocol:
+                return [b'UNABLE TO CONNECT']
+            if self._auto:
+                lines.append(b'SEARCHING...')
+            self._detected = True
+
+        legacy = self.protocol not in CAN_11BIT | CAN_29BIT
+        if legacy and request[0] == 0x01 and len(request) > 2:
+            responses = []
+        else:
+            responses = [(i, ecu(request)) for i, ecu in enumerate(self.ecus)]
+            responses = [(i, r) for i, r in responses if r is not None]
+
+        for i, payload in responses:
+            lines.extend(self._format(i, payload))
+        return lines or [b'NO DATA']
+
+
+    def _format(self, ecu, payload):
+        """
+        Format response payload of an ECU as lines of frames.
+        """
+        if self.protocol in CAN_11BIT:
+            header = b'%03X' % (0x7E8 + ecu)
+            frames = can_frames(payload)
+        elif self.protocol in CAN_29BIT:
+            header = self._hex(bytes((0x18, 0xDA, 0xF1, 0x10 + ecu)))
+            frames = can_frames(payload)
+        else:
+            header = None
+            frames = legacy_frames(payload)
+
+        if not self.headers:
+            return self._format_data(frames, header is not None)
+
+        sep = b' ' if self.spaces else b''
+        lines = []
+        for f in frames:
+            if header is None:
+                h = self._legacy_header(ecu, len(f))
+                f = h + f + bytes((sum(h + f) & 0xFF,))
+                lines.append(self._hex(f))
+            else:
+                lines.append(header + sep + self._hex(f))
+        return lines
+
+
+    def _format_data(self, frames, can):
+        """
+        Format frames without headers.
+        """
+        if not can:
+            return [self._hex(f) for f in frames]
+        if len(frames) == 1:
+            f = frames[0]
+            return [self._hex(f[1:1 + f[0]])]
+
+        n = (frames[0][0] & 0x0F) << 8 | frames[0][1]
+        lines = [b'%03X' % n, b'0: ' + self._hex(frames[0][2:])]
+        lines.extend(
+            b'%X: ' % (i + 1 & 0x0F) + self._hex(f[1:])
+            for i, f in enumerate(frames[1:])
+        )
+        return lines
+
+
+    def _legacy_header(self, ecu, size):
+        address = 0x10 + ecu
+        if self.protocol in KWP:
+            return bytes((0x80 | size, 0xF1, address))
+        priority = 0x41 if self.protocol == '1' else 0x48
+        return bytes((priority, 0x6B, address))
+
+
+    def _hex(self, data):
+        if self.spaces:
+            return binascii.hexlify(data, b' ').upper()
+        return binascii.hexlify(data).upper()
+
+
+    def _version(self):
+        return 'ELM327 v{}'.format(self.version).encode()
+
+
+
+class PtyDevice:
+    """
+    Request handler, i.e. simulator, served over pseudo terminal.
+
+    The name of the device is the path of the pseudo terminal, which can
+    be opened with `aobd.OBD` class or other program.
+
+    :param handler: Request handler, i.e. `Simulator` instance.
+    :param loop: Asyncio event loop.
+    :var name: Path of pseudo terminal device.
+    """
+    def __init__(self, handler, loop=None):
+        self.handler = handler
+        self._loop = asyncio.get_event_loop() if loop is None else loop
+
+        master, slave = pty.openpty()
+        tty.setraw(master)
+        tty.setraw(slave)
+        os.set_blocking(master, False)
+
+        self.name = os.ttyname(slave)
+        self._master = master
+        self._slave = slave
+        self._input = bytearray()
+        self._output = bytearray()
+        self._loop.add_reader(master, self._read)
+        logger.info('simulator device {}'.format(self.name))
+
+
+    def close(self):
+        """
+        Stop serving the handler and close the pseudo terminal.
+        """
+        self._loop.remove_reader(self._master)
+        self._loop.remove_writer(self._master)
+        os.close(self._master)
+        os.close(self._slave)
+
+
+    def _read(self):
+        try:
+            self._input.extend(os.read(self._master, 1024))
+        except BlockingIOError:
+            return
+
+        data = self._input.replace(b'\n', b'')
+        *requests, rest = data.split(b'\r')
+        self._input = bytearray(rest)
+        for request in requests:
+            response = self.handler(bytes(request))
+            if inspect.isawaitable(response):
+                task = asyncio.ensure_future(response)
+                task.add_done_callback(lambda t: self._write(t.result()))
+            else:
+                self._write(response)
+
+
+    def _write(self, data=b''):
+        self._output.extend(data)
+        try:
+            n = os.write(self._master, self._output)
+        except BlockingIOError:
+            n = 0
+        del self._output[:n]
+
+        if self._output:
+            self._loop.add_writer(self._master, self._write)
+        else:
+            self._loop.remove_writer(self._master)
+
+
+# vim: sw=4:et:ai
@@ -0,0 +1,148 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Replay of recorded ELM327 device responses.
+"""
+
+import asyncio
+import bisect
+import logging
+import time
+
+from ..capture import exchanges
+from ..logparse import read_events
+
+logger = logging.getLogger(__name__)
+
+
+def request_key(request):
+    """
+    Normalize request to find its recorded responses.
+
+    The spaces and terminating characters are removed. The number of
+    expected responses is removed from OBD requests.
+    """
+    key = request.strip().replace(b' ', b'').upper()
+    if not key.startswith(b'AT') and len(key) % 2 and len(key) > 2:
+        key = key[:-1]
+    return key
+
+
+class Replay:
+    """
+    Request handler replaying recorded responses of ELM327 device.
+
+    The handler is used like the simulator, with in-memory transport or
+    served over pseudo terminal with `PtyDevice` class.
+
+    The responses are found by request, not by the order of the
+    recording, so a client can poll the commands in different order or
+    at different rate than the recorded client.
+
+    The replay clock starts with the first request. The clock runs
+    `speed` times faster than the recording and the position of the
+    replay in the recording is calculated from the monotonic clock, so
+    there is no drift. A request is answered with the latest recorded
+    response to the same request at the position. The response is sent
+    after the recorded response latency divided by `speed`.
+
+    If `speed` is `None`, the responses are sent at once in the order of
+    the recording, and the last response of a request is repeated when
+    the recording ends.
+
+    :param exchanges: Iterable of tuples of request time in seconds,
+        request, response time in seconds and response, see
+        `aobd.capture.exchanges`.
+    :param speed: Speed-up factor of the replay, `None` for maximum speed.
+    """
+    def __init__(self, exchanges, speed=1):
+        self.speed = speed
+
+        # request -> recorded times, response latencies and responses
+        self._responses = {}
+        self._cursor = {}
+        self._origin = None
+        self._start = None
+
+        for t_request, request, t_response, response in exchanges:
+            if not response.endswith(b'>'):
+                continue
+
+            if self._origin is None:
+                self._origin = t_request
+            key = request_key(request)
+            times, latencies, responses = self._responses.setdefault(
+                key, ([], [], [])
+            )
+            times.append(t_request)
+            latencies.append(max(0, t_response - t_request))
+            responses.append(response)
+
+        logger.info('replay of {} requests'.format(len(self._responses)))
+
+
+    @classmethod
+    def from_file(cls, path, speed=1):
+        """
+        Create replay of ELM327 debug log or capture file.
+
+        :param path: Path of debug log or capture file.
+        :param speed: Speed-up factor of the replay, `None` for maximum
+            speed.
+        """
+        return cls(exchanges(read_events(path)), speed)
+
+
+    def __call__(self, request):
+        """
+        Find recorded response of a request.
+
+        Awaitable of the response is returned unless replaying at maximum
+        speed.
+
+        :param request: Request without terminating carriage return.
+        """
+        key = request_key(request)
+        item = self._responses.get(key)
+        if item is None:
+            logger.warning('no recorded response of {}'.format(key))
+            return b'?\r\r>' if key.startswith(b'AT') else b'NO DATA\r\r>'
+
+        times, latencies, responses = item
+        if self.speed is None:
+            k = self._cursor.get(key, 0)
+            self._cursor[key] = min(k + 1, len(responses) - 1)
+            return responses[k]
+
+        now = time.monotonic()
+        if self._start is None:
+            self._start = now
+        position = self._origin + (now - self._start) * self.speed
+        k = max(0, bisect.bisect_right(times, position) - 1)
+        deadline = now + latencies[k] / self.speed
+        return self._delay(deadline, responses[k])
+
+
+    async def _delay(self, deadline, response):
+        await asyncio.sleep(deadline - time.monotonic())
+        return response
+
+
+# vim: sw=4:et:ai
@@ -0,0 +1,250 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Vehicle signal model of the simulator.
+
+The vehicle repeats a driving cycle - it accelerates, cruises, brakes
+and idles. Engine speed, load, air flow, etc. follow the vehicle speed.
+The engine warms up and the fuel is used over time.
+
+The remaining mode 01 PIDs with linear decoders oscillate within the
+middle of their range of values. The other PIDs have constant values.
+"""
+
+import math
+import time
+
+from ..commands import COMMANDS
+from ..decoders import Linear
+
+
+def clamp(value, low, high):
+    return max(low, min(value, high))
+
+
+def smoothstep(x):
+    x = clamp(x, 0, 1)
+    return x * x * (3 - 2 * x)
+
+
+def encode(decoder, value, size):
+    """
+    Encode value of linear decoder into response data.
+
+    :param decoder: Linear decoder.
+    :param value: Value to encode.
+    :param size: Size of response data.
+    """
+    raw = (value - decoder.offset) * decoder.divisor / decoder.scale
+    bits = 8 * decoder.size
+    if decoder.signed:
+        low, high = -(1 << (bits - 1)), (1 << (bits - 1)) - 1
+    else:
+        low, high = 0, (1 << bits) - 1
+    raw = clamp(int(round(raw)), low, high)
+
+    data = bytearray(size)
+    data[decoder.start:decoder.end] = raw.to_bytes(
+        decoder.size, 'big', signed=decoder.signed
+    )
+    return bytes(data)
+
+
+def to_bytes(value, size, signed=False):
+    return int(round(value)).to_bytes(size, 'big', signed=signed)
+
+
+class Vehicle:
+    """
+    Vehicle signal model.
+
+    :param cycle: Duration of driving cycle in seconds.
+    :param start: Start time of the vehicle, monotonic clock time.
+    """
+    def __init__(self, cycle=120.0, start=None):
+        self.cycle = cycle
+        self.start = time.monotonic() if start is None else start
+
+
+    def time(self):
+        """
+        Get time since the start of the vehicle.
+        """
+        return time.monotonic() - self.start
+
+
+    def data(self, pid, t=None):
+        """
+        Get data of mode 01 PID at given time.
+
+        :param pid: Mode 01 PID.
+        :param t: Time since start of the vehicle, current time by default.
+        """
+        if t is None:
+            t = self.time()
+
+        cmd = COMMANDS[1, pid]
+        f = SIGNALS.get(pid)
+        if f is not None:
+            return encode(cmd.decode, f(self, t), cmd.bytes)
+
+        f = DATA.get(pid)
+        if f is not None:
+            return f(self, t)
+
+        if isinstance(cmd.decode, Linear):
+            return self._oscillate(cmd, t)
+
+        return bytes(cmd.bytes)
+
+
+    def speed(self, t):
+        """
+        Vehicle speed [km/h].
+        """
+        p = (t % self.cycle) / self.cycle
+        if p < 0.3:
+            return 100 * smoothstep(p / 0.3)
+        elif p < 0.6:
+            return 100 + 3 * math.sin(2 * math.pi * t / 10)
+        elif p < 0.9:
+            return 100 * smoothstep((0.9 - p) / 0.3)
+        else:
+            return 0.0
+
+
+    def throttle(self, t):
+        """
+        Throttle position [%].
+        """
+        p = (t % self.cycle) / self.cycle
+        if p < 0.3:
+            return 15 + 45 * math.sin(math.pi * p / 0.3)
+        elif p < 0.6:
+            return 25.0
+        else:
+            return 15.0
+
+
+    def rpm(self, t):
+        """
+        Engine speed [rpm].
+        """
+        speed = self.speed(t)
+        # change gear every 30 km/h
+        gear = min(int(speed // 30), 4)
+        return 800 + (speed - gear * 30) * 80 + gear * 300
+
+
+    def load(self, t):
+        """
+        Engine load [%].
+        """
+        return clamp(0.8 * self.throttle(t) + 10, 0, 100)
+
+
+    def maf(self, t):
+        """
+        Mass air flow [g/s].
+        """
+        return self.rpm(t) * self.load(t) / 5000
+
+
+    def coolant_temp(self, t):
+        """
+        Engine coolant temperature [C], the engine warms up in few
+        minutes.
+        """
+        return 90 - 70 * math.exp(-t / 300)
+
+
+    def fuel_level(self, t):
+        """
+        Fuel level [%].
+        """
+        return clamp(75 - t / 720, 5, 100)
+
+
+    def _oscillate(self, cmd, t):
+        """
+        Get data of PID oscillating within middle of its range of values.
+        """
+        decoder = cmd.decode
+        pid = cmd.get_pid_int()
+        high = (1 << (8 * decoder.size)) - 1
+        period = 10 + 5 * (pid % 7)
+        raw = high * (0.5 + 0.25 * math.sin(2 * math.pi * t / period + pid))
+
+        data = bytearray(cmd.bytes)
+        data[decoder.start:decoder.end] = to_bytes(raw, decoder.size)
+        return bytes(data)
+
+
+
+# mode 01 PIDs of linear decoders and their physical values
+SIGNALS = {
+    0x04: Vehicle.load,
+    0x05: Vehicle.coolant_temp,
+    0x0B: lambda v, t: 30 + 0.7 * v.load(t),
+    0x0C: Vehicle.rpm,
+    0x0D: Vehicle.speed,
+    0x0E: lambda v, t: 10 + 20 * (1 - v.load(t) / 100),
+    0x0F: lambda v, t: 25 + 10 * math.sin(2 * math.pi * t / v.cycle),
+    0x10: Vehicle.maf,
+    0x11: Vehicle.throttle,
+    0x1F: lambda v, t: t,
+    0x21: lambda v, t: 0,
+    0x2F: Vehicle.fuel_level,
+    0x30: lambda v, t: 10,
+    0x31: lambda v, t: 1000 + t / 60,
+    0x33: lambda v, t: 101,
+    0x45: Vehicle.throttle,
+    0x46: lambda v, t: 20,
+    0x4D: lambda v, t: 0,
+    0x4E: lambda v, t: 1440 + t / 60,
+    0x5C: lambda v, t: v.coolant_temp(t) + 5,
+    0x5E: lambda v, t: v.maf(t) * 3600 / 14.7 / 745,
+}
+
+# mode 01 PIDs of other decoders and their data
+DATA = {
+    # spark ignition, all tests complete
+    0x01: lambda v, t: b'\x00\x07\x65\x00',
+    0x02: lambda v, t: b'\x00\x00',
+    # open loop until engine warms up, then closed loop
+    0x03: lambda v, t: b'\x01\x00' if v.coolant_temp(t) < 40 else b'\x02\x00',
+    0x12: lambda v, t: b'\x01',
+    0x13: lambda v, t: b'\x03',
+    # EOBD
+    0x1C: lambda v, t: b'\x06',
+    0x1D: lambda v, t: b'\x03',
+    0x1E: lambda v, t: b'\x00',
+    0x32: lambda v, t: to_bytes(4 * (-100 + 20 * math.sin(t)), 2, True),
+    0x41: lambda v, t: b'\x00\x07\x65\x00',
+    0x42: lambda v, t: to_bytes(14200 + 100 * math.sin(t / 10), 2),
+    0x43: lambda v, t: to_bytes(v.load(t) * 255 / 100, 2),
+    0x44: lambda v, t: to_bytes(32768, 2),
+    0x4F: lambda v, t: b'\x00\x00\x00\x00',
+    # gasoline
+    0x51: lambda v, t: b'\x01',
+    0x5F: lambda v, t: b'\x0e',
+}
+
+# vim: sw=4:et:ai
@@ -0,0 +1,258 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Latency statistics of OBD queries.
+
+The stages of a query are measured with monotonic clock timestamps
+
+write
+    Writing of request to the device.
+response
+    Waiting for the first byte of the response, i.e. the time the device
+    and the vehicle ECUs process the request.
+receive
+    Receiving the response until the prompt.
+parse
+    Parsing the response with protocol parser.
+decode
+    Decoding values of the response.
+total
+    All of the above.
+"""
+
+import time
+
+# stages of a query and their start and end timestamps
+STAGES = (
+    ('write', 'write', 'written'),
+    ('response', 'written', 'first_byte'),
+    ('receive', 'first_byte', 'prompt'),
+    ('parse', 'prompt', 'parsed'),
+    ('decode', 'parsed', 'decoded'),
+    ('total', 'write', 'decoded'),
+)
+STAGE_NAMES = tuple(s for s, _, _ in STAGES)
+
+# number of bits of histogram sub-buckets, the relative error of
+# percentiles is below 1 / 2 ** SUB_BITS
+SUB_BITS = 3
+SUB_MIN = 1 << (SUB_BITS + 1)
+
+
+def bucket(value):
+    """
+    Get index of histogram bucket of a value.
+
+    Values below `SUB_MIN` have their own buckets. The values above are
+    put into `2 ** SUB_BITS` buckets per power of two.
+    """
+    if value < SUB_MIN:
+        return value
+    shift = value.bit_length() - SUB_BITS - 1
+    return (shift << SUB_BITS) + (value >> shift)
+
+
+def bucket_value(index):
+    """
+    Get the highest value of histogram bucket.
+    """
+    if index < SUB_MIN:
+        return index
+    shift = (index >> SUB_BITS) - 1
+    m = index - (shift << SUB_BITS)
+    return ((m + 1) << shift) - 1
+
+
+class Timing:
+    """
+    Monotonic clock timestamps of OBD query stages in nanoseconds.
+
+    :var commands: Commands of the query.
+    :var request: Request sent to the device.
+    :var write: Start of writing the request.
+    :var written: End of writing the request.
+    :var first_byte: First byte of the response received.
+    :var prompt: Prompt received.
+    :var parsed: Response parsed.
+    :var decoded: Response decoded.
+    """
+    __slots__ = (
+        'commands', 'request', 'write', 'written', 'first_byte', 'prompt',
+        'parsed', 'decoded',
+    )
+    def __init__(self, request=None):
+        self.commands = ()
+        self.request = request
+        self.write = time.monotonic_ns()
+        self.written = None
+        self.first_byte = None
+        self.prompt = None
+        self.parsed = None
+        self.decoded = None
+
+
+    def copy(self):
+        """
+        Create copy of the timestamps.
+        """
+        t = Timing.__new__(Timing)
+        for name in Timing.__slots__:
+            setattr(t, name, getattr(self, name))
+        return t
+
+
+    def stages(self):
+        """
+        Get durations of query stages in nanoseconds.
+
+        Stage is skipped if any of its timestamps is not known.
+        """
+        items = (
+            (stage, getattr(self, start), getattr(self, end))
+            for stage, start, end in STAGES
+        )
+        return [
+            (stage, end - start) for stage, start, end in items
+            if start is not None and end is not None
+        ]
+
+
+    def __repr__(self):
+        stages = ' '.join('{}={}'.format(s, v) for s, v in self.stages())
+        return '<Timing {} {}>'.format(self.request, stages)
+
+
+
+class Histogram:
+    """
+    Histogram of latencies in nanoseconds.
+
+    The histogram has logarithmic buckets, so its size and the cost of
+    adding a value do not depend on number of values. The maximum value
+    is exact.
+    """
+    __slots__ = ('count', 'max', '_buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.max = 0
+        self._buckets = {}
+
+
+    def add(self, value):
+        """
+        Add value to the histogram.
+        """
+        self.count += 1
+        if value > self.max:
+            self.max = value
+        k = bucket(value)
+        buckets = self._buckets
+        buckets[k] = buckets.get(k, 0) + 1
+
+
+    def percentile(self, p):
+        """
+        Get approximate percentile of values.
+
+        :param p: Percentile, i.e. 99.
+        """
+        if not self.count:
+            return None
+
+        rank = max(1, round(p / 100 * self.count))
+        n = 0
+        for k in sorted(self._buckets):
+            n += self._buckets[k]
+            if n >= rank:
+                return min(bucket_value(k), self.max)
+        return self.max
+
+
+    def summary(self):
+        """
+        Get count, p50, p95, p99 and maximum of values in seconds.
+        """
+        return {
+            'count': self.count,
+            'p50': self.percentile(50) / 1e9,
+            'p95': self.percentile(95) / 1e9,
+            'p99': self.percentile(99) / 1e9,
+            'max': self.max / 1e9,
+        }
+
+
+
+class Stats:
+    """
+    Latency histograms of OBD queries per command and query stage.
+    """
+    def __init__(self):
+        self._data = {}
+
+
+    def record(self, timing):
+        """
+        Record timestamps of a query for each of its commands.
+        """
+        stages = timing.stages()
+        data = self._data
+        for cmd in timing.commands:
+            histograms = data.get(cmd.name)
+            if histograms is None:
+                histograms = data[cmd.name] = {
+                    s: Histogram() for s in STAGE_NAMES
+                }
+            for stage, value in stages:
+                histograms[stage].add(value)
+
+
+    def histogram(self, name, stage='total'):
+        """
+        Get histogram of a command and query stage or `None`.
+
+        :param name: Command name, i.e. `RPM`.
+        :param stage: Query stage.
+        """
+        return self._data.get(name, {}).get(stage)
+
+
+    def summary(self):
+        """
+        Get latency summary per command name and query stage.
+
+        For example::
+
+            {'RPM': {'total': {'count': 10, 'p50': 0.05, ...}, ...}, ...}
+        """
+        return {
+            name: {s: h.summary() for s, h in histograms.items() if h.count}
+            for name, histograms in self._data.items()
+        }
+
+
+    def clear(self):
+        """
+        Remove all recorded values.
+        """
+        self._data.clear()
+
+
+# vim: sw=4:et:ai
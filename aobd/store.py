@@ -0,0 +1,110 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+JSON files of objects persisted between connections.
+"""
+
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class JSONStore:
+    """
+    JSON file of objects identified by a key.
+
+    The class of the objects implements `from_dict` class method and
+    `to_dict` method. The file is replaced atomically on each change, so
+    it is never left corrupted. The objects of unreadable file are
+    ignored.
+
+    :param path: Path of the JSON file.
+    :var item_class: Class of the objects.
+    """
+    item_class = None
+
+    def __init__(self, path):
+        self.path = path
+
+
+    def get(self, key):
+        """
+        Get object identified by a key or `None`.
+
+        :param key: Key of the object.
+        """
+        data = self._load().get(key)
+        if data is None:
+            return None
+        try:
+            return self.item_class.from_dict(data)
+        except (KeyError, TypeError, ValueError) as ex:
+            logger.warning('invalid data of {}: {}'.format(key, ex))
+            return None
+
+
+    def save(self, key, item):
+        """
+        Save object identified by a key.
+
+        :param key: Key of the object.
+        :param item: Object to save.
+        """
+        items = self._load()
+        items[key] = item.to_dict()
+        self._write(items)
+
+
+    def remove(self, key):
+        """
+        Remove object identified by a key.
+
+        :param key: Key of the object.
+        """
+        items = self._load()
+        if items.pop(key, None) is not None:
+            self._write(items)
+
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                items = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as ex:
+            logger.warning('cannot read {}: {}'.format(self.path, ex))
+            return {}
+        return items if isinstance(items, dict) else {}
+
+
+    def _write(self, items):
+        dirname = os.path.dirname(self.path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        fn = self.path + '.tmp'
+        with open(fn, 'w') as f:
+            json.dump(items, f, indent=2, sort_keys=True)
+        os.replace(fn, self.path)
+
+
+# vim: sw=4:et:ai
@@ -22,5 +22,51 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
+"""
+Helpers shared by the tests.
+"""
+
+import asyncio
+
+from aobd.sim import PtyDevice, Simulator
+
+
+class Recorder(Simulator):
+    """
+    Simulator remembering requests.
+
+    :var requests: Requests received by the simulator.
+    """
+    def __init__(self, **kw):
+        super().__init__(**kw)
+        self.requests = []
+
+
+    def process(self, request):
+        self.requests.append(request.strip())
+        return super().process(request)
+
+
+
+def run_device(sim, test):
+    """
+    Run test with simulator served over pseudo terminal.
+
+    The requests remembered by the simulator are cleared before the test.
+    Result of the test is returned.
+
+    :param sim: Simulator remembering requests.
+    :param test: Coroutine function receiving name of the device.
+    """
+    async def run():
+        device = PtyDevice(sim)
+        try:
+            return await test(device.name)
+        finally:
+            device.close()
+
+    sim.requests.clear()
+    return asyncio.run(run())
+
 # vim: sw=4:et:ai
 
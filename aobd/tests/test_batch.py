@@ -0,0 +1,121 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Tests for batch processing of archives of captures.
+"""
+
+import numpy as np
+import os.path
+import shutil
+
+from aobd.batch import find_files, merge, process, read_hdf
+from aobd.logparse import Column, parse
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'data')
+
+
+def test_merge():
+    """
+    Test merging columns sorted by time.
+    """
+    r1 = {'RPM': Column(np.array([1.0, 3.0]), np.array([10, 30]), 'RPM')}
+    r2 = {
+        'RPM': Column(np.array([2.0, 3.0]), np.array([20, 31]), 'RPM'),
+        'SPEED': Column(np.array([1.0]), np.array([5]), 'kph'),
+    }
+    columns = merge([r1, r2])
+
+    assert list(columns['RPM'].time) == [1, 2, 3, 3]
+    assert list(columns['RPM'].value) == [10, 20, 30, 31]
+    assert columns['SPEED'].unit == 'kph'
+
+
+def test_process(tmp_path):
+    """
+    Test processing directory of debug logs with multiple workers.
+    """
+    for fn in ('list-commands.log', 'read-rpm-throttle-pos-speed.log'):
+        shutil.copy(os.path.join(DATA_DIR, fn), tmp_path)
+    (tmp_path / 'README').write_text('not a log')
+
+    paths = find_files(str(tmp_path))
+    assert [os.path.basename(p) for p in paths] \
+        == ['list-commands.log', 'read-rpm-throttle-pos-speed.log']
+
+    columns = process(paths, workers=2)
+    expected = merge([parse(p) for p in paths])
+    assert set(columns) == set(expected)
+    for name, c in columns.items():
+        assert list(c.time) == list(expected[name].time)
+        assert list(c.value) == list(expected[name].value)
+
+
+def test_process_corrupted(tmp_path):
+    """
+    Test skipping truncated capture file.
+    """
+    fn = os.path.join(DATA_DIR, 'read-rpm-throttle-pos-speed.log')
+    bad = tmp_path / 'truncated.cap'
+    bad.write_bytes(b'AOBDCAP1\x00\x01')
+
+    columns = process([str(bad), fn], workers=1)
+    assert set(columns) == set(parse(fn))
+
+
+def test_read_hdf(tmp_path):
+    """
+    Test reading HDF5 file of aobd-recorder.
+    """
+    import h5py
+
+    fn = str(tmp_path / 'data.hdf')
+    with h5py.File(fn, 'w') as f:
+        f['rpm'] = [800.0, 850.0]
+        f['latitude'] = [51.5, 51.6]
+        f['_debug_/clock_time'] = [1.0, 2.0]
+
+    columns = read_hdf(fn)
+    assert set(columns) == {'RPM', 'latitude'}
+    assert list(columns['RPM'].time) == [1.0, 2.0]
+    assert columns['RPM'].unit == 'RPM'
+    assert columns['latitude'].unit is None
+
+
+def test_read_hdf_obd(tmp_path):
+    """
+    Test reading HDF5 file of aobd-recorder with commands polled at
+    their own rates.
+    """
+    import h5py
+
+    fn = str(tmp_path / 'data.hdf')
+    with h5py.File(fn, 'w') as f:
+        f['latitude'] = [51.5, 51.6]
+        f['_debug_/clock_time'] = [1.0, 2.0]
+        f['obd/rpm/time'] = [1.0, 1.5, 2.0]
+        f['obd/rpm/value'] = [800.0, 820.0, 850.0]
+
+    columns = read_hdf(fn)
+    assert set(columns) == {'RPM', 'latitude'}
+    assert list(columns['RPM'].time) == [1.0, 1.5, 2.0]
+    assert list(columns['RPM'].value) == [800.0, 820.0, 850.0]
+    assert columns['RPM'].unit == 'RPM'
+
+# vim: sw=4:et:ai
@@ -0,0 +1,149 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Tests for cache of responses to OBD commands.
+"""
+
+import asyncio
+
+from aobd import COMMANDS, OBD
+from aobd.cache import ResponseCache
+from aobd.transport import MemoryTransport
+from aobd.utils import Response
+
+from . import Recorder
+
+
+def response(value):
+    r = Response()
+    r.message = object()
+    r.value = value
+    return r
+
+
+def test_cache_max_age():
+    """
+    Test getting fresh response from cache.
+    """
+    cache = ResponseCache(max_age=5)
+    r = response(90)
+    cache.put(COMMANDS.COOLANT_TEMP, r, now=100)
+
+    assert cache.get(COMMANDS.COOLANT_TEMP, now=104) is r
+    assert cache.get(COMMANDS.COOLANT_TEMP, now=106) is None
+    assert cache.get(COMMANDS.RPM, now=104) is None
+    assert cache.hits == 1
+    assert cache.misses == 2
+
+
+def test_cache_command_max_age():
+    """
+    Test maximum age of responses set per command.
+    """
+    cache = ResponseCache()
+    cache.set_max_age(COMMANDS.FUEL_LEVEL, 60)
+
+    # command without maximum age is not cached
+    cache.put(COMMANDS.RPM, response(800), now=100)
+    cache.put(COMMANDS.FUEL_LEVEL, response(50), now=100)
+    assert len(cache) == 1
+    assert cache.get(COMMANDS.FUEL_LEVEL, now=150).value == 50
+
+    cache.set_max_age(COMMANDS.FUEL_LEVEL, None)
+    assert cache.get(COMMANDS.FUEL_LEVEL, now=150) is None
+
+
+def test_cache_null_response():
+    """
+    Test null response is not cached.
+    """
+    cache = ResponseCache(max_age=5)
+    cache.put(COMMANDS.RPM, Response(), now=100)
+    assert len(cache) == 0
+
+
+def test_cache_evict():
+    """
+    Test evicting responses by age and size of cache.
+    """
+    cache = ResponseCache(max_age=10, size=2)
+    cache.put(COMMANDS.RPM, response(1), now=100)
+    cache.put(COMMANDS.SPEED, response(2), now=101)
+    cache.put(COMMANDS.COOLANT_TEMP, response(3), now=102)
+    assert len(cache) == 2
+    assert cache.get(COMMANDS.RPM, now=102) is None
+
+    # the oldest responses expired
+    cache.put(COMMANDS.FUEL_LEVEL, response(4), now=111.5)
+    assert len(cache) == 2
+    assert cache.get(COMMANDS.COOLANT_TEMP, now=111.5).value == 3
+    assert cache.get(COMMANDS.FUEL_LEVEL, now=111.5).value == 4
+
+
+def test_cache_evict_mixed_max_age():
+    """
+    Test evicting expired responses behind response with longer maximum
+    age.
+    """
+    cache = ResponseCache(max_age=1)
+    cache.set_max_age(COMMANDS.FUEL_LEVEL, 60)
+    cache.put(COMMANDS.FUEL_LEVEL, response(50), now=100)
+    cache.put(COMMANDS.RPM, response(800), now=101)
+    cache.put(COMMANDS.SPEED, response(30), now=102)
+
+    cache.put(COMMANDS.COOLANT_TEMP, response(90), now=102.5)
+    assert len(cache) == 3
+    assert cache.get(COMMANDS.RPM, now=102.5) is None
+
+    cache.put(COMMANDS.COOLANT_TEMP, response(91), now=110)
+    assert len(cache) == 2
+    assert cache.get(COMMANDS.FUEL_LEVEL, now=110).value == 50
+    assert cache.get(COMMANDS.COOLANT_TEMP, now=110).value == 91
+
+
+def test_query_cached():
+    """
+    Test querying vehicle with cache of responses.
+    """
+    async def test():
+        device = Recorder()
+        dev = OBD(MemoryTransport(device))
+        await dev.connect()
+        device.requests.clear()
+
+        dev.cache = ResponseCache(max_age=60)
+
+        r1 = await dev.query(COMMANDS.COOLANT_TEMP)
+        r2 = await dev.query(COMMANDS.COOLANT_TEMP)
+        assert r1 is r2
+        assert device.requests == [b'01051']
+
+        # collection of commands is sent to vehicle and refreshes cache
+        responses = [r async for r in dev.query([COMMANDS.COOLANT_TEMP])]
+        assert device.requests == [b'01051', b'01051']
+        assert await dev.query(COMMANDS.COOLANT_TEMP) is responses[0]
+
+        assert dev.cache.hits == 2
+        assert dev.cache.misses == 1
+        dev.close()
+
+    asyncio.run(test())
+
+# vim: sw=4:et:ai
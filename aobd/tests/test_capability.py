@@ -0,0 +1,133 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Tests for capabilities of ELM327 devices.
+"""
+
+import asyncio
+
+from aobd.capability import Capabilities, CapabilityStore, version_number
+from aobd.elm327 import ELM327
+
+from . import Recorder, run_device
+
+
+class Clone(Recorder):
+    """
+    Simulator of ELM327 clone without support for `ATS0` command and
+    response count suffix.
+    """
+    def process(self, request):
+        cmd = request.strip()
+        if cmd == b'ATS0' or not cmd.startswith(b'AT') and len(cmd) % 2:
+            self.requests.append(cmd)
+            return b'?\r\r>'
+        return super().process(request)
+
+
+def connect(sim, path):
+    """
+    Connect to simulator served over pseudo terminal, query RPM and
+    return capabilities of the device.
+    """
+    async def test(name):
+        elm = ELM327(name, 38400, capability_path=path)
+        try:
+            await elm.connect()
+            lines = await elm.submit(b'010C')
+            assert elm.parse(b'010C', lines) is not None
+            return elm.capabilities
+        finally:
+            elm.close()
+
+    return run_device(sim, test)
+
+
+def test_version_number():
+    """
+    Test converting version of ELM327 device into tuple.
+    """
+    assert version_number('1.4b') == (1, 4)
+    assert version_number('1.10') > version_number('1.3')
+    assert version_number(None) == (0, 0)
+
+
+def test_from_version():
+    """
+    Test guessing capabilities of ELM327 device from its version.
+    """
+    caps = Capabilities.from_version('1.4b')
+    assert caps.spaces_off and caps.response_count and caps.multi_pid
+    assert not caps.adaptive_timing
+
+    caps = Capabilities.from_version('1.2')
+    assert not caps.spaces_off and not caps.response_count
+
+
+def test_probe(tmp_path):
+    """
+    Test probing ELM327 device once and using saved capabilities.
+    """
+    path = str(tmp_path / 'capabilities.json')
+    sim = Recorder()
+
+    caps = connect(sim, path)
+    assert caps.spaces_off
+    assert caps.response_count
+    assert caps.multi_pid
+    assert caps.adaptive_timing
+    assert caps.latency is not None
+    assert b'010020' in sim.requests
+
+    caps = connect(sim, path)
+    assert caps.adaptive_timing
+    assert b'010020' not in sim.requests
+    assert b'ATAT2' in sim.requests
+    assert b'010C1' in sim.requests
+
+
+def test_probe_clone(tmp_path):
+    """
+    Test probing ELM327 clone not supporting all features.
+    """
+    path = str(tmp_path / 'capabilities.json')
+    sim = Clone()
+
+    caps = connect(sim, path)
+    assert not caps.spaces_off
+    assert not caps.response_count
+    assert caps.multi_pid
+
+    # the requests are sent without response count suffix
+    assert sim.requests[-1] == b'010C'
+
+    caps = connect(sim, path)
+    assert not caps.response_count
+    assert b'ATS0' not in sim.requests
+    assert sim.requests[-1] == b'010C'
+
+    store = CapabilityStore(path)
+    items = store._load()
+    assert len(items) == 1
+    key, = items
+    assert 'ELM327 v1.4' in key
+    assert 'OBDII to RS232 Interpreter' in key
+
+# vim: sw=4:et:ai
@@ -0,0 +1,133 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Tests for binary capture format.
+"""
+
+from aobd.capture import CaptureReader, CaptureWriter, SENT, RECEIVED, \
+    INDEX_INTERVAL, exchanges, is_capture
+
+
+def write_capture(f, n):
+    """
+    Write capture with a request and response every 0.25s.
+    """
+    writer = CaptureWriter(f, wall=10 ** 18, monotonic=0)
+    for i in range(n):
+        ts = i * INDEX_INTERVAL // 4
+        writer.write(SENT, ts, b'010C\r')
+        writer.write(RECEIVED, ts + 1000, b'41 0C %02X 00\r\r>' % i)
+    return writer
+
+
+def test_capture(tmp_path):
+    """
+    Test writing and reading capture file.
+    """
+    fn = tmp_path / 'test.cap'
+    with open(fn, 'wb') as f:
+        write_capture(f, 10).finish()
+
+    assert is_capture(fn)
+    with CaptureReader(fn) as reader:
+        events = [(d, ts, bytes(v)) for d, ts, v in reader]
+        assert len(reader._times) == 3
+        assert reader.wall_time(INDEX_INTERVAL) == 1e9 + 1
+
+    assert len(events) == 20
+    assert events[0] == (SENT, 0, b'010C\r')
+    assert events[-1] == (RECEIVED, 9 * INDEX_INTERVAL // 4 + 1000,
+        b'41 0C 09 00\r\r>')
+
+
+def test_capture_seek(tmp_path):
+    """
+    Test reading events of capture file in time range.
+    """
+    fn = tmp_path / 'test.cap'
+    with open(fn, 'wb') as f:
+        write_capture(f, 10).finish()
+
+    start = 5 * INDEX_INTERVAL // 4
+    end = 7 * INDEX_INTERVAL // 4
+    with CaptureReader(fn) as reader:
+        events = [ts for _, ts, _ in reader.events(start, end)]
+    assert events == [start, start + 1000, end - INDEX_INTERVAL // 4,
+        end - INDEX_INTERVAL // 4 + 1000]
+
+
+def test_capture_no_index(tmp_path):
+    """
+    Test reading capture file, which was not closed.
+    """
+    fn = tmp_path / 'test.cap'
+    with open(fn, 'wb') as f:
+        write_capture(f, 10)
+        f.write(b'\x00\x00') # incomplete record
+
+    with CaptureReader(fn) as reader:
+        events = [ts for _, ts, _ in reader.events(INDEX_INTERVAL)]
+        assert len(reader._times) == 3
+    assert len(events) == 12
+
+
+def test_exchanges():
+    """
+    Test grouping events into requests and responses.
+    """
+    events = [
+        (RECEIVED, 1, b'garbage'),
+        (SENT, 2, b'ATZ\r'),
+        (RECEIVED, 3, b'\r\rELM327'),
+        (RECEIVED, 4, b' v1.4\r\r>'),
+        (SENT, 5, b'010C\r'),
+        (SENT, 6, b'010D\r'),
+        (RECEIVED, 7, b'41 0D 00\r\r>'),
+    ]
+    assert list(exchanges(events)) == [
+        (2, b'ATZ\r', 4, b'\r\rELM327 v1.4\r\r>'),
+        (5, b'010C\r', 5, b''),
+        (6, b'010D\r', 7, b'41 0D 00\r\r>'),
+    ]
+
+
+def test_exchanges_pipelined():
+    """
+    Test splitting commands written at once into requests.
+    """
+    events = [
+        (SENT, 1, b'ATH1\rATL0\rATDPN\r'),
+        (RECEIVED, 2, b'OK\r\r>OK'),
+        (RECEIVED, 3, b'\r\r>'),
+        (RECEIVED, 4, b'6\r\r>'),
+        (SENT, 5, b'0100\r010C\r'),
+        (RECEIVED, 6, b'41 00 00\r\r>'),
+        (SENT, 7, b'010D\r'),
+    ]
+    assert list(exchanges(events)) == [
+        (1, b'ATH1\r', 2, b'OK\r\r>'),
+        (2, b'ATL0\r', 3, b'OK\r\r>'),
+        (3, b'ATDPN\r', 4, b'6\r\r>'),
+        (5, b'0100\r', 6, b'41 00 00\r\r>'),
+        (6, b'010C\r', 6, b''),
+        (7, b'010D\r', 7, b''),
+    ]
+
+# vim: sw=4:et:ai
@@ -24,7 +24,7 @@
 
 
 import aobd
-from aobd.decoders import pid
+from aobd.decoders import pid, Linear
 
 
 def test_list_integrity():
@@ -105,3 +105,11 @@ def test_pid_getters():
         for cmd in cmds:
             if cmd.decode == pid:
                 assert cmd in pid_getters
+
+
+def test_linear_decoders():
+    # declarative decoders read data within the response
+    for cmds in aobd.COMMANDS._modes:
+        for cmd in cmds:
+            if isinstance(cmd.decode, Linear):
+                assert 0 <= cmd.decode.start < cmd.decode.end <= cmd.bytes, cmd.name
@@ -1,3 +1,5 @@
+import pytest
+import aobd
 
 from aobd.utils import Unit
 import aobd.decoders as d
@@ -162,3 +164,81 @@ def test_dtc():
 	assert d.dtc("000001040000") == ([
 		("P0104", "Mass or Volume Air Flow Circuit Intermittent"),
 	], Unit.NONE)
+
+def test_bytes():
+	assert d.rpm(b'\x1a\xf8')                == (1726.0, Unit.RPM)
+	assert d.rpm(memoryview(b'\xff\xff'))    == (16383.75, Unit.RPM)
+	assert d.percent(b'\xff')                == (100.0, Unit.PERCENT)
+	assert d.temp(b'\x00')                   == (-40, Unit.C)
+	assert d.noop(b'\x0a\xbc')               == ('0ABC', Unit.NONE)
+	assert d.pid(b'\xf0\x0a')                == ('1111000000001010', Unit.NONE)
+	assert d.current_centered(b'\xab\xcd\x80\x00') == (0.0, Unit.MA)
+	assert d.dtc(b'\x01\x04\x80\x03\x41\x23\x00') == ([
+		("P0104", "Mass or Volume Air Flow Circuit Intermittent"),
+		("B0003", "Unknown error code"),
+		("C0123", "Unknown error code"),
+	], Unit.NONE)
+
+def test_status():
+	v, unit = d.status(b'\x81\x07\x65\x04')
+	assert v.MIL
+	assert v.DTC_count == 1
+	assert v.ignition_type == 'Spark'
+	assert str(v.tests[0]) == 'Test Misfire: Available, Complete'
+
+def test_hex_decoder():
+	decoder = d.hex_decoder(lambda _hex: (int(_hex, 16), Unit.NONE))
+	assert decoder(b'\x01\x00') == (256, Unit.NONE)
+
+def test_linear():
+	rpm = d.Linear(0, 2, Unit.RPM, divisor=4.0)
+	assert rpm(b'\x1a\xf8')         == (1726.0, Unit.RPM)
+	assert rpm(b'\xff\xff')         == (16383.75, Unit.RPM)
+
+	temp = d.Linear(0, 1, Unit.C, offset=-40)
+	assert temp(b'\x00\xff')        == (-40, Unit.C) # second byte is unused
+
+	current = d.Linear(2, 4, Unit.MA, divisor=256.0, offset=-128)
+	assert current(b'\xab\xcd\x80\x00') == (0.0, Unit.MA)
+
+	assert rpm.decode_batch([b'\x00\x04', b'\x00\x08']) == [1.0, 2.0]
+
+def test_linear_truncated():
+	rpm = d.Linear(0, 2, Unit.RPM, divisor=4.0)
+	assert rpm(b'\x1a')             == (6.5, Unit.RPM)
+	assert rpm(b'')                 == (0.0, Unit.RPM)
+
+	current = d.Linear(2, 4, Unit.MA, divisor=256.0, offset=-128)
+	assert current(b'\xab\xcd\x80') == (-127.5, Unit.MA)
+
+def test_linear_signed():
+	v = d.Linear(0, 2, Unit.PA, divisor=4.0, signed=True)
+	assert v(b'\xff\xfc')           == (-1.0, Unit.PA)
+	assert v(b'\x7f\xff')           == (8191.75, Unit.PA)
+
+	v = d.Linear(0, 1, Unit.PERCENT, signed=True)
+	assert v(b'\x80')               == (-128, Unit.PERCENT)
+
+	# no lookup table for 4 bytes integers
+	v = d.Linear(0, 4, Unit.NONE, signed=True)
+	assert v(b'\xff\xff\xff\xfe')   == (-2, Unit.NONE)
+
+def test_decode_array():
+	np = pytest.importorskip('numpy')
+	data = np.array([[0x1a, 0xf8], [0xff, 0xff]], dtype=np.uint8)
+	values, unit = d.decode_array(aobd.COMMANDS.RPM, data)
+	assert values.tolist() == [1726.0, 16383.75]
+	assert unit == Unit.RPM
+
+	# variable length layout
+	data = np.frombuffer(b'\x1a\xf8\x00\xff\xff', dtype=np.uint8)
+	values, unit = d.decode_array(aobd.COMMANDS.RPM, data, [0, 3, 5])
+	assert values.tolist() == [1726.0, 16383.75]
+
+def test_decode_array_scalar():
+	np = pytest.importorskip('numpy')
+	data = np.frombuffer(b'\x01\x04\x80\x03\x01\x04', dtype=np.uint8)
+	values, unit = d.decode_array(aobd.COMMANDS.GET_DTC, data, [0, 4, 6])
+	assert len(values) == 2
+	assert values[1] == [("P0104", "Mass or Volume Air Flow Circuit Intermittent")]
+	assert unit == Unit.NONE
@@ -0,0 +1,492 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# Copyright 2004 Donour Sizemore (donour@uchicago.edu)
+# Copyright 2009 Secons Ltd. (www.obdtester.com)
+# Copyright 2009 Peter J. Creath
+# Copyright 2015 Brendan Whitfield (bcw7044@rit.edu)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+"""
+Tests for ELM327 adapter communication.
+"""
+
+import asyncio
+
+import pytest
+
+from aobd.elm327 import ELM327, OBDError, ResponseBuffer, find_primary_ecu, \
+    is_response, PRIORITY_HIGH, PRIORITY_LOW
+from aobd.profile import Profile
+from aobd.protocols import ISO_15765_4_11bit_500k, SAE_J1850_PWM
+from aobd.sim import ECU, Simulator
+from aobd.transport import MemoryTransport
+
+from . import Recorder
+
+
+def feed(buffer, data):
+    """
+    Write data into response buffer as read from a device.
+    """
+    view = buffer.get_buffer(len(data))
+    view[:len(data)] = data
+    buffer.buffer_updated(len(data))
+
+
+class Device:
+    """
+    Fake device processing requests when told so by a test.
+    """
+    def __init__(self):
+        self.requests = []
+        self.responses = []
+
+    def transfer(self, request):
+        task = asyncio.get_running_loop().create_future()
+        self.requests.append(request)
+        self.responses.append(task)
+        return task
+
+    async def respond(self, *lines):
+        self.responses.pop(0).set_result(list(lines))
+        await asyncio.sleep(0)
+
+
+def run_scheduler(test):
+    """
+    Run scheduler test with ELM327 instance using fake device.
+    """
+    async def run():
+        # device without response count suffix, the requests are sent as
+        # they are
+        elm = ELM327(MemoryTransport(Simulator(version='1.2')), 38400)
+        await elm.connect()
+        device = Device()
+        elm._transfer = device.transfer
+        try:
+            await test(elm, device)
+        finally:
+            elm.close()
+    asyncio.run(run())
+
+
+def connect(sim, profile=None, fast=True):
+    """
+    Connect to simulator and return requests received by it.
+    """
+    async def run():
+        # close the transport only, the device keeps its state for next
+        # connection
+        transport = MemoryTransport(sim)
+        elm = ELM327(transport, 38400)
+        try:
+            await elm.connect(profile, fast)
+            requests = list(sim.requests)
+            assert elm.connected
+            assert (await elm.query(b'010C')) is not None
+            return requests, elm.profiled
+        finally:
+            transport.close()
+
+    sim.requests.clear()
+    return asyncio.run(run())
+
+
+def connected(test, **kw):
+    """
+    Run test with ELM327 instance connected to simulator.
+    """
+    async def run():
+        elm = ELM327(MemoryTransport(Simulator(**kw)), 38400)
+        try:
+            await elm.connect()
+            test(elm)
+        finally:
+            elm.close()
+    asyncio.run(run())
+
+
+def test_find_primary_ecu():
+    """
+    Test choosing primary ECU from responses to `0100` request.
+    """
+    p = SAE_J1850_PWM()
+
+    # use primary ECU when multiple are present
+    m = p([b'486B104100BE1FB811AA', b'486B124100BE1FB811AA'])
+    assert find_primary_ecu(p, m) == 0x10
+
+    # use lone responses regardless
+    m = p([b'486B124100BE1FB811AA'])
+    assert find_primary_ecu(p, m) == 0x12
+
+    # if primary ECU is not listed, use response with most PIDs supported
+    m = p([b'486B124100BE1FB811AA', b'486B1441000000B811AA'])
+    assert find_primary_ecu(p, m) == 0x12
+
+    # if no messages were received, no ECU could be determined
+    assert find_primary_ecu(p, []) is None
+
+
+def test_scheduler_serial():
+    """
+    Test sending requests of concurrent callers one at a time.
+    """
+    async def test(elm, device):
+        t1 = elm.submit(b'010C')
+        t2 = elm.submit(b'010D')
+        assert device.requests == [b'010C\r']
+
+        await device.respond(b'7E804410C1AF8')
+        assert (await t1) == [b'7E804410C1AF8']
+        assert device.requests == [b'010C\r', b'010D\r']
+        assert not t2.done()
+
+        await device.respond(b'7E803410D00')
+        assert (await t2) == [b'7E803410D00']
+
+    run_scheduler(test)
+
+
+def test_scheduler_priority():
+    """
+    Test sending request of higher priority first.
+    """
+    async def test(elm, device):
+        t1 = elm.submit(b'010C', PRIORITY_LOW)
+        t2 = elm.submit(b'010D', PRIORITY_LOW)
+        t3 = elm.submit(b'0111', PRIORITY_LOW)
+        t4 = elm.submit(b'03', PRIORITY_HIGH)
+
+        for _ in range(4):
+            await device.respond()
+        await asyncio.gather(t1, t2, t3, t4)
+
+        assert device.requests == [b'010C\r', b'03\r', b'010D\r', b'0111\r']
+
+    run_scheduler(test)
+
+
+def test_scheduler_coalesce():
+    """
+    Test sharing response of identical requests.
+    """
+    async def test(elm, device):
+        t1 = elm.submit(b'010C')
+        t2 = elm.submit(b'010D', PRIORITY_LOW)
+        t3 = elm.submit(b'010C')
+        t4 = elm.submit(b'010D', PRIORITY_LOW)
+        t5 = elm.submit(b'010D', PRIORITY_HIGH)
+
+        await device.respond(b'7E804410C1AF8')
+        await device.respond(b'7E803410D00')
+        r = await asyncio.gather(t1, t2, t3, t4, t5)
+
+        assert device.requests == [b'010C\r', b'010D\r']
+        assert r[0] == r[2] == [b'7E804410C1AF8']
+        assert r[1] == r[3] == r[4] == [b'7E803410D00']
+
+    run_scheduler(test)
+
+
+def test_scheduler_cancel():
+    """
+    Test cancelling a caller does not cancel request of other callers.
+    """
+    async def test(elm, device):
+        t1 = asyncio.ensure_future(elm.submit(b'010C'))
+        t2 = elm.submit(b'010C')
+        await asyncio.sleep(0)
+        t1.cancel()
+
+        await device.respond(b'7E804410C1AF8')
+        assert (await t2) == [b'7E804410C1AF8']
+
+    run_scheduler(test)
+
+
+def test_response_buffer():
+    """
+    Test receiving response split into fragments.
+    """
+    async def check():
+        buffer = ResponseBuffer(asyncio.get_running_loop())
+        task = buffer.wait()
+
+        feed(buffer, b'A')
+        feed(buffer, b'TZ\r')
+        assert not task.done()
+
+        feed(buffer, b'\rELM327 v1.4\r\r>')
+        assert task.done()
+        assert bytes(task.result()) == b'ATZ\r\rELM327 v1.4\r\r'
+
+    asyncio.run(check())
+
+
+def test_response_buffer_multiple():
+    """
+    Test receiving multiple responses at once.
+    """
+    async def check():
+        buffer = ResponseBuffer(asyncio.get_running_loop())
+        feed(buffer, b'OK\r\r>41 0C\r\r>')
+
+        r1 = await buffer.wait()
+        r2 = await buffer.wait()
+        assert bytes(r1) == b'OK\r\r'
+        assert bytes(r2) == b'41 0C\r\r'
+
+    asyncio.run(check())
+
+
+def test_response_buffer_compact():
+    """
+    Test that response data stays valid when buffer is reallocated.
+    """
+    async def check():
+        buffer = ResponseBuffer(asyncio.get_running_loop(), size=2048)
+
+        responses = []
+        for i in range(100):
+            task = buffer.wait()
+            feed(buffer, b'%04d\r>' % i)
+            responses.append(task.result())
+
+        assert [bytes(r) for r in responses] \
+            == [b'%04d\r' % i for i in range(100)]
+
+    asyncio.run(check())
+
+
+def test_response_buffer_reset():
+    """
+    Test discarding data received before a request.
+    """
+    async def check():
+        buffer = ResponseBuffer(asyncio.get_running_loop())
+        feed(buffer, b'STOPPED\r')
+        buffer.reset()
+
+        task = buffer.wait()
+        feed(buffer, b'OK\r>')
+        assert bytes(task.result()) == b'OK\r'
+
+    asyncio.run(check())
+
+
+def test_response_buffer_connection_lost():
+    """
+    Test failing waiting for responses on lost connection.
+    """
+    async def check():
+        buffer = ResponseBuffer(asyncio.get_running_loop())
+        task = buffer.wait()
+        buffer.connection_lost(None)
+
+        with pytest.raises(OBDError):
+            await task
+
+        with pytest.raises(OBDError):
+            await buffer.wait()
+
+    asyncio.run(check())
+
+
+def test_is_response():
+    """
+    Test matching response message to request.
+    """
+    p = ISO_15765_4_11bit_500k()
+    msg, = p([b'7E804410C1AF8'])
+    assert is_response(b'010C', msg)
+    assert is_response(b'010C0D', msg)
+    assert not is_response(b'010D', msg)
+    assert not is_response(b'020C', msg)
+
+    msg, = p([b'7E8024300'])
+    assert is_response(b'03', msg)
+    assert not is_response(b'07', msg)
+
+
+def test_request_response_count():
+    """
+    Test appending number of ECUs to single PID mode 01 requests.
+    """
+    def test(elm):
+        assert elm._n_ecus == 2
+        assert elm._request(b'010C') == b'010C2\r'
+        assert elm._request(b'010C0D') == b'010C0D\r'
+        assert elm._request(b'03') == b'03\r'
+
+        # multi-PID request learns number of frames of its response
+        elm.parse(b'010C0D', [b'7E8 06 41 0C 1A F8 0D 32', b'7E9 03 41 0D 32'])
+        assert elm._request(b'010C0D') == b'010C0D2\r'
+
+    connected(test, ecus=[ECU(), ECU(pids={0x0D})])
+
+
+def test_request_short_response():
+    """
+    Test keeping number of responses on short response.
+    """
+    def test(elm):
+        assert elm._request(b'010D') == b'010D2\r'
+
+        # the device returned response of primary ECU only
+        msg = elm.parse(b'010D', [b'7E8 03 41 0D 32'])
+        assert msg is not None
+        assert elm._request(b'010D') == b'010D2\r'
+
+    connected(test, ecus=[ECU(), ECU()])
+
+
+def test_request_missing_response():
+    """
+    Test learning number of responses again, when response of primary ECU
+    is missing.
+    """
+    def test(elm):
+        elm._responses[b'010D'] = 1
+        elm._requests.clear()
+        assert elm._request(b'010D') == b'010D1\r'
+
+        # other ECU answered first
+        msg = elm.parse(b'010D', [b'7E9 03 41 0D 32'])
+        assert msg is None
+        assert elm._request(b'010D') == b'010D\r'
+
+        # all responses received without the number
+        msg = elm.parse(b'010D', [b'7E9 03 41 0D 32', b'7E8 03 41 0D 32'])
+        assert msg is not None
+        assert elm._request(b'010D') == b'010D2\r'
+
+    connected(test, ecus=[ECU(), ECU()])
+
+
+def test_probe_queries():
+    """
+    Test probing device while queries are processed.
+    """
+    async def run():
+        elm = ELM327(MemoryTransport(Simulator(latency=0.001)), 38400)
+        try:
+            await elm.connect()
+            cmds = [b'010C', b'010D', b'0105', b'0111']
+            tasks = [asyncio.ensure_future(elm.query(c)) for c in cmds]
+            await asyncio.sleep(0)
+            caps = await elm.probe()
+            return caps, await asyncio.gather(*tasks)
+        finally:
+            elm.close()
+
+    caps, result = asyncio.run(run())
+    assert caps.spaces_off
+    assert all(m is not None for m in result)
+
+
+def test_close_reset():
+    """
+    Test closing transport when reset command is written.
+    """
+    class Slow(MemoryTransport):
+        slow = False
+        closed = False
+
+        def write(self, data):
+            if not self.slow:
+                return super().write(data)
+            task = self._loop.create_future()
+            self.writes.append((data, task))
+            return task
+
+        def close(self):
+            self.closed = True
+            super().close()
+
+    async def run():
+        transport = Slow(Simulator())
+        elm = ELM327(transport, 38400)
+        await elm.connect()
+
+        transport.slow = True
+        transport.writes = []
+        elm.close()
+
+        (data, task), = transport.writes
+        assert data == b'ATZ\r'
+        assert not transport.closed
+
+        task.set_result(None)
+        await asyncio.sleep(0)
+        assert transport.closed
+
+    asyncio.run(run())
+
+
+def test_fast_connect():
+    """
+    Test fast connection to device in its default state.
+    """
+    requests, _ = connect(Recorder())
+    assert requests == [
+        b'ATI', b'ATE0', b'ATS0', b'ATH1', b'ATL0', b'ATSPA8', b'0100',
+        b'ATDPN',
+    ]
+
+
+def test_fast_connect_warm_start():
+    """
+    Test fast connection to device set up by previous connection.
+    """
+    sim = Recorder()
+    connect(sim)
+    requests, _ = connect(sim)
+    assert requests[:6] == [b'ATI', b'ATWS', b'ATE0', b'ATS0', b'ATH1', b'ATL0']
+
+
+def test_fast_connect_keep_protocol():
+    """
+    Test fast connection keeping protocol of session profile.
+    """
+    sim = Recorder()
+    profile = Profile('1.4', '6', 0, 1)
+    connect(sim, profile)
+    requests, profiled = connect(sim, profile)
+    assert requests == [b'ATI', b'ATS0', b'ATH1', b'ATL0', b'ATDPN']
+    assert profiled
+
+
+def test_fast_connect_fallback():
+    """
+    Test full connection when device state cannot be probed.
+    """
+    class Clone(Recorder):
+        def process(self, request):
+            if request == b'ATI':
+                self.requests.append(request)
+                return b'?\r\r>'
+            return super().process(request)
+
+    requests, _ = connect(Clone())
+    assert requests[:3] == [b'ATI', b'ATZ', b'ATS0']
+    assert b'ATSPA8' in requests
+
+# vim: sw=4:et:ai
@@ -0,0 +1,138 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Tests for offline parser of ELM327 debug logs and capture files.
+"""
+
+import asyncio
+import datetime
+import io
+import os.path
+import pytest
+
+from aobd import COMMANDS, OBD
+from aobd.capture import CaptureWriter, SENT, RECEIVED
+from aobd.logparse import read_log, parse
+from aobd.sim import PtyDevice, Simulator
+from aobd.transport import MemoryTransport
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'data')
+
+LOG = """\
+host:2015-12-27 16:41:20,098:INFO:aobd.elm327:1401:version detected: 1.4
+host:2015-12-27 16:41:20,098:DEBUG:aobd.elm327:1401:sending: b'ATS0\\r\\n'
+host:2015-12-27 16:41:20,098:DEBUG:aobd.elm327:1401:data sent
+host:2015-12-27 16:41:20,135:DEBUG:aobd.elm327:1401:received: b'AT'
+host:2015-12-27 16:42:01,5:DEBUG:aobd.transport:1401:received: b"'\\x00>"
+"""
+
+
+def test_read_log():
+    """
+    Test reading events of ELM327 debug log.
+    """
+    t = datetime.datetime(2015, 12, 27, 16).timestamp()
+    events = list(read_log(io.StringIO(LOG)))
+    assert [(d, v) for d, _, v in events] == [
+        (SENT, b'ATS0\r\n'), (RECEIVED, b'AT'), (RECEIVED, b'\'\x00>'),
+    ]
+    assert [ts for _, ts, _ in events] \
+        == pytest.approx([t + 2480.098, t + 2480.135, t + 2521.5])
+
+
+def test_parse_log():
+    """
+    Test parsing ELM327 debug log into columns of values.
+    """
+    columns = parse(os.path.join(DATA_DIR, 'read-rpm-throttle-pos-speed.log'))
+
+    assert set(columns) == {'PIDS_A', 'RPM', 'THROTTLE_POS', 'SPEED'}
+    rpm = columns['RPM']
+    assert rpm.unit == 'RPM'
+    assert list(rpm.value[:4]) == [752, 756, 753.5, 1356.25]
+    assert len(rpm.time) == len(rpm.value) == 7
+    assert all(rpm.time[1:] > rpm.time[:-1])
+
+
+def test_parse_capture(tmp_path):
+    """
+    Test parsing capture file with multi-PID requests.
+    """
+    fn = str(tmp_path / 'test.cap')
+    async def run():
+        dev = OBD(MemoryTransport(Simulator()))
+        dev.trace.capture = CaptureWriter(open(fn, 'wb'))
+        await dev.connect()
+
+        values = []
+        for _ in range(3):
+            commands = [COMMANDS.RPM, COMMANDS.SPEED, COMMANDS.COOLANT_TEMP]
+            async for r in dev.query(commands):
+                values.append(r.value)
+        dev.close()
+        dev.trace.capture.close()
+        return values
+
+    values = asyncio.run(run())
+    columns = parse(fn)
+    assert list(columns['RPM'].value) == values[::3]
+    assert list(columns['SPEED'].value) == values[1::3]
+    assert list(columns['COOLANT_TEMP'].value) == values[2::3]
+
+
+@pytest.mark.parametrize('fast', [False, True])
+def test_parse_capture_profile(tmp_path, fast):
+    """
+    Test parsing capture file of connection with session profile.
+    """
+    fn = str(tmp_path / 'test.cap')
+    path = str(tmp_path / 'profiles.json')
+    sim = Simulator()
+    async def run():
+        device = PtyDevice(sim)
+        try:
+            # discover the vehicle and save its profile
+            dev = OBD(device.name, profile_path=path)
+            await dev.connect()
+            dev.close()
+            await asyncio.sleep(0.1)
+
+            # the device is set up by the previous connection
+            sim(b'ATE0')
+            sim(b'ATSP6')
+
+            dev = OBD(device.name, profile_path=path, fast_connect=fast)
+            dev.trace.capture = CaptureWriter(open(fn, 'wb'))
+            await dev.connect()
+            assert dev.port.profiled
+            await dev._verify_task
+
+            values = [(await dev.query(COMMANDS.RPM)).value for _ in range(3)]
+            dev.close()
+            dev.trace.capture.close()
+            return values
+        finally:
+            device.close()
+
+    values = asyncio.run(run())
+    columns = parse(fn)
+    assert list(columns['RPM'].value) == values
+
+# vim: sw=4:et:ai
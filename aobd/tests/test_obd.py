@@ -0,0 +1,243 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# Copyright 2004 Donour Sizemore (donour@uchicago.edu)
+# Copyright 2009 Secons Ltd. (www.obdtester.com)
+# Copyright 2009 Peter J. Creath
+# Copyright 2015 Brendan Whitfield (bcw7044@rit.edu)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+"""
+Tests for OBD-II API.
+"""
+
+import asyncio
+
+from aobd import COMMANDS, OBD, OBDCommand
+from aobd.decoders import noop
+from aobd.obd import OBDIterator, pack_commands, split_message
+from aobd.protocols import ISO_15765_4_11bit_500k, SAE_J1850_PWM
+from aobd.protocols.protocol_can import CANProtocol
+from aobd.transport import MemoryTransport
+
+
+class Port:
+    """
+    Fake ELM327 port returning messages parsed from predefined lines.
+    """
+    def __init__(self, protocol, lines):
+        self.protocol = protocol
+        self.multi_pid = isinstance(protocol, CANProtocol)
+        self.lines = lines
+        self.sent = []
+        self.events = []
+
+    def submit(self, cmd, priority=None):
+        self.sent.append(cmd)
+        self.events.append(('submit', cmd))
+        return self._receive(cmd)
+
+    async def _receive(self, cmd):
+        return self.lines[cmd]
+
+    def parse(self, cmd, lines):
+        self.events.append(('parse', cmd))
+        messages = self.protocol(lines)
+        return messages[0] if messages else None
+
+
+class Adapter:
+    """
+    In-memory ELM327 device answering requests with predefined responses.
+
+    The expected response count suffix is removed from mode 01 requests.
+    """
+    RESPONSES = {
+        b'ATZ': b'\r\rELM327 v1.4',
+        b'ATS0': b'ATS0\rOK',
+        b'ATE0': b'ATE0\rOK',
+        b'ATH1': b'OK',
+        b'ATL0': b'OK',
+        b'ATSPA8': b'OK',
+        b'0100': b'SEARCHING...\r486B104100BE1FB810AA',
+        b'ATDPN': b'A1',
+    }
+    def __init__(self, responses):
+        self.responses = dict(self.RESPONSES)
+        self.responses.update(responses)
+        self.requests = []
+
+    def __call__(self, request):
+        self.requests.append(request)
+        if request.startswith(b'01'):
+            request = request[:4]
+        return self.responses.get(request, b'NO DATA') + b'\r\r>'
+
+
+def read_all(iterator):
+    async def read():
+        return [r async for r in iterator]
+    return asyncio.run(read())
+
+
+def test_pack_commands():
+    """
+    Test packing mode 01 commands into multi-PID requests.
+    """
+    cmds = [
+        COMMANDS.RPM, COMMANDS.SPEED, COMMANDS.GET_DTC,
+        COMMANDS.THROTTLE_POS,
+    ] + [COMMANDS.COOLANT_TEMP] * 7
+
+    result = list(pack_commands(cmds))
+    assert [len(b) for b in result] == [2, 1, 6, 2]
+    assert result[0] == (COMMANDS.RPM, COMMANDS.SPEED)
+    assert result[1] == (COMMANDS.GET_DTC,)
+    assert result[2][0] == COMMANDS.THROTTLE_POS
+    assert result[3] == (COMMANDS.COOLANT_TEMP,) * 2
+
+
+def test_split_message():
+    """
+    Test splitting multi-frame response of multi-PID request.
+    """
+    p = ISO_15765_4_11bit_500k()
+    msg, = p([
+        b'7E81008410C1AF80D00',
+        b'7E82111220000000000',
+    ])
+    cmds = (COMMANDS.RPM, COMMANDS.SPEED, COMMANDS.THROTTLE_POS)
+    m1, m2, m3 = split_message(cmds, msg)
+
+    assert m1.pid == 0x0C and m1.data_bytes == b'\x1a\xf8'
+    assert m2.pid == 0x0D and m2.data_bytes == b'\x00'
+    assert m3.pid == 0x11 and m3.data_bytes == b'\x22'
+
+
+def test_split_message_missing():
+    """
+    Test splitting multi-PID response without data for some PIDs.
+    """
+    p = ISO_15765_4_11bit_500k()
+    msg, = p([b'7E805410C1AF80D'])
+    cmds = (COMMANDS.SPEED, COMMANDS.RPM, COMMANDS.THROTTLE_POS)
+    m1, m2, m3 = split_message(cmds, msg)
+
+    assert m1 is None
+    assert m2.data_bytes == b'\x1a\xf8'
+    assert m3 is None
+
+
+def test_iterator_multi_pid():
+    """
+    Test querying CAN vehicle with multi-PID request.
+    """
+    port = Port(ISO_15765_4_11bit_500k(), {
+        b'010C0D11': [b'7E81008410C1AF80D00', b'7E82111220000000000'],
+        b'03': [b'7E8024300'],
+    })
+    cmds = [COMMANDS.RPM, COMMANDS.SPEED, COMMANDS.THROTTLE_POS, COMMANDS.GET_DTC]
+    result = read_all(OBDIterator(port, cmds))
+
+    assert port.sent == [b'010C0D11', b'03']
+    assert [r.command for r in result] == cmds
+    assert result[0].value == 1726.0
+    assert result[1].value == 0
+    assert result[3].value == []
+
+
+def test_iterator_legacy():
+    """
+    Test querying legacy vehicle with single PID requests.
+    """
+    port = Port(SAE_J1850_PWM(), {
+        b'010C': [b'486B10410C1AF810'],
+        b'010D': [b'486B10410D0010'],
+    })
+    cmds = [COMMANDS.RPM, COMMANDS.SPEED]
+    result = read_all(OBDIterator(port, cmds))
+
+    assert port.sent == [b'010C', b'010D']
+    assert [r.value for r in result] == [1726.0, 0]
+
+
+def test_iterator_pipeline():
+    """
+    Test sending next request before parsing current response.
+    """
+    port = Port(SAE_J1850_PWM(), {
+        b'010C': [b'486B10410C1AF810'],
+        b'010D': [b'486B10410D0010'],
+        b'0111': [b'486B1041112210'],
+    })
+    cmds = [COMMANDS.RPM, COMMANDS.SPEED, COMMANDS.THROTTLE_POS]
+    read_all(OBDIterator(port, cmds))
+
+    assert port.events == [
+        ('submit', b'010C'),
+        ('submit', b'010D'),
+        ('parse', b'010C'),
+        ('submit', b'0111'),
+        ('parse', b'010D'),
+        ('parse', b'0111'),
+    ]
+
+def test_query():
+    """
+    Test querying vehicle over in-memory transport.
+    """
+    cmd = OBDCommand('TEST', 'Test command', b'01', b'23', 2, noop)
+    cases = [
+        # a correct command transaction
+        ([b'486B10412312AB10'], '12AB'),
+        # response of greater length
+        ([b'486B10412312ABEF10'], '12AB'),
+        # response of lesser length
+        ([b'486B1041231210'], '12'),
+        # NO DATA response
+        ([b'NO DATA'], None),
+        # malformed response
+        ([b'totaly not hex!@#$'], None),
+        # no response
+        ([], None),
+        # reject responses from other ECUs
+        ([b'486B12412312AB10'], None),
+        # filter for primary ECU
+        ([b'486B12412312AB10', b'486B10412312AB10'], '12AB'),
+    ]
+
+    async def run(adapter):
+        dev = OBD(MemoryTransport(adapter))
+        await dev.connect()
+        result = []
+        for lines, _ in cases:
+            adapter.responses[b'0123'] = b'\r'.join(lines)
+            r = await dev.query(cmd)
+            result.append(r.value)
+        dev.close()
+        return result
+
+    adapter = Adapter({})
+    result = asyncio.run(run(adapter))
+
+    assert result == [v for _, v in cases]
+    assert adapter.requests[-2].startswith(b'0123')
+    assert adapter.requests[-1] == b'ATZ'
+
+# vim: sw=4:et:ai
@@ -0,0 +1,104 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# Copyright 2004 Donour Sizemore (donour@uchicago.edu)
+# Copyright 2009 Secons Ltd. (www.obdtester.com)
+# Copyright 2009 Peter J. Creath
+# Copyright 2015 Brendan Whitfield (bcw7044@rit.edu)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Tests for OBD command.
+"""
+
+from aobd.decoders import noop
+from aobd.obdcmd import OBDCommand
+from aobd.protocols import SAE_J1850_PWM
+
+
+def test_constructor():
+    """
+    Test creating OBD command.
+    """
+    cmd = OBDCommand('Test', 'example OBD command', b'01', b'23', 2, noop)
+    assert cmd.name == 'Test'
+    assert cmd.desc == 'example OBD command'
+    assert cmd.mode == b'01'
+    assert cmd.pid == b'23'
+    assert cmd.bytes == 2
+    assert cmd.decode == noop
+    assert not cmd.supported
+
+    cmd = OBDCommand('Test', 'example OBD command', b'01', b'23', 2, noop, True)
+    assert cmd.supported
+
+
+def test_clone():
+    """
+    Test cloning OBD command.
+    """
+    cmd = OBDCommand('', '', b'01', b'23', 2, noop)
+    other = cmd.clone()
+
+    assert cmd.name == other.name
+    assert cmd.desc == other.desc
+    assert cmd.mode == other.mode
+    assert cmd.pid == other.pid
+    assert cmd.bytes == other.bytes
+    assert cmd.decode == other.decode
+    assert cmd.supported == other.supported
+
+
+def test_call():
+    """
+    Test decoding message with OBD command.
+    """
+    p = SAE_J1850_PWM()
+    m, = p([b'48 6B 10 41 00 BE 1F B8 11 AA'])
+
+    cmd = OBDCommand('', '', b'01', b'00', 4, noop)
+    r = cmd(m)
+    assert r.command is cmd
+    assert r.value == 'BE1FB811'
+
+    # response too long (clip)
+    cmd = OBDCommand('', '', b'01', b'00', 3, noop)
+    assert cmd(m).value == 'BE1FB8'
+
+
+def test_get_command():
+    """
+    Test OBD command request.
+    """
+    cmd = OBDCommand('', '', b'01', b'23', 4, noop)
+    assert cmd.get_command() == b'0123'
+
+
+def test_get_mode_pid_int():
+    """
+    Test getting mode and PID of OBD command as integers.
+    """
+    cmd = OBDCommand('', '', b'01', b'23', 4, noop)
+    assert cmd.get_mode_int() == 0x01
+    assert cmd.get_pid_int() == 0x23
+
+    cmd = OBDCommand('', '', b'', b'', 4, noop)
+    assert cmd.get_mode_int() == 0
+    assert cmd.get_pid_int() == 0
+
+# vim: sw=4:et:ai
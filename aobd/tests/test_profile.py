@@ -0,0 +1,233 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Tests for session profiles of vehicles.
+"""
+
+import asyncio
+import logging
+
+import aobd.obd
+from aobd import COMMANDS, OBD
+from aobd.obd import verify_done
+from aobd.profile import Profile, ProfileStore
+
+from . import Recorder, run_device
+
+
+def connect(sim, path):
+    """
+    Connect to simulator served over pseudo terminal with session
+    profiles file.
+
+    The profile of the connection and name of the device are returned.
+    """
+    async def test(name):
+        dev = OBD(name, profile_path=path)
+        try:
+            await dev.connect()
+            if dev._verify_task is not None:
+                await dev._verify_task
+            r = await dev.query(COMMANDS.RPM)
+            assert r.value is not None
+            assert COMMANDS.RPM in dev.commands
+            return dev.profile, name
+        finally:
+            dev.close()
+
+    return run_device(sim, test)
+
+
+def test_store(tmp_path):
+    """
+    Test saving and loading session profile.
+    """
+    store = ProfileStore(str(tmp_path / 'aobd' / 'profiles.json'))
+    assert store.get('/dev/ttyUSB0') is None
+
+    profile = Profile('1.4', '6', 0, 1, {'PIDS_A': '1' * 32}, {'FUEL_TYPE': '01'})
+    store.save('/dev/ttyUSB0', profile)
+
+    p = store.get('/dev/ttyUSB0')
+    assert p.to_dict() == profile.to_dict()
+
+    store.remove('/dev/ttyUSB0')
+    assert store.get('/dev/ttyUSB0') is None
+
+
+def test_store_invalid(tmp_path):
+    """
+    Test ignoring unreadable session profiles file.
+    """
+    fn = tmp_path / 'profiles.json'
+    fn.write_text('{"/dev/ttyUSB0": ')
+
+    store = ProfileStore(str(fn))
+    assert store.get('/dev/ttyUSB0') is None
+
+
+def test_reconnect(tmp_path):
+    """
+    Test reconnecting to vehicle with session profile.
+    """
+    path = str(tmp_path / 'profiles.json')
+    sim = Recorder()
+
+    # discovery of the vehicle
+    profile, name = connect(sim, path)
+    assert b'ATSPA8' in sim.requests
+    assert profile.protocol == '6'
+    assert len(profile.pids['PIDS_A']) == 32
+    assert profile.static['FUEL_TYPE'] == '01'
+
+    # the profile is kept by device path, which is different for each
+    # pseudo terminal
+    store = ProfileStore(path)
+    p = store.get(name)
+    store.remove(name)
+
+    async def reconnect(name):
+        store.save(name, p)
+        dev = OBD(name, profile_path=path)
+        try:
+            await dev.connect()
+            requests = list(sim.requests)
+            await dev._verify_task
+            r = await dev.query(COMMANDS.FUEL_TYPE)
+            assert r.value == 'Gasoline'
+            assert r.command is COMMANDS.FUEL_TYPE
+            assert not [r for r in sim.requests if r.startswith(b'0151')]
+            return requests, dev.profile
+        finally:
+            dev.close()
+
+    requests, profile = run_device(sim, reconnect)
+    assert b'ATSP6' in requests
+    assert b'ATSPA8' not in requests
+    assert b'ATDPN' not in requests
+    assert not [r for r in requests if not r.startswith(b'AT')]
+    assert profile.to_dict() == p.to_dict()
+
+
+def test_reconnect_mismatch(tmp_path):
+    """
+    Test discovering vehicle not matching session profile.
+    """
+    path = str(tmp_path / 'profiles.json')
+    store = ProfileStore(path)
+    p = Profile('1.4', '6', 0, 1, {'PIDS_A': '0' * 32})
+
+    sim = Recorder(protocol='1')
+    async def run(name):
+        store.save(name, p)
+        dev = OBD(name, profile_path=path)
+        try:
+            await dev.connect()
+            assert dev.profile.to_dict() == p.to_dict()
+            await dev._verify_task
+            r = await dev.query(COMMANDS.RPM)
+            return r, dev.profile, store.get(name)
+        finally:
+            dev.close()
+
+    r, profile, saved = run_device(sim, run)
+    assert r.value is not None
+    assert profile.protocol == '1'
+    assert saved.protocol == '1'
+    assert b'ATSPA8' in sim.requests
+
+
+def test_reconnect_watch(tmp_path):
+    """
+    Test polling commands in background across reconnection after
+    verification of session profile.
+    """
+    path = str(tmp_path / 'profiles.json')
+    store = ProfileStore(path)
+    p = Profile('1.4', '6', 0, 1, {'PIDS_A': '0' * 32})
+
+    # polling request is processed by the device on reconnection
+    sim = Recorder(protocol='1', latency=0.01)
+    async def run(name):
+        store.save(name, p)
+        dev = OBD(name, profile_path=path)
+        responses = []
+        try:
+            await dev.connect()
+            dev.watch(COMMANDS.RPM, 20, responses.append)
+            await dev._verify_task
+            n = len(responses)
+            await asyncio.sleep(0.5)
+            task = dev._watcher._task
+            assert task is not None and not task.done()
+            return responses[n:]
+        finally:
+            dev.close()
+
+    responses = run_device(sim, run)
+    assert [r for r in responses if r.value is not None]
+
+
+def test_reconnect_no_data(tmp_path, monkeypatch):
+    """
+    Test keeping session profile when vehicle does not respond.
+    """
+    monkeypatch.setattr(aobd.obd, 'VERIFY_DELAY', 0)
+    path = str(tmp_path / 'profiles.json')
+    store = ProfileStore(path)
+    p = Profile('1.4', '6', 0, 1, {'PIDS_A': '0' * 32})
+
+    sim = Recorder(ecus=[])
+    async def run(name):
+        store.save(name, p)
+        dev = OBD(name, profile_path=path)
+        try:
+            await dev.connect()
+            await dev._verify_task
+            return dev.profile, store.get(name)
+        finally:
+            dev.close()
+
+    profile, saved = run_device(sim, run)
+    assert profile.to_dict() == p.to_dict()
+    assert saved.to_dict() == p.to_dict()
+    n = sum(1 for r in sim.requests if r.startswith(b'0100'))
+    assert n == aobd.obd.VERIFY_ATTEMPTS
+    assert b'ATSPA8' not in sim.requests
+
+
+def test_verify_done(caplog):
+    """
+    Test logging error of verification of session profile.
+    """
+    async def verify():
+        raise OSError('device unplugged')
+
+    async def run():
+        task = asyncio.ensure_future(verify())
+        task.add_done_callback(verify_done)
+        await asyncio.wait([task])
+
+    with caplog.at_level(logging.ERROR, logger='aobd.obd'):
+        asyncio.run(run())
+    assert 'verification of vehicle profile failed' in caplog.text
+    assert 'device unplugged' in caplog.text
+
+# vim: sw=4:et:ai
@@ -0,0 +1,255 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# Copyright 2004 Donour Sizemore (donour@uchicago.edu)
+# Copyright 2009 Secons Ltd. (www.obdtester.com)
+# Copyright 2009 Peter J. Creath
+# Copyright 2015 Brendan Whitfield (bcw7044@rit.edu)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+"""
+Tests for parsing of ELM327 responses into OBD-II messages.
+"""
+
+import random
+
+from aobd.protocols import *
+
+CAN_11_PROTOCOLS = [ISO_15765_4_11bit_500k, ISO_15765_4_11bit_250k]
+CAN_29_PROTOCOLS = [ISO_15765_4_29bit_500k, ISO_15765_4_29bit_250k, SAE_J1939]
+LEGACY_PROTOCOLS = [
+    SAE_J1850_PWM, SAE_J1850_VPW, ISO_9141_2, ISO_14230_4_5baud,
+    ISO_14230_4_fast,
+]
+
+
+def check_message(m, num_frames, tx_id, data_bytes):
+    """
+    Generic test for correct message values.
+    """
+    assert len(m.frames) == num_frames
+    assert m.tx_id == tx_id
+    assert m.data_bytes == bytes(data_bytes)
+
+
+def test_can_single_frame():
+    """
+    Test parsing single CAN frame.
+    """
+    for protocol in CAN_11_PROTOCOLS:
+        p = protocol()
+        r = p([b'7E8 06 41 00 00 01 02 03'])
+        assert len(r) == 1
+        check_message(r[0], 1, 0x0, range(4))
+        assert r[0].mode == 0x41
+        assert r[0].pid == 0x00
+
+        # no spaces, as with ATS0
+        r = p([b'7E806410000010203'])
+        check_message(r[0], 1, 0x0, range(4))
+
+    for protocol in CAN_29_PROTOCOLS:
+        p = protocol()
+        r = p([b'18 DA F1 10 06 41 00 00 01 02 03'])
+        assert len(r) == 1
+        check_message(r[0], 1, 0x10, range(4))
+
+
+def test_can_hex_straining():
+    """
+    Test dropping CAN lines, which are not hex data.
+    """
+    for protocol in CAN_11_PROTOCOLS:
+        p = protocol()
+        assert p([b'NO DATA']) == []
+        assert p([b'TOTALLY NOT HEX']) == []
+        assert p([b'NO DATA', b'NO DATA']) == []
+        assert p([b'7E8']) == []
+
+        r = p([b'NO DATA', b'7E8 06 41 00 00 01 02 03'])
+        assert len(r) == 1
+        check_message(r[0], 1, 0x0, range(4))
+
+
+def test_can_multi_ecu():
+    """
+    Test parsing CAN frames from multiple ECUs.
+    """
+    for protocol in CAN_11_PROTOCOLS:
+        p = protocol()
+        r = p([
+            b'7E8 06 41 00 00 01 02 03',
+            b'7EB 06 41 00 00 01 02 03',
+            b'7EA 06 41 00 00 01 02 03',
+        ])
+        assert sorted(m.tx_id for m in r) == [0, 2, 3]
+        for m in r:
+            check_message(m, 1, m.tx_id, range(4))
+
+
+def test_can_multi_line():
+    """
+    Test parsing multi-frame CAN message.
+    """
+    lines = [
+        b'7E8 10 20 49 04 00 01 02 03',
+        b'7E8 21 04 05 06 07 08 09 0A',
+        b'7E8 22 0B 0C 0D 0E 0F 10 11',
+        b'7E8 23 12 13 14 15 16 17 18',
+    ]
+    for protocol in CAN_11_PROTOCOLS:
+        p = protocol()
+
+        r = p(lines)
+        assert len(r) == 1
+        check_message(r[0], 4, 0x0, range(25))
+
+        # out of order frames
+        for n in range(4):
+            case = random.sample(lines, len(lines))
+            r = p(case)
+            assert len(r) == 1
+            check_message(r[0], 4, 0x0, range(25))
+
+        # missing frames drop the message
+        for n in range(len(lines) - 1):
+            case = lines[:n] + lines[n + 1:]
+            assert p(case) == []
+
+
+def test_can_dtc():
+    """
+    Test parsing CAN response of mode 03, which has no PID byte.
+    """
+    for protocol in CAN_11_PROTOCOLS:
+        p = protocol()
+        r = p([b'7E8 10 20 43 04 00 01 02 03', b'7E8 21 04 05 06 07 08 09 0A'])
+        assert len(r) == 1
+        check_message(r[0], 2, 0, range(8))
+        assert r[0].pid is None
+
+
+def test_can_clear_dtc():
+    """
+    Test parsing CAN response of mode 04, which has mode byte only.
+    """
+    for protocol in CAN_11_PROTOCOLS:
+        p = protocol()
+        r = p([b'7E8 01 44'])
+        assert len(r) == 1
+        check_message(r[0], 1, 0, b'')
+        assert r[0].mode == 0x44
+        assert r[0].pid is None
+
+    for protocol in CAN_29_PROTOCOLS:
+        p = protocol()
+        r = p([b'18 DA F1 10 01 44'])
+        assert len(r) == 1
+        check_message(r[0], 1, 0x10, b'')
+
+
+def test_can_no_pid():
+    """
+    Test dropping CAN response without PID byte of mode, which has one.
+    """
+    for protocol in CAN_11_PROTOCOLS:
+        p = protocol()
+        assert p([b'7E8 01 41']) == []
+        assert p([b'7E8 00']) == []
+
+
+def test_legacy_single_frame():
+    """
+    Test parsing single legacy frame.
+    """
+    for protocol in LEGACY_PROTOCOLS:
+        p = protocol()
+
+        # minimum valid length
+        r = p([b'48 6B 10 41 00 FF'])
+        check_message(r[0], 1, 0x10, [])
+
+        # maximum valid length
+        r = p([b'48 6B 10 41 00 00 01 02 03 04 FF'])
+        check_message(r[0], 1, 0x10, range(5))
+
+        # too short and too long
+        assert p([b'48 6B 10 41 FF']) == []
+        assert p([b'48 6B 10 41 00 00 01 02 03 04 05 FF']) == []
+
+
+def test_legacy_hex_straining():
+    """
+    Test dropping legacy lines, which are not hex data.
+    """
+    for protocol in LEGACY_PROTOCOLS:
+        p = protocol()
+        assert p([b'NO DATA']) == []
+        assert p([b'TOTALLY NOT HEX']) == []
+
+        r = p([b'NO DATA', b'48 6B 10 41 00 00 01 02 03 FF'])
+        check_message(r[0], 1, 0x10, range(4))
+
+
+def test_legacy_multi_ecu():
+    """
+    Test parsing legacy frames from multiple ECUs.
+    """
+    for protocol in LEGACY_PROTOCOLS:
+        p = protocol()
+        r = p([
+            b'48 6B 13 41 00 00 01 02 03 FF',
+            b'48 6B 10 41 00 00 01 02 03 FF',
+            b'48 6B 11 41 00 00 01 02 03 FF',
+        ])
+        assert sorted(m.tx_id for m in r) == [0x10, 0x11, 0x13]
+        for m in r:
+            check_message(m, 1, m.tx_id, range(4))
+
+
+def test_legacy_multi_line():
+    """
+    Test parsing multi-frame legacy message.
+    """
+    lines = [
+        b'48 6B 10 49 02 01 00 01 02 03 FF',
+        b'48 6B 10 49 02 02 04 05 06 07 FF',
+        b'48 6B 10 49 02 03 08 09 0A 0B FF',
+    ]
+    for protocol in LEGACY_PROTOCOLS:
+        p = protocol()
+
+        for n in range(4):
+            case = random.sample(lines, len(lines))
+            r = p(case)
+            check_message(r[0], 3, 0x10, range(12))
+
+        # missing frames drop the message
+        for n in range(len(lines) - 1):
+            case = lines[:n] + lines[n + 1:]
+            assert p(case) == []
+
+        # mode 03 data is stitched in order received
+        r = p([
+            b'48 6B 10 43 00 01 02 03 04 05 FF',
+            b'48 6B 10 43 06 07 08 09 0A 0B FF',
+        ])
+        check_message(r[0], 2, 0x10, range(12))
+
+# vim: sw=4:et:ai
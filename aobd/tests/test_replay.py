@@ -0,0 +1,109 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Tests for replay of recorded ELM327 device responses.
+"""
+
+import asyncio
+import os.path
+import time
+
+from aobd import COMMANDS, OBD
+from aobd.protocols import ISO_9141_2
+from aobd.sim import Replay
+from aobd.sim.replay import request_key
+from aobd.transport import MemoryTransport
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'data')
+
+EXCHANGES = [
+    (100.0, b'010C\r', 101.0, b'41 0C 0B B8\r\r>'),
+    (110.0, b'010C\r', 110.5, b'41 0C 0F A0\r\r>'),
+    (111.0, b'010D\r', 111.0, b'41 0D 20\r\r>'),
+    (112.0, b'010D\r', 112.0, b'41 0D'), # incomplete response
+]
+
+
+def test_request_key():
+    """
+    Test normalizing request.
+    """
+    assert request_key(b'01 0C\r\n') == b'010C'
+    assert request_key(b'010C1\r') == b'010C'
+    assert request_key(b'atdpn') == b'ATDPN'
+    assert request_key(b'03') == b'03'
+
+
+def test_replay_max_speed():
+    """
+    Test replaying responses at maximum speed.
+    """
+    replay = Replay(EXCHANGES, speed=None)
+    assert replay(b'010D') == b'41 0D 20\r\r>'
+    assert replay(b'010C1') == b'41 0C 0B B8\r\r>'
+    assert replay(b'010C') == b'41 0C 0F A0\r\r>'
+    assert replay(b'010C') == b'41 0C 0F A0\r\r>'
+    assert replay(b'0111') == b'NO DATA\r\r>'
+    assert replay(b'ATXX') == b'?\r\r>'
+
+
+def test_replay_timing():
+    """
+    Test replaying responses at recorded time and latency.
+    """
+    async def run():
+        replay = Replay(EXCHANGES, speed=100)
+
+        t0 = time.monotonic()
+        r1 = await replay(b'010C')
+        t1 = time.monotonic()
+
+        # move to 10.5s of the recording
+        await asyncio.sleep(t0 + 0.105 - time.monotonic())
+        t2 = time.monotonic()
+        r2 = await replay(b'010C')
+        t3 = time.monotonic()
+        return r1, t1 - t0, r2, t3 - t2
+
+    r1, d1, r2, d2 = asyncio.run(run())
+    assert r1 == b'41 0C 0B B8\r\r>'
+    assert 0.01 <= d1 < 0.05
+    assert r2 == b'41 0C 0F A0\r\r>'
+    assert 0.005 <= d2 < 0.045
+
+
+def test_replay_log():
+    """
+    Test connecting to replay of ELM327 debug log.
+    """
+    async def run():
+        fn = os.path.join(DATA_DIR, 'read-rpm-throttle-pos-speed.log')
+        dev = OBD(MemoryTransport(Replay.from_file(fn, speed=None)))
+        await dev.connect()
+        values = [(await dev.query(COMMANDS.RPM)).value for _ in range(3)]
+        protocol = dev.port.protocol
+        dev.close()
+        return protocol, values
+
+    protocol, values = asyncio.run(run())
+    assert isinstance(protocol, ISO_9141_2)
+    assert values == [752, 756, 753.5]
+
+# vim: sw=4:et:ai
@@ -0,0 +1,151 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Tests for scheduler of polling of OBD commands.
+"""
+
+import asyncio
+
+import pytest
+
+from aobd import COMMANDS
+from aobd.scheduler import Scheduler
+
+from .test_watch import run_watch
+
+
+def test_scheduler_rates():
+    """
+    Test polling commands at different rates.
+    """
+    s = Scheduler(origin=0)
+    s.add(COMMANDS.RPM, 20, now=0)
+    s.add(COMMANDS.COOLANT_TEMP, 0.2, now=0)
+
+    polls = []
+    for k in range(201):
+        now = k * 0.05
+        polls.extend(s.due(now))
+
+    assert polls.count(COMMANDS.RPM) == 201
+    assert polls.count(COMMANDS.COOLANT_TEMP) == 3
+
+    rates = s.rates()
+    assert rates[COMMANDS.RPM].target == 20
+    assert rates[COMMANDS.RPM].achieved == pytest.approx(20)
+    assert rates[COMMANDS.COOLANT_TEMP].achieved == pytest.approx(0.2)
+    assert rates[COMMANDS.RPM].missed == 0
+
+
+def test_scheduler_no_drift():
+    """
+    Test scheduling polls at ticks independent of the time of polls.
+    """
+    s = Scheduler(origin=0)
+    s.add(COMMANDS.RPM, 10, now=0)
+
+    assert s.due(0) == [COMMANDS.RPM]
+    assert s.next_time() == pytest.approx(0.1)
+
+    # late poll does not delay the next tick
+    assert s.due(0.13) == [COMMANDS.RPM]
+    assert s.next_time() == pytest.approx(0.2)
+    assert s.due(0.19) == []
+
+
+def test_scheduler_aligned():
+    """
+    Test scheduling commands added at different time at common ticks.
+    """
+    s = Scheduler(origin=0)
+    s.add(COMMANDS.RPM, 10, now=0)
+    s.add(COMMANDS.SPEED, 5, now=0.03)
+
+    assert s.due(0.03) == [COMMANDS.RPM, COMMANDS.SPEED]
+    assert s.due(0.1) == [COMMANDS.RPM]
+    assert s.due(0.2) == [COMMANDS.RPM, COMMANDS.SPEED]
+
+
+def test_scheduler_overload():
+    """
+    Test skipping ticks when polling cannot keep up.
+    """
+    s = Scheduler(origin=0)
+    s.add(COMMANDS.RPM, 10, now=0)
+    s.add(COMMANDS.SPEED, 1, now=0)
+    assert s.due(0) == [COMMANDS.RPM, COMMANDS.SPEED]
+
+    # each poll takes 0.25s
+    assert s.due(0.25) == [COMMANDS.RPM]
+    assert s.next_time() == pytest.approx(0.3)
+    assert s.due(0.5) == [COMMANDS.RPM]
+
+    rates = s.rates()
+    assert rates[COMMANDS.RPM].missed == 3
+    assert rates[COMMANDS.RPM].achieved == pytest.approx(4)
+    assert rates[COMMANDS.SPEED].missed == 0
+
+
+def test_scheduler_change_rate():
+    """
+    Test changing polling rate of command.
+    """
+    s = Scheduler(origin=0)
+    s.add(COMMANDS.RPM, 1, now=0)
+    s.due(0)
+    assert s.next_time() == pytest.approx(1)
+
+    s.add(COMMANDS.RPM, 10, now=0.05)
+    assert s.next_time() == pytest.approx(0.1)
+
+    s.remove(COMMANDS.RPM)
+    assert s.next_time() is None
+    assert COMMANDS.RPM not in s
+
+
+def test_scheduler_invalid_rate():
+    """
+    Test adding command with invalid rate.
+    """
+    s = Scheduler()
+    with pytest.raises(ValueError):
+        s.add(COMMANDS.RPM, 0)
+
+
+def test_watch_rates():
+    """
+    Test reporting polling rates of watched commands.
+    """
+    async def test(dev, device):
+        dev.watch(COMMANDS.RPM, rate=100)
+        dev.watch(COMMANDS.RPM, rate=50)
+        dev.watch(COMMANDS.COOLANT_TEMP, rate=0.5)
+        await asyncio.sleep(0.05)
+
+        rates = dev.rates()
+        assert rates[COMMANDS.RPM].target == 100
+        assert rates[COMMANDS.RPM].achieved > 0
+        assert rates[COMMANDS.COOLANT_TEMP].target == 0.5
+        assert device.requests.count(b'01051') == 0
+        assert device.requests[0] == b'010C05'
+
+    run_watch(test)
+
+# vim: sw=4:et:ai
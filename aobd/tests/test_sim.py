@@ -0,0 +1,219 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Tests for ELM327 device and vehicle simulator.
+"""
+
+import asyncio
+
+import pytest
+
+from aobd import COMMANDS, OBD
+from aobd.decoders import Linear
+from aobd.protocols import ISO_15765_4_11bit_500k, SAE_J1850_PWM
+from aobd.sim import ECU, PtyDevice, Simulator, Vehicle
+from aobd.sim.elm327 import can_frames, legacy_frames
+from aobd.sim.vehicle import encode
+from aobd.transport import MemoryTransport
+
+
+def query_all(device, commands):
+    """
+    Connect to simulator and query for collection of commands.
+    """
+    async def run():
+        dev = OBD(device)
+        await dev.connect()
+        try:
+            result = [r async for r in dev.query(commands)]
+            return dev.port.protocol, dev.commands, result
+        finally:
+            dev.close()
+    return asyncio.run(run())
+
+
+def test_can_frames():
+    """
+    Test splitting payload into ISO-TP frames.
+    """
+    frames = can_frames(b'\x41\x0c\x1a\xf8')
+    assert frames == [b'\x04\x41\x0c\x1a\xf8\x00\x00\x00']
+
+    frames = can_frames(b'\x49\x02\x01' + b'1AOBD00SIMULATOR1')
+    assert len(frames) == 3
+    assert frames[0][:2] == b'\x10\x14'
+    assert [f[0] for f in frames[1:]] == [0x21, 0x22]
+
+    p = ISO_15765_4_11bit_500k()
+    lines = [b'7E8' + f.hex().upper().encode() for f in frames]
+    msg, = p(lines)
+    assert msg.mode == 0x49
+    assert msg.data_bytes == b'\x011AOBD00SIMULATOR1'
+
+
+def test_legacy_frames():
+    """
+    Test splitting payload into frames of legacy protocols.
+    """
+    frames = legacy_frames(b'\x43\x04' + bytes(range(1, 9)))
+    assert frames == [
+        b'\x43\x01\x02\x03\x04\x05\x06',
+        b'\x43\x07\x08\x00\x00\x00\x00',
+    ]
+
+    p = SAE_J1850_PWM()
+    frames = legacy_frames(b'\x49\x02\x01' + b'1AOBD00SIMULATOR1')
+    lines = [b'486B10' + f.hex().upper().encode() + b'00' for f in frames]
+    msg, = p(lines)
+    assert msg.data_bytes == b'\x00\x00\x011AOBD00SIMULATOR1'
+
+
+def test_vehicle_data():
+    """
+    Test vehicle data of all mode 01 PIDs is decoded.
+    """
+    vehicle = Vehicle()
+    for pid in range(1, 0x60):
+        cmd = COMMANDS[1, pid]
+        data = vehicle.data(pid, 30.0)
+        assert len(data) == cmd.bytes
+        if cmd.decode not in (COMMANDS.PIDS_A.decode,):
+            value, _ = cmd.decode(data)
+            assert value is not None, cmd.name
+
+
+def test_vehicle_signals():
+    """
+    Test vehicle signals change over time.
+    """
+    vehicle = Vehicle(cycle=100)
+    speed = [COMMANDS.SPEED.decode(vehicle.data(0x0D, t))[0] for t in (0, 15, 45)]
+    rpm = [COMMANDS.RPM.decode(vehicle.data(0x0C, t))[0] for t in (0, 15, 45)]
+
+    assert speed[0] == 0 and 0 < speed[1] < 100 and speed[2] >= 97
+    assert rpm[0] == 800 and rpm[1] > 800
+
+
+def test_encode():
+    """
+    Test encoding value of linear decoder.
+    """
+    cmds = (COMMANDS[1, pid] for pid in range(1, 0x60))
+    for cmd in (c for c in cmds if isinstance(c.decode, Linear)):
+        d = cmd.decode
+        value = d.value(0x42)
+        assert d(encode(d, value, cmd.bytes))[0] == pytest.approx(value)
+
+
+def test_ecu():
+    """
+    Test ECU answering requests.
+    """
+    ecu = ECU(pids={0x0C, 0x0D, 0x21}, dtcs=['P0104', 'U0100'])
+    assert ecu(b'\x01\x00') == b'\x41\x00\x00\x18\x00\x01'
+    assert ecu(b'\x01\x20') == b'\x41\x20\x80\x00\x00\x00'
+    assert ecu(b'\x01\x40') is None
+    assert ecu(b'\x01\x05') is None
+    assert ecu(b'\x03') == b'\x43\x02\x01\x04\xc1\x00'
+    assert ecu(b'\x04') == b'\x44'
+    assert ecu(b'\x03') == b'\x43\x00'
+
+    r = ecu(b'\x01\x0c\x05\x0d')
+    assert r[:2] == b'\x41\x0c' and r[4] == 0x0D and len(r) == 6
+
+
+def test_handshake():
+    """
+    Test simulator answering AT commands.
+    """
+    sim = Simulator(protocol='7')
+    assert sim(b'ATZ') == b'ATZ\r\r\rELM327 v1.4\r\r>'
+    assert sim(b'ATE0') == b'ATE0\rOK\r\r>'
+    assert sim(b'ATH1') == b'OK\r\r>'
+    assert sim(b'ATSPA8') == b'OK\r\r>'
+    assert sim(b'ATDPN') == b'A8\r\r>'
+    assert sim(b'0100').startswith(b'SEARCHING...\r18 DA F1 10 06 41 00')
+    assert sim(b'ATDPN') == b'A7\r\r>'
+    assert sim(b'ATXX') == b'?\r\r>'
+
+    assert sim(b'ATSP6') == b'OK\r\r>'
+    assert sim(b'0100') == b'UNABLE TO CONNECT\r\r>'
+
+
+@pytest.mark.parametrize('protocol', ['6', '7', '1', '5'])
+def test_simulator(protocol):
+    """
+    Test querying simulator with all commands.
+    """
+    sim = Simulator(
+        protocol=protocol,
+        ecus=[ECU(dtcs=['P0104']), ECU(pids={0x05, 0x0D})],
+    )
+    cmds = [COMMANDS.RPM, COMMANDS.SPEED, COMMANDS.COOLANT_TEMP,
+        COMMANDS.FUEL_TYPE, COMMANDS.GET_DTC]
+    _, supported, result = query_all(MemoryTransport(sim), cmds)
+
+    assert len(supported) == 93
+    assert [r.command for r in result] == cmds
+    assert result[0].value >= 800
+    assert result[3].value == 'Gasoline'
+    assert result[4].value[0][0] == 'P0104'
+
+
+@pytest.mark.parametrize('protocol', ['6', '7'])
+def test_simulator_clear_dtc(protocol):
+    """
+    Test clearing trouble codes with mode 04 request of CAN simulator.
+    """
+    sim = Simulator(protocol=protocol, ecus=[ECU(dtcs=['P0104'])])
+    cmds = [COMMANDS.CLEAR_DTC, COMMANDS.GET_DTC]
+    _, _, result = query_all(MemoryTransport(sim), cmds)
+
+    assert [r.command for r in result] == cmds
+    assert result[1].value == []
+
+
+def test_simulator_latency():
+    """
+    Test simulator with response latency.
+    """
+    sim = Simulator(latency=0.001)
+    _, _, result = query_all(MemoryTransport(sim), [COMMANDS.SPEED])
+    assert result[0].value is not None
+
+
+def test_simulator_pty():
+    """
+    Test simulator served over pseudo terminal.
+    """
+    async def run():
+        device = PtyDevice(Simulator(protocol='1'))
+        dev = OBD(device.name)
+        try:
+            await dev.connect()
+            return await dev.query(COMMANDS.RPM)
+        finally:
+            dev.close()
+            device.close()
+
+    r = asyncio.run(run())
+    assert r.value >= 800
+
+# vim: sw=4:et:ai
@@ -0,0 +1,113 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Tests for latency statistics of OBD queries.
+"""
+
+import asyncio
+
+from aobd import COMMANDS, OBD
+from aobd.sim import Simulator
+from aobd.stats import Histogram, Stats, Timing, bucket, bucket_value
+from aobd.transport import MemoryTransport
+
+
+def test_bucket():
+    """
+    Test histogram bucket of a value.
+    """
+    assert [bucket(v) for v in range(16)] == list(range(16))
+    for v in (16, 17, 100, 1000, 12345, 10 ** 9):
+        k = bucket(v)
+        assert bucket(v - 1) <= k
+        assert v <= bucket_value(k) < v * 1.125
+
+
+def test_histogram():
+    """
+    Test histogram percentiles.
+    """
+    h = Histogram()
+    for v in range(1, 1001):
+        h.add(v * 1000)
+
+    assert h.count == 1000
+    assert h.max == 10 ** 6
+    assert 500000 <= h.percentile(50) < 500000 * 1.125
+    assert 990000 <= h.percentile(99) <= 10 ** 6
+    assert h.percentile(100) == 10 ** 6
+    assert Histogram().percentile(50) is None
+
+
+def test_stats():
+    """
+    Test recording timestamps of queries per command.
+    """
+    t = Timing(b'010C0D\r')
+    t.commands = (COMMANDS.RPM, COMMANDS.SPEED)
+    t.write = 1000
+    t.written = 2000
+    t.first_byte = 5000
+    t.prompt = 6000
+    t.parsed = 6500
+    t.decoded = 7000
+
+    stats = Stats()
+    stats.record(t)
+
+    summary = stats.summary()
+    assert set(summary) == {'RPM', 'SPEED'}
+    assert summary['RPM']['response']['max'] == 3e-6
+    assert summary['SPEED']['total']['count'] == 1
+    assert stats.histogram('RPM', 'decode').max == 500
+
+    stats.clear()
+    assert stats.summary() == {}
+
+
+def test_obd_stats():
+    """
+    Test recording latency of queries.
+    """
+    timings = []
+    async def run():
+        dev = OBD(MemoryTransport(Simulator()), on_timing=timings.append)
+        await dev.connect()
+        dev.stats.clear()
+        timings.clear()
+
+        await dev.query(COMMANDS.RPM)
+        async for _ in dev.query([COMMANDS.RPM, COMMANDS.SPEED]):
+            pass
+        dev.close()
+        return dev.stats
+
+    stats = asyncio.run(run())
+
+    assert stats.histogram('RPM').count == 2
+    assert stats.histogram('SPEED').count == 1
+    assert [t.commands for t in timings] == [
+        (COMMANDS.RPM,), (COMMANDS.RPM, COMMANDS.SPEED)
+    ]
+    for t in timings:
+        assert t.write <= t.written <= t.first_byte <= t.prompt \
+            <= t.parsed <= t.decoded
+
+# vim: sw=4:et:ai
@@ -0,0 +1,99 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Tests for wire trace of ELM327 device data.
+"""
+
+import asyncio
+import io
+
+from aobd import COMMANDS, OBD
+from aobd.capture import CaptureReader
+from aobd.sim import Simulator
+from aobd.trace import WireTrace, SENT, RECEIVED
+from aobd.transport import MemoryTransport
+
+
+def test_trace_ring():
+    """
+    Test keeping the most recent events in the ring buffer.
+    """
+    trace = WireTrace(size=3)
+    for i in range(5):
+        trace.record(SENT if i % 2 else RECEIVED, b'%d' % i)
+
+    assert len(trace) == 3
+    assert trace.count == 5
+    events = trace.events()
+    assert [(d, v) for d, _, v in events] \
+        == [(RECEIVED, b'2'), (SENT, b'3'), (RECEIVED, b'4')]
+    assert events[0][1] <= events[1][1] <= events[2][1]
+
+    trace.clear()
+    assert trace.events() == []
+
+
+def test_trace_dump(tmp_path):
+    """
+    Test saving and loading wire trace.
+    """
+    trace = WireTrace(path=str(tmp_path / 'error.trace'))
+    trace.record(SENT, b'010C\r')
+    trace.record(RECEIVED, b'7E804410C1AF8\r\r>')
+
+    f = io.BytesIO()
+    trace.dump(f)
+    assert f.getvalue().startswith(b'AOBDCAP1')
+
+    trace.error('test error')
+    with CaptureReader(str(tmp_path / 'error.trace')) as reader:
+        events = [(d, ts, bytes(v)) for d, ts, v in reader]
+        assert reader.wall > 0 and reader.monotonic > 0
+    assert events == trace.events()
+
+
+def test_trace_error_no_path():
+    """
+    Test that wire trace is not saved on error without path.
+    """
+    trace = WireTrace()
+    trace.record(SENT, b'ATZ\r')
+    trace.error('test error')
+
+
+def test_obd_trace():
+    """
+    Test recording data of OBD connection.
+    """
+    async def run():
+        dev = OBD(MemoryTransport(Simulator()))
+        await dev.connect()
+        dev.trace.clear()
+        await dev.query(COMMANDS.RPM)
+        dev.close()
+        return dev.trace
+
+    trace = asyncio.run(run())
+    events = trace.events()
+    assert events[0][0] == SENT
+    assert events[0][2] == b'010C1\r'
+    assert b''.join(v for d, _, v in events if d == RECEIVED).endswith(b'>')
+
+# vim: sw=4:et:ai
@@ -0,0 +1,169 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Tests for transports of ELM327 devices.
+"""
+
+import asyncio
+import socket
+
+import pytest
+
+from aobd.elm327 import OBDError, ResponseBuffer
+from aobd.sim import Simulator
+from aobd.transport import FileTransport, MemoryTransport, TCPTransport
+
+
+class Pair(FileTransport):
+    """
+    Transport using one end of socket pair.
+    """
+    def _open(self):
+        self.sock, self.peer = socket.socketpair()
+        self.sock.setblocking(False)
+        self.peer.setblocking(False)
+        return self.sock.fileno()
+
+
+    def _close(self):
+        self.sock.close()
+
+
+def test_write_queue():
+    """
+    Test writing data in order when the data cannot be written at once.
+    """
+    async def check():
+        loop = asyncio.get_running_loop()
+        transport = Pair()
+        transport.open(ResponseBuffer(loop), loop)
+
+        data = bytes(range(256)) * 4096
+        t1 = transport.write(data)
+        t2 = transport.write(b'0100\r')
+        assert not t1.done() and not t2.done()
+
+        received = bytearray()
+        async def receive():
+            while len(received) < len(data) + 5:
+                received.extend(await loop.sock_recv(transport.peer, 65536))
+            await asyncio.gather(t1, t2)
+
+        await asyncio.wait_for(receive(), 5)
+        assert received == data + b'0100\r'
+
+        # the writer is removed when all data is written
+        assert transport.write(b'ATZ\r').done()
+        transport.close()
+        transport.peer.close()
+
+    asyncio.run(check())
+
+
+def test_close_pending_writes():
+    """
+    Test failing pending writes when transport is closed.
+    """
+    async def check():
+        loop = asyncio.get_running_loop()
+        transport = Pair()
+        transport.open(ResponseBuffer(loop), loop)
+
+        task = transport.write(bytes(1 << 22))
+        assert not task.done()
+        transport.close()
+        transport.peer.close()
+        with pytest.raises(ConnectionError):
+            await asyncio.wait_for(task, 1)
+
+    asyncio.run(check())
+
+
+def test_memory_close():
+    """
+    Test discarding response of in-memory device after transport is
+    closed.
+    """
+    async def check():
+        loop = asyncio.get_running_loop()
+        buffer = ResponseBuffer(loop)
+        transport = MemoryTransport(Simulator())
+        transport.open(buffer, loop)
+
+        task = buffer.wait()
+        await transport.write(b'ATZ\r')
+        transport.close()
+        await asyncio.sleep(0.01)
+        assert not task.done()
+
+    asyncio.run(check())
+
+
+def test_tcp_connection_lost():
+    """
+    Test closing TCP transport when the device closes the connection.
+    """
+    async def check():
+        loop = asyncio.get_running_loop()
+        with socket.socket() as server:
+            server.bind(('127.0.0.1', 0))
+            server.listen()
+            server.setblocking(False)
+
+            buffer = ResponseBuffer(loop)
+            transport = TCPTransport(*server.getsockname())
+            transport.open(buffer, loop)
+            peer, _ = await loop.sock_accept(server)
+
+            task = buffer.wait()
+            peer.sendall(b'OK\r>')
+            assert bytes(await task) == b'OK\r'
+
+            task = buffer.wait()
+            peer.close()
+            with pytest.raises(OBDError):
+                await asyncio.wait_for(task, 1)
+
+            assert transport._sock is None
+            with pytest.raises(ConnectionError):
+                await transport.write(b'0100\r')
+
+    asyncio.run(check())
+
+
+def test_tcp_connect_error():
+    """
+    Test failing writes when TCP connection cannot be made.
+    """
+    async def check():
+        loop = asyncio.get_running_loop()
+        with socket.socket() as server:
+            server.bind(('127.0.0.1', 0))
+            address = server.getsockname()
+
+        transport = TCPTransport(*address)
+        transport.open(ResponseBuffer(loop), loop)
+        with pytest.raises(ConnectionError):
+            await transport.write(b'0100\r')
+        transport.close()
+
+    asyncio.run(check())
+
+# vim: sw=4:et:ai
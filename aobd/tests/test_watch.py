@@ -0,0 +1,145 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Tests for subscriptions to OBD commands polled in background.
+"""
+
+import asyncio
+
+from aobd import COMMANDS, OBD
+from aobd.transport import MemoryTransport
+
+from . import Recorder
+
+
+def run_watch(test):
+    """
+    Run subscription test with connection to simulator.
+    """
+    async def run():
+        device = Recorder()
+        dev = OBD(MemoryTransport(device))
+        await dev.connect()
+        device.requests.clear()
+        try:
+            await test(dev, device)
+        finally:
+            dev.close()
+    asyncio.run(run())
+
+
+def test_watch_shared():
+    """
+    Test sharing polled responses between subscribers.
+    """
+    async def test(dev, device):
+        r1, r2 = [], []
+        assert dev.latest(COMMANDS.RPM) is None
+
+        dev.watch(COMMANDS.RPM, rate=100, callback=r1.append)
+        dev.watch(COMMANDS.RPM, rate=10, callback=r2.append)
+        await asyncio.sleep(0.105)
+
+        assert 3 <= len(r1) <= 12
+        assert r1 == r2
+        assert len(device.requests) == len(r1)
+        assert dev.latest(COMMANDS.RPM) is r1[-1]
+
+    run_watch(test)
+
+
+def test_watch_multi_pid():
+    """
+    Test polling commands due at the same time with single request.
+    """
+    async def test(dev, device):
+        dev.watch(COMMANDS.RPM)
+        dev.watch(COMMANDS.SPEED)
+        await asyncio.sleep(0.01)
+
+        assert device.requests == [b'010C0D']
+        assert dev.latest(COMMANDS.RPM).command == COMMANDS.RPM
+        assert dev.latest(COMMANDS.SPEED).command == COMMANDS.SPEED
+
+    run_watch(test)
+
+
+def test_watch_cancel():
+    """
+    Test stopping polling of command without subscriptions.
+    """
+    async def test(dev, device):
+        sub = dev.watch(COMMANDS.RPM, rate=100)
+        await asyncio.sleep(0.02)
+        sub.cancel()
+        await asyncio.sleep(0)
+
+        n = len(device.requests)
+        await asyncio.sleep(0.03)
+        assert n > 0
+        assert len(device.requests) == n
+
+    run_watch(test)
+
+
+def test_watch_error(monkeypatch):
+    """
+    Test polling commands after unexpected error of a poll.
+    """
+    decode = COMMANDS.FUEL_TYPE.decode
+    errors = []
+    def fail(data):
+        if not errors:
+            errors.append(data)
+            raise IndexError('decoder failed')
+        return decode(data)
+    monkeypatch.setattr(COMMANDS.FUEL_TYPE, 'decode', fail)
+
+    async def test(dev, device):
+        r = []
+        dev.watch(COMMANDS.FUEL_TYPE, rate=100, callback=r.append)
+        await asyncio.sleep(0.055)
+
+        assert errors
+        assert len(r) >= 2
+        assert r[-1].value == 'Gasoline'
+
+    run_watch(test)
+
+
+def test_stream():
+    """
+    Test iterating over responses polled in background.
+    """
+    async def test(dev, device):
+        commands = [COMMANDS.RPM, COMMANDS.COOLANT_TEMP]
+        responses = []
+        async with dev.stream(commands, rate=100) as stream:
+            async for r in stream:
+                responses.append(r)
+                if len(responses) == 6:
+                    break
+
+        assert [r.command for r in responses] == commands * 3
+        assert not dev._watcher._subscriptions
+
+    run_watch(test)
+
+# vim: sw=4:et:ai
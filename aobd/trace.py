@@ -0,0 +1,149 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Flight recorder of data sent to and received from ELM327 device.
+
+The recorder keeps the most recent wire events in a ring buffer. An
+event is direction of the data, monotonic clock timestamp in nanoseconds
+and the raw data. Recording an event stores three values in preallocated
+arrays, so the recorder is always enabled.
+
+The events are saved in a capture file with `WireTrace.dump` method, on
+request or when an error occurs, and read with
+`aobd.capture.CaptureReader` class. All events can be also written to
+a capture file as they are recorded, see `capture` attribute.
+"""
+
+import array
+import logging
+import time
+
+from .capture import CaptureWriter, SENT, RECEIVED
+
+logger = logging.getLogger(__name__)
+
+# default number of events in the ring buffer
+TRACE_SIZE = 4096
+
+
+class WireTrace:
+    """
+    Ring buffer of the most recent wire events.
+
+    :param size: Maximum number of events.
+    :param path: Path of the file the events are saved to on error.
+    :var size: Maximum number of events.
+    :var path: Path of the file the events are saved to on error.
+    :var count: Number of events recorded since creation of the buffer.
+    :var capture: Capture writer receiving each recorded event.
+    """
+    def __init__(self, size=TRACE_SIZE, path=None):
+        self.size = size
+        self.path = path
+        self.count = 0
+        self.capture = None
+        self._time = array.array('q', bytes(8 * size))
+        self._direction = bytearray(size)
+        self._data = [None] * size
+
+
+    def record(self, direction, data):
+        """
+        Record data sent to or received from the device.
+
+        :param direction: Direction of the data, `SENT` or `RECEIVED`.
+        :param data: Data as bytes.
+        """
+        k = self.count % self.size
+        ts = self._time[k] = time.monotonic_ns()
+        self._direction[k] = direction
+        self._data[k] = data
+        self.count += 1
+        if self.capture is not None:
+            self.capture.write(direction, ts, data)
+
+
+    def events(self):
+        """
+        Get list of recorded events, oldest first.
+
+        An event is tuple of direction, timestamp and data.
+        """
+        n = min(self.count, self.size)
+        start = self.count - n
+        items = (k % self.size for k in range(start, self.count))
+        return [
+            (self._direction[k], self._time[k], self._data[k])
+            for k in items
+        ]
+
+
+    def clear(self):
+        """
+        Remove all recorded events.
+        """
+        self.count = 0
+        self._data = [None] * self.size
+
+
+    def dump(self, path=None):
+        """
+        Save recorded events in a capture file.
+
+        :param path: File path or binary file object, `path` attribute
+            by default.
+        """
+        path = self.path if path is None else path
+        if hasattr(path, 'write'):
+            self._write(path)
+        else:
+            with open(path, 'wb') as f:
+                self._write(f)
+
+
+    def error(self, reason):
+        """
+        Save recorded events in a capture file after an error.
+
+        Nothing is saved if `path` attribute is not set.
+
+        :param reason: Description of the error.
+        """
+        if self.path is None:
+            return
+        try:
+            self.dump()
+            logger.warning('{}, wire trace saved in {}'.format(reason, self.path))
+        except OSError as ex:
+            logger.warning('cannot save wire trace: {}'.format(ex))
+
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+
+    def _write(self, f):
+        writer = CaptureWriter(f)
+        for event in self.events():
+            writer.write(*event)
+        writer.finish()
+
+
+# vim: sw=4:et:ai
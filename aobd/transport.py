@@ -0,0 +1,502 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Transports used to communicate with ELM327 devices.
+
+A transport writes requests to a device and passes data received from
+the device to a protocol object implementing `get_buffer`,
+`buffer_updated` and `connection_lost` methods of
+`asyncio.BufferedProtocol` class, i.e. response buffer of ELM327 device.
+
+The following transports are supported
+
+serial
+    ELM327 device connected with USB or Bluetooth serial port.
+TCP
+    Wi-Fi ELM327 device, i.e. `tcp://192.168.0.10:35000`.
+memory
+    In-memory device, i.e. simulator running in the same process.
+"""
+
+import asyncio
+import collections
+import inspect
+import logging
+import os
+import serial
+import socket
+
+logger = logging.getLogger(__name__)
+
+# minimum free space in a buffer for a read
+READ_SIZE = 1024
+
+# default port of Wi-Fi ELM327 devices
+TCP_PORT = 35000
+
+# time to wait for TCP connection in seconds
+CONNECT_TIMEOUT = 10
+
+
+def create_transport(device, baudrate):
+    """
+    Create transport for a device.
+
+    The device is one of
+
+    - transport instance, which is returned as is
+    - TCP address prefixed with `tcp://`, i.e. `tcp://192.168.0.10:35000`
+    - serial device path, i.e. `/dev/ttyUSB0`
+
+    :param device: Device path, address or transport instance.
+    :param baudrate: Baud rate of serial device.
+    """
+    if isinstance(device, Transport):
+        return device
+    elif device.startswith('tcp://'):
+        host, _, port = device[6:].partition(':')
+        return TCPTransport(host, int(port) if port else TCP_PORT)
+    else:
+        return SerialTransport(device, baudrate)
+
+
+class Transport:
+    """
+    Base class of transports of ELM327 devices.
+    """
+    def open(self, protocol, loop):
+        """
+        Open transport and start passing received data to the protocol.
+
+        :param protocol: Protocol receiving data from the device.
+        :param loop: Asyncio event loop.
+        """
+        raise NotImplementedError()
+
+
+    def write(self, data):
+        """
+        Write data to the device.
+
+        Future is returned, which is done when all data is written.
+
+        :param data: Data to write.
+        """
+        raise NotImplementedError()
+
+
+    def reset(self):
+        """
+        Discard data received from the device, but not passed to the
+        protocol yet.
+        """
+
+
+    def close(self):
+        """
+        Close transport.
+        """
+        raise NotImplementedError()
+
+
+
+class FileTransport(Transport):
+    """
+    Transport using non-blocking file descriptor.
+
+    The data is read when the file descriptor becomes readable. All data
+    available is read at once into the buffer of the protocol.
+
+    The data, which cannot be written at once, is written when the file
+    descriptor becomes writable. The data of next writes is queued until
+    then, so the writes are done in order.
+
+    On end of file or read error, i.e. TCP connection closed by the
+    device or serial device unplugged, the transport is closed and the
+    protocol is notified with its `connection_lost` method.
+    """
+    def __init__(self):
+        self._fd = None
+        self._protocol = None
+        self._loop = None
+        self._writes = collections.deque()
+
+
+    def open(self, protocol, loop):
+        self._protocol = protocol
+        self._loop = loop
+        self._fd = self._open()
+        loop.add_reader(self._fd, self._read_data)
+        logger.debug('started to watch file descriptor {}'.format(self._fd))
+
+
+    def write(self, data):
+        task = self._loop.create_future()
+        if self._fd is None:
+            task.set_exception(ConnectionError('transport is closed'))
+        else:
+            self._writes.append((memoryview(data), task))
+            if len(self._writes) == 1:
+                self._write_data()
+        return task
+
+
+    def close(self):
+        if self._fd is not None:
+            self._loop.remove_writer(self._fd)
+            self._loop.remove_reader(self._fd)
+            self._close()
+            self._fd = None
+
+        writes = self._writes
+        while writes:
+            _, task = writes.popleft()
+            if not task.done():
+                task.set_exception(ConnectionError('transport is closed'))
+
+
+    def _open(self):
+        """
+        Open device and return its file descriptor.
+        """
+        raise NotImplementedError()
+
+
+    def _close(self):
+        """
+        Close device.
+        """
+        raise NotImplementedError()
+
+
+    def _read(self, buff):
+        """
+        Read data into the buffer and return number of bytes read.
+        """
+        return os.readv(self._fd, [buff])
+
+
+    def _write(self, data):
+        """
+        Write data and return number of bytes written.
+        """
+        return os.write(self._fd, data)
+
+
+    def _write_data(self):
+        """
+        Write queued data until the file descriptor is not writable.
+        """
+        fd = self._fd
+        writes = self._writes
+        while writes:
+            data, task = writes[0]
+            try:
+                n = self._write(data)
+            except BlockingIOError:
+                n = 0
+            except OSError as ex:
+                writes.popleft()
+                if not task.done():
+                    task.set_exception(ex)
+                continue
+
+            if n < len(data):
+                writes[0] = data[n:], task
+                self._loop.add_writer(fd, self._write_data)
+                return
+
+            writes.popleft()
+            if not task.done():
+                task.set_result(None)
+            logger.debug('data sent')
+
+        self._loop.remove_writer(fd)
+
+
+    def _read_data(self):
+        buff = self._protocol.get_buffer(READ_SIZE)
+        try:
+            n = self._read(buff)
+        except BlockingIOError:
+            return
+        except OSError as ex:
+            self._connection_lost(ex)
+            return
+
+        if n == 0:
+            self._connection_lost(None)
+            return
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('received: {}'.format(bytes(buff[:n])))
+
+        self._protocol.buffer_updated(n)
+
+
+    def _connection_lost(self, ex):
+        """
+        Close transport on end of file or read error and notify the
+        protocol.
+        """
+        if ex is None:
+            logger.warning('end of file of file descriptor {}'.format(self._fd))
+        else:
+            logger.warning('read error of file descriptor {}: {}'.format(self._fd, ex))
+        self.close()
+        self._protocol.connection_lost(ex)
+
+
+
+class SerialTransport(FileTransport):
+    """
+    Transport of ELM327 device connected to a serial port.
+
+    :param device: Serial device path.
+    :param baudrate: Baud rate of the serial device.
+    """
+    def __init__(self, device, baudrate):
+        super().__init__()
+        self.device = device
+        self.baudrate = baudrate
+        self._port = None
+
+
+    def reset(self):
+        if self._port is not None:
+            self._port.reset_input_buffer()
+
+
+    def _open(self):
+        logger.debug('opening serial port {}'.format(self.device))
+        self._port = serial.Serial(
+            self.device,
+            baudrate=self.baudrate,
+            parity=serial.PARITY_NONE,
+            stopbits=1,
+            bytesize=8,
+            timeout=0,
+        )
+        return self._port.fileno()
+
+
+    def _close(self):
+        self._port.close()
+        self._port = None
+
+
+
+class TCPTransport(FileTransport):
+    """
+    Transport of Wi-Fi ELM327 device.
+
+    The connection is made in background, so the event loop is not
+    blocked. The data written before the connection is made is written
+    once the device is connected. If the connection fails, then the
+    writes fail with the connection error.
+
+    Nagle's algorithm is disabled, so a request is sent at once instead
+    of waiting for more data to be written.
+
+    :param host: Host name or address of the device.
+    :param port: TCP port of the device.
+    :param timeout: Time to wait for the connection in seconds.
+    """
+    def __init__(self, host, port=TCP_PORT, timeout=CONNECT_TIMEOUT):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._sock = None
+        self._connecting = None
+
+
+    def open(self, protocol, loop):
+        self._protocol = protocol
+        self._loop = loop
+        self._connecting = task = asyncio.ensure_future(
+            self._connect(), loop=loop
+        )
+        task.add_done_callback(self._connect_done)
+
+
+    def write(self, data):
+        task = self._connecting
+        if task is None or task.done() and not task.cancelled() \
+                and task.exception() is None:
+            return super().write(data)
+        return asyncio.ensure_future(self._write_connected(data), loop=self._loop)
+
+
+    def reset(self):
+        if self._sock is None:
+            return
+        buff = bytearray(READ_SIZE)
+        try:
+            while self._sock.recv_into(buff):
+                pass
+        except BlockingIOError:
+            pass
+
+
+    def close(self):
+        if self._connecting is not None:
+            self._connecting.cancel()
+            self._connecting = None
+        super().close()
+
+
+    async def _connect(self):
+        """
+        Connect to the device and start watching the socket.
+        """
+        logger.debug('connecting to {}:{}'.format(self.host, self.port))
+        loop = self._loop
+        info = await loop.getaddrinfo(
+            self.host, self.port, type=socket.SOCK_STREAM
+        )
+        family, type, proto, _, address = info[0]
+        sock = socket.socket(family, type, proto)
+        try:
+            sock.setblocking(False)
+            await asyncio.wait_for(
+                loop.sock_connect(sock, address), self.timeout
+            )
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except BaseException:
+            sock.close()
+            raise
+
+        self._sock = sock
+        self._fd = sock.fileno()
+        loop.add_reader(self._fd, self._read_data)
+        logger.debug('connected to {}:{}'.format(self.host, self.port))
+
+
+    def _connect_done(self, task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning('cannot connect to {}:{}: {}'.format(
+                self.host, self.port, task.exception()
+            ))
+
+
+    async def _write_connected(self, data):
+        """
+        Write data when connection to the device is made.
+        """
+        await self._connecting
+        await super().write(data)
+
+
+    def _close(self):
+        self._sock.close()
+        self._sock = None
+
+
+    def _read(self, buff):
+        return self._sock.recv_into(buff)
+
+
+    def _write(self, data):
+        return self._sock.send(data)
+
+
+
+class MemoryTransport(Transport):
+    """
+    Transport of in-memory ELM327 device.
+
+    The device is a handler called with each request without the
+    terminating carriage return. The handler returns the response data
+    including the prompt, or awaitable of the response data. The
+    response is passed to the protocol in the next iteration of the event
+    loop.
+
+    :param handler: Request handler of the device.
+    """
+    def __init__(self, handler):
+        self.handler = handler
+        self._protocol = None
+        self._loop = None
+        self._data = bytearray()
+        self._pending = set()
+
+
+    def open(self, protocol, loop):
+        self._protocol = protocol
+        self._loop = loop
+
+
+    def write(self, data):
+        self._data.extend(data)
+        while True:
+            pos = self._data.find(b'\r')
+            if pos == -1:
+                break
+            request = bytes(self._data[:pos])
+            del self._data[:pos + 1]
+            self._process(request)
+
+        task = self._loop.create_future()
+        task.set_result(None)
+        return task
+
+
+    def reset(self):
+        for task in self._pending:
+            task.cancel()
+        self._pending.clear()
+
+
+    def close(self):
+        self.reset()
+        self._data.clear()
+        self._protocol = None
+
+
+    def _process(self, request):
+        response = self.handler(request)
+        if inspect.isawaitable(response):
+            task = asyncio.ensure_future(response)
+            self._pending.add(task)
+            task.add_done_callback(self._response_done)
+        elif response:
+            self._loop.call_soon(self._feed, response)
+
+
+    def _response_done(self, task):
+        self._pending.discard(task)
+        if not task.cancelled() and task.result():
+            self._feed(task.result())
+
+
+    def _feed(self, data):
+        # response of a request written before the transport is closed,
+        # i.e. reset command
+        if self._protocol is None:
+            return
+
+        buff = self._protocol.get_buffer(len(data))
+        n = len(data)
+        buff[:n] = data
+        self._protocol.buffer_updated(n)
+
+
+# vim: sw=4:et:ai
@@ -115,6 +115,13 @@ def unhex(_hex):
     _hex = '0' if _hex == b'' else _hex
     return int(_hex, 16)
 
+def unhex_bytes(_hex):
+    """
+    Convert hex string into bytes, odd length string is padded with
+    leading zero.
+    """
+    return bytes.fromhex('0' * (len(_hex) % 2) + _hex)
+
 def unbin(_bin):
     return int(_bin, 2)
 
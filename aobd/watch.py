@@ -0,0 +1,282 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Subscriptions to OBD commands polled in background.
+"""
+
+import asyncio
+import functools
+import logging
+import time
+
+from .elm327 import OBDError, PRIORITY_LOW
+from .scheduler import Scheduler
+
+logger = logging.getLogger(__name__)
+
+# maximum number of responses waiting in a stream
+STREAM_SIZE = 64
+
+
+class Subscription:
+    """
+    Subscription to responses of OBD command.
+
+    :var command: OBD command.
+    :var interval: Interval between responses in seconds.
+    :var callback: Function called with each response.
+    """
+    def __init__(self, watcher, command, interval, callback):
+        self.command = command
+        self.interval = interval
+        self.callback = callback
+        self._watcher = watcher
+
+
+    def cancel(self):
+        """
+        Cancel the subscription.
+
+        The command is not polled anymore when it has no subscriptions.
+        """
+        self._watcher.remove(self)
+
+
+
+class Stream:
+    """
+    Asynchronous iterator of responses to OBD commands polled in
+    background.
+
+    The commands are subscribed on creation of the stream. If the
+    consumer is slower than the responses arrive, then the oldest
+    responses are dropped.
+
+    The subscriptions are cancelled when the stream is closed, exits
+    context manager or is garbage collected.
+
+    :param watcher: Poller of OBD commands.
+    :param commands: Collection of OBD commands.
+    :param rate: Requested number of responses of each command per
+        second.
+    """
+    def __init__(self, watcher, commands, rate=1):
+        self._queue = queue = asyncio.Queue(STREAM_SIZE)
+        # callback does not refer to the stream, so it is garbage
+        # collected when the consumer stops using it
+        put = functools.partial(put_latest, queue)
+        self._subscriptions = [watcher.add(c, rate, put) for c in commands]
+
+
+    def __aiter__(self):
+        return self
+
+
+    async def __anext__(self):
+        if not self._subscriptions:
+            raise StopAsyncIteration()
+        return await self._queue.get()
+
+
+    def close(self):
+        """
+        Cancel subscriptions of the stream.
+        """
+        for sub in self._subscriptions:
+            sub.cancel()
+        self._subscriptions = []
+
+
+    async def __aenter__(self):
+        return self
+
+
+    async def __aexit__(self, *args):
+        self.close()
+
+
+    def __del__(self):
+        self.close()
+
+
+
+class Watcher:
+    """
+    Poller of OBD commands shared by all subscribers of a connection.
+
+    Single background task polls the subscribed commands. A command is
+    polled once at the highest rate requested by its subscribers, and
+    each response is passed to all of them. The polls are scheduled with
+    multi-rate scheduler, see `aobd.scheduler`. The commands due at the
+    same time are sent with one query, so they are packed into
+    multi-PID requests on CAN vehicles.
+
+    The latest response of each command is kept.
+
+    :param obd: OBD connection.
+    :param priority: Priority class of the queries.
+    """
+    def __init__(self, obd, priority=PRIORITY_LOW):
+        self._obd = obd
+        self.priority = priority
+
+        # command -> subscriptions, latest response
+        self._subscriptions = {}
+        self._latest = {}
+        self._scheduler = Scheduler()
+
+        self._task = None
+        self._changed = asyncio.Event()
+
+
+    def add(self, command, rate=1, callback=None):
+        """
+        Subscribe to responses of OBD command.
+
+        :param command: OBD command.
+        :param rate: Requested number of responses per second.
+        :param callback: Function called with each response.
+        """
+        if rate <= 0:
+            raise ValueError('Rate has to be positive: {}'.format(rate))
+
+        sub = Subscription(self, command, 1 / rate, callback)
+        self._subscriptions.setdefault(command, []).append(sub)
+        self._scheduler.add(command, 1 / self._interval(command))
+        self._changed.set()
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        return sub
+
+
+    def remove(self, sub):
+        """
+        Remove subscription to responses of OBD command.
+        """
+        cmd = sub.command
+        items = self._subscriptions.get(cmd, [])
+        if sub in items:
+            items.remove(sub)
+        if items:
+            self._scheduler.add(cmd, 1 / self._interval(cmd))
+        else:
+            self._subscriptions.pop(cmd, None)
+            self._scheduler.remove(cmd)
+        self._changed.set()
+
+
+    def latest(self, command):
+        """
+        Get latest response of OBD command or `None`.
+        """
+        return self._latest.get(command)
+
+
+    def rates(self):
+        """
+        Get polling rates of OBD commands.
+
+        Dictionary of command and its polling rate is returned, see
+        `aobd.scheduler.Rate` class.
+        """
+        return self._scheduler.rates()
+
+
+    def stream(self, commands, rate=1):
+        """
+        Subscribe to responses of OBD commands and get stream of the
+        responses.
+
+        :param commands: Collection of OBD commands.
+        :param rate: Requested number of responses of each command per
+            second.
+        """
+        return Stream(self, commands, rate)
+
+
+    def close(self):
+        """
+        Cancel all subscriptions and stop polling.
+        """
+        self._subscriptions.clear()
+        self._scheduler.clear()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+    def _interval(self, command):
+        return min(s.interval for s in self._subscriptions[command])
+
+
+    async def _run(self):
+        scheduler = self._scheduler
+        while self._subscriptions:
+            now = time.monotonic()
+            due = scheduler.due(now)
+            if not due:
+                self._changed.clear()
+                timeout = scheduler.next_time() - now
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._poll(due)
+            except OBDError as ex:
+                logger.warning('polling failed: {}'.format(ex))
+            except Exception:
+                # keep polling commands of other subscriptions
+                logger.exception('polling failed')
+
+
+    async def _poll(self, commands):
+        responses = self._obd.query(commands, self.priority)
+        i = 0
+        async for r in responses:
+            self._publish(commands[i], r)
+            i += 1
+
+
+    def _publish(self, command, response):
+        self._latest[command] = response
+        for sub in tuple(self._subscriptions.get(command, ())):
+            if sub.callback is None:
+                continue
+            try:
+                sub.callback(response)
+            except Exception:
+                logger.exception('callback of {} failed'.format(command))
+
+
+
+def put_latest(queue, item):
+    """
+    Put item into the queue, drop the oldest item if the queue is full.
+    """
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(item)
+
+
+# vim: sw=4:et:ai
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Benchmark of response parsing and decoding.
+
+The following is timed
+
+- `Protocol.__call__` with response lines of the debug logs in `data`
+  directory (ISO 9141-2) and responses of the simulator (CAN, including
+  multi-frame responses)
+- `OBDCommand.__call__` with messages of the responses
+- every decoder of `aobd.decoders` module and every linear decoder of
+  the command tables with representative payloads; the payloads are taken
+  from the debug logs if available, otherwise from the simulator
+
+The time of a call is reported in nanoseconds.
+"""
+
+import inspect
+import os.path
+import timeit
+
+from aobd import COMMANDS, decoders
+from aobd.decoders import Linear
+from aobd.protocols import ISO_9141_2, ISO_15765_4_11bit_500k
+from aobd.sim import Simulator
+
+from common import data_files, load_responses, parser, write
+
+REPEAT = 5
+
+# payloads of decoders not used by mode 01 commands
+PAYLOADS = {
+    'dtc': b'\x01\x04\x80\x03\x41\x23',
+    'single_dtc': b'\x01\x04',
+}
+DEFAULT_PAYLOAD = b'\x1a\xf8\x12\x34'
+
+
+def timed(group, name, f, args, iterations):
+    """
+    Time function call and return result of the benchmark.
+    """
+    timer = timeit.Timer(lambda: f(*args))
+    times = timer.repeat(REPEAT, iterations)
+    times = sorted(t / iterations * 1e9 for t in times)
+    return {
+        'name': '{}/{}'.format(group, name),
+        'group': group,
+        'iterations': iterations,
+        'ns': {'min': times[0], 'median': times[len(times) // 2]},
+    }
+
+
+def log_messages():
+    """
+    Get response lines and messages of mode 01 commands from debug logs.
+    """
+    protocol = ISO_9141_2()
+    items = (r for f in data_files() for r in load_responses(f))
+    items = ((req, lines) for req, lines in items if req.startswith(b'01'))
+    return protocol, {req: lines for req, lines in items}
+
+
+def sim_lines(requests):
+    """
+    Get response lines of CAN simulator.
+    """
+    sim = Simulator(protocol='6')
+    for cmd in (b'ATZ', b'ATE0', b'ATH1', b'ATS0', b'ATL0'):
+        sim(cmd)
+    return {
+        req: sim(req).rstrip(b'\r>').split(b'\r')
+        for req in requests
+    }
+
+
+def bench_protocol(iterations):
+    results = []
+    protocol, lines = log_messages()
+    for req, data in lines.items():
+        r = timed('protocol', 'legacy/' + req.decode(), protocol, (data,), iterations)
+        results.append(r)
+
+    can = ISO_15765_4_11bit_500k()
+    requests = [b'010C', b'010C0D11', b'010C0D110405', b'0902']
+    for req, data in sim_lines(requests).items():
+        r = timed('protocol', 'can/' + req.decode(), can, (data,), iterations)
+        results.append(r)
+    return results
+
+
+def bench_command(iterations):
+    results = []
+    protocol, lines = log_messages()
+    for req, data in lines.items():
+        msg = protocol(data)[0]
+        cmd = COMMANDS[msg.mode - 0x40, msg.pid]
+        r = timed('command', cmd.name, cmd, (msg,), iterations)
+        results.append(r)
+    return results
+
+
+def payloads():
+    """
+    Get representative payload of each mode 01 command.
+    """
+    protocol, lines = log_messages()
+    found = {}
+    for data in lines.values():
+        msg = protocol(data)[0]
+        found[msg.pid] = msg.data_bytes
+
+    sim = Simulator().ecus[0]
+    items = ((pid, COMMANDS[1, pid]) for pid in range(0x60))
+    return [
+        (cmd, found.get(pid) or sim.data(pid))
+        for pid, cmd in items
+    ]
+
+
+def bench_decoder(iterations):
+    results = []
+    items = payloads()
+    by_decoder = {}
+    for cmd, data in items:
+        by_decoder.setdefault(cmd.decode, (cmd, data))
+
+    # decoder functions of the decoders module
+    functions = inspect.getmembers(decoders, inspect.isfunction)
+    functions = [
+        (name, f) for name, f in functions
+        if f.__module__ == decoders.__name__
+        and list(inspect.signature(f).parameters) == ['data']
+    ]
+    for name, f in functions:
+        if f in by_decoder:
+            data = by_decoder[f][1]
+        else:
+            data = PAYLOADS.get(name, DEFAULT_PAYLOAD)
+        results.append(timed('decoder', name, f, (data,), iterations))
+
+    # linear decoders of the commands
+    for cmd, data in items:
+        if isinstance(cmd.decode, Linear):
+            r = timed('decoder', 'linear/' + cmd.name, cmd.decode, (data,), iterations)
+            results.append(r)
+    return results
+
+
+parser = parser('Response parsing and decoding benchmark')
+args = parser.parse_args()
+
+n = args.iterations
+results = bench_protocol(n) + bench_command(n) + bench_decoder(n)
+write('decode', results, args.output)
+
+# vim: sw=4:et:ai
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Benchmark of offline parsing of ELM327 debug logs.
+
+The debug logs of `data` directory are repeated to create a large log.
+The following is timed
+
+- reading events of the log with regular expression and generic date
+  parser as in `aobd-replay` script (`dateutil` if installed, otherwise
+  `datetime.strptime`)
+- reading events of the log with `aobd.logparse.read_log`
+- parsing the log into columns of values with `aobd.logparse.parse`
+
+The speed is reported in lines per second.
+"""
+
+import ast
+import datetime
+import os
+import re
+import tempfile
+import time
+
+from aobd.logparse import read_log, parse
+
+from common import data_files, parser, write
+
+RE_LINE = re.compile(
+    r':(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d+):.+:(received|sending): (b\'.+\')$',
+    re.S
+)
+
+try:
+    from dateutil.parser import parse as dparse
+except ImportError:
+    dparse = lambda s: datetime.datetime.strptime(s, '%Y-%m-%d %H:%M:%S.%f')
+
+
+def read_log_regex(f):
+    items = (RE_LINE.search(s) for s in f)
+    items = (m.groups() for m in items if m)
+    for t, k, s in items:
+        yield k, dparse(t.replace(',', '.')).timestamp(), ast.literal_eval(s)
+
+
+def timed(name, f, path, n_lines):
+    t0 = time.perf_counter()
+    f(path)
+    t = time.perf_counter() - t0
+    return {'name': name, 'time': t, 'lines_per_second': n_lines / t}
+
+
+def consume_regex(path):
+    with open(path) as f:
+        for _ in read_log_regex(f):
+            pass
+
+
+def consume(path):
+    with open(path) as f:
+        for _ in read_log(f):
+            pass
+
+
+parser = parser('ELM327 debug log parsing benchmark')
+args = parser.parse_args()
+
+# the log of a session is repeated, so each copy starts with the
+# connection setup
+lines = []
+for fn in data_files():
+    with open(fn) as f:
+        lines.extend(f)
+lines = lines * max(1, args.iterations // len(lines))
+
+fd, path = tempfile.mkstemp(suffix='.log')
+try:
+    with os.fdopen(fd, 'w') as f:
+        f.writelines(lines)
+
+    n = len(lines)
+    results = [
+        timed('regex', consume_regex, path, n),
+        timed('read_log', consume, path, n),
+        timed('parse', parse, path, n),
+    ]
+finally:
+    os.unlink(path)
+
+write('logparse', results, args.output)
+
+# vim: sw=4:et:ai
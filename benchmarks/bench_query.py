@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+End-to-end throughput and latency benchmark of OBD queries.
+
+The queries are sent to simulated ELM327 device over in-memory
+transport, so the library overhead is measured without latency of
+a serial port. Use `--latency` option to add latency of the simulator.
+
+Each scenario reports number of queried commands per second and
+latency of a call in microseconds. The latency of `OBDIterator` call is
+the time to receive responses of all commands.
+"""
+
+import asyncio
+import time
+
+import aobd
+from aobd.sim import Simulator
+from aobd.transport import MemoryTransport
+
+from common import parser, summary, write
+
+PROTOCOLS = {'can': '6', 'legacy': '1'}
+
+COMMANDS = [
+    aobd.COMMANDS.RPM,
+    aobd.COMMANDS.SPEED,
+    aobd.COMMANDS.THROTTLE_POS,
+    aobd.COMMANDS.ENGINE_LOAD,
+    aobd.COMMANDS.COOLANT_TEMP,
+    aobd.COMMANDS.INTAKE_TEMP,
+    aobd.COMMANDS.MAF,
+    aobd.COMMANDS.INTAKE_PRESSURE,
+    aobd.COMMANDS.TIMING_ADVANCE,
+    aobd.COMMANDS.FUEL_LEVEL,
+]
+
+
+async def query(dev, commands):
+    for cmd in commands:
+        await dev.query(cmd)
+
+
+async def iterate(dev, commands):
+    async for _ in dev.query(commands):
+        pass
+
+
+SCENARIOS = [
+    ('query', 1, query),
+    ('query', len(COMMANDS), query),
+    ('iterator', 1, iterate),
+    ('iterator', len(COMMANDS), iterate),
+]
+
+
+async def run_scenario(protocol, api, n_commands, f, iterations, latency):
+    sim = Simulator(protocol=PROTOCOLS[protocol], latency=latency)
+    dev = aobd.OBD(MemoryTransport(sim))
+    await dev.connect()
+    commands = COMMANDS[:n_commands]
+
+    # warm up
+    for _ in range(10):
+        await f(dev, commands)
+
+    latencies = []
+    timer = time.perf_counter_ns
+    start = timer()
+    for _ in range(iterations):
+        t = timer()
+        await f(dev, commands)
+        latencies.append(timer() - t)
+    total = timer() - start
+    dev.close()
+
+    return {
+        'name': '{}/{}/{}'.format(api, protocol, n_commands),
+        'api': api,
+        'protocol': protocol,
+        'commands': n_commands,
+        'iterations': iterations,
+        'qps': iterations * n_commands / total * 1e9,
+        'latency_us': summary(latencies),
+    }
+
+
+async def main(args):
+    results = []
+    for protocol in PROTOCOLS:
+        for api, n, f in SCENARIOS:
+            r = await run_scenario(
+                protocol, api, n, f, args.iterations, args.latency
+            )
+            results.append(r)
+    return results
+
+
+parser = parser('OBD query throughput and latency benchmark')
+parser.add_argument(
+    '-l', '--latency', dest='latency', default=0, type=float,
+    help='latency of simulator response in seconds (default 0)'
+)
+args = parser.parse_args()
+
+results = asyncio.run(main(args))
+write('query', results, args.output)
+
+# vim: sw=4:et:ai
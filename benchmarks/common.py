@@ -0,0 +1,133 @@
+#
+# aobd - vehicle on-board diagnostics library
+#
+# Copyright (C) 2015 by Artur Wroblewski <wrobell@pld-linux.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Common functions of the benchmarks.
+"""
+
+import argparse
+import ast
+import json
+import os.path
+import platform
+import re
+import sys
+
+import aobd
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+RE_LINE = re.compile(r':(received|sending): (b\'.*\')$')
+
+
+def percentile(values, p):
+    """
+    Calculate percentile of sorted values using nearest rank method.
+    """
+    k = max(0, min(len(values) - 1, int(round(p / 100 * len(values))) - 1))
+    return values[k]
+
+
+def summary(latencies):
+    """
+    Calculate count, p50, p99 and max of latencies in nanoseconds.
+
+    The result is in microseconds.
+    """
+    values = sorted(latencies)
+    return {
+        'count': len(values),
+        'p50': percentile(values, 50) / 1000,
+        'p99': percentile(values, 99) / 1000,
+        'max': values[-1] / 1000,
+    }
+
+
+def load_responses(path):
+    """
+    Load requests and response lines from ELM327 debug log file.
+
+    List of tuples `(request, lines)` is returned.
+    """
+    items = []
+    request = None
+    data = b''
+    with open(path) as f:
+        for line in f:
+            m = RE_LINE.search(line)
+            if not m:
+                continue
+            kind, value = m.groups()
+            value = ast.literal_eval(value)
+            if kind == 'sending':
+                request = value.strip()
+                data = b''
+            else:
+                data += value
+                if data.endswith(b'>'):
+                    lines = re.split(b'[\r\n]', data[:-1])
+                    lines = [s.strip() for s in lines if s.strip()]
+                    items.append((request, lines))
+                    data = b''
+    return items
+
+
+def data_files():
+    """
+    Get paths of the ELM327 debug log files in the data directory.
+    """
+    files = sorted(os.listdir(DATA_DIR))
+    return [os.path.join(DATA_DIR, f) for f in files if f.endswith('.log')]
+
+
+def parser(description):
+    """
+    Create parser of command line arguments common to the benchmarks.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        '-n', '--iterations', dest='iterations', default=1000, type=int,
+        help='number of iterations (default 1000)'
+    )
+    parser.add_argument(
+        '-o', '--output', dest='output', default=None,
+        help='write results to a file instead of standard output'
+    )
+    return parser
+
+
+def write(name, results, output=None):
+    """
+    Write benchmark results as JSON document.
+    """
+    doc = {
+        'benchmark': name,
+        'aobd': aobd.__version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    if output:
+        with open(output, 'w') as f:
+            json.dump(doc, f, indent=2)
+    else:
+        json.dump(doc, sys.stdout, indent=2)
+        print()
+
+# vim: sw=4:et:ai